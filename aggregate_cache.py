@@ -0,0 +1,67 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('AGGREGATE_CACHE_SIZE', 512))
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {name: _copy(member) for name, member in value.items()}
+    return value.copy() if isinstance(value, pd.DataFrame) else value
+
+
+# Bounded LRU of data function results (aggregate frames and KPI tuples), shared by every
+# session. Keys start with the dataset id, so a dataset's entries can be dropped when it changes.
+class AggregateCache:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Function to return the cached result for key, computing and storing it on a miss.
+    # Frames (also those in a bundle) are copied on the way out, as chart builders add columns
+    # to what they're given.
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if value is None:
+            value = compute()
+            with self._lock:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return _copy(value)
+
+    def invalidate(self, dataset_id):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == dataset_id]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            logging.info(f"Dropped {len(stale)} cached aggregates of dataset {dataset_id}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            }
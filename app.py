@@ -2,18 +2,25 @@ import numpy as np
 from werkzeug.utils import secure_filename
 import logging
 from tornado.ioloop import IOLoop
-from flask import Flask, request, render_template, redirect, url_for
+from flask import Flask, request, render_template, render_template_string, redirect, url_for, jsonify
 import os
+import asyncio
+import json
+import uuid
 import pandas as pd
 import requests
 import numpy as np
 from werkzeug.utils import secure_filename
-from threading import Thread
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from tornado.ioloop import IOLoop
 from send_email import sendEmail_function
 from bokeh.embed import server_document
 from bokeh.server.server import Server
+from bokeh.application import Application
+from bokeh.application.handlers import FunctionHandler, Handler
 import panel as pn
 from flask import Response
 from send_email import send_exceldata_report
@@ -21,11 +28,24 @@ import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend for Matplotlib
 
 # Custom modules
-from socialMedia import get_social_media_platform_data, create_social_media_platform_bar_chart
+from ingest import DERIVED_COLUMNS, load_combined_data
+from upload_cache import UploadCache
+from jobs import JobManager
+from datastore import DataStore, StoreSource
+from registry import DatasetRegistry
+from frame_source import FrameSource, session_overhead
+from aggregate_cache import AggregateCache
+from chart_cache import ChartCache
+from charts import plotly_json, render_png, submit_render, reset_pool as reset_render_pool, start_pool as start_render_pool
+from bokeh_charts import BokehChart
+from visibility import LazyChart
+from filters import Filters
+from socialMedia import get_social_media_platform_data, create_social_media_platform_bar_chart, SocialMediaPlatformChart, BokehSocialMediaPlatformChart
 from summary import (
     calculate_summary, create_top_property_bar_chart, get_top_fixtures, 
     create_top_fixtures_bar_chart, create_bar_chart, get_monthly_totals, 
-    create_monthly_totals_line_plot
+    create_monthly_totals_line_plot, SheetChart, TopFixturesChart, MonthlyTotalsChart, TopPropertyChart,
+    BokehSheetChart, BokehTopFixturesChart, BokehMonthlyTotalsChart
 )
 from telegram import (
     widgets, get_telegram_platform_data, get_top_telegram_property, calculate_telegram_summary, 
@@ -34,12 +54,14 @@ from telegram import (
     create_enhanced_matchday_line_plot, aggregate_matchday_data, 
     telegram_monthly_totals_line_plot, telegram_monthly_totals, 
     top_fixtures_donut_chart, top_fixtures_graph_donut_chart, 
-    create_channel_type_pie_chart
+    create_channel_type_pie_chart, MatchdayChart, BokehMatchdayChart, TelegramMonthlyTotalsChart
 )
 from bokeh.embed import server_document
 
 from flask_sockets import Sockets
-import websocket
+from werkzeug.routing import Rule
+from gevent import pywsgi
+from ws_proxy import ProxyWebSocketHandler, WebSocketProxy, close_client, connect_upstream
 
 from bokeh.embed import server_document
 from bokeh.server.server import Server
@@ -55,6 +77,43 @@ UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] =UPLOAD_FOLDER
 ALLOWED_EXTENSIONS = {'xlsx'}
 
+# Number of worker processes used to parse the workbooks of one upload in parallel
+app.config['INGEST_WORKERS'] = int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 1))
+
+# Cleaned sheets of every uploaded workbook, keyed by file hash
+upload_cache = UploadCache()
+
+# Every upload is persisted here as its own dataset
+data_store = DataStore()
+
+# Datasets loaded by the dashboard server, shared by every session viewing the same dataset.
+# 'memory' holds one read-only frame per dataset; 'sql' answers every query from the store instead.
+app.config['DASHBOARD_SOURCE'] = os.environ.get('DASHBOARD_SOURCE', 'memory')
+
+
+# Results of the dashboard's data functions, keyed by dataset, filter state and function
+aggregate_cache = AggregateCache()
+
+# Rendered charts keyed by chart, content of its inputs and size, shared by every session and the PDF report
+chart_cache = ChartCache()
+
+
+def load_dashboard_source(dataset_id):
+    if app.config['DASHBOARD_SOURCE'] == 'sql':
+        return StoreSource(data_store, dataset_id, cache=aggregate_cache)
+    return FrameSource(data_store, dataset_id, cache=aggregate_cache)
+
+
+dashboard_datasets = DatasetRegistry(load_dashboard_source)
+
+# The single Panel server started at boot; /dashboard embeds it through this address
+app.config['PANEL_PORT'] = int(os.environ.get('PANEL_PORT', 5002))
+
+# Uploads run as background jobs on a bounded pool so they can't starve the web workers
+app.config['UPLOAD_JOB_WORKERS'] = int(os.environ.get('UPLOAD_JOB_WORKERS', 2))
+app.config['UPLOAD_JOB_QUEUE'] = int(os.environ.get('UPLOAD_JOB_QUEUE', 8))
+upload_jobs = JobManager(max_workers=app.config['UPLOAD_JOB_WORKERS'], max_queued=app.config['UPLOAD_JOB_QUEUE'])
+
 # Initialize Panel
 pn.extension(sizing_mode="stretch_width")
 
@@ -74,22 +133,99 @@ def serve_static(filename):
 
 sockets = Sockets(app)
 
-@sockets.route('/dashboard/ws')
+# Bokeh sends its session token as a second subprotocol next to 'bokeh', which is the one accepted
+WEBSOCKET_PROTOCOLS = {'/dashboard/ws': 'bokeh'}
+app.app_protocol = WEBSOCKET_PROTOCOLS.get
+
+
+# Relay a dashboard websocket to the Panel server. Runs on a greenlet, so one worker holds many connections.
 def bokeh_websocket(ws):
-    bokeh_ws = websocket.create_connection('ws://127.0.0.1:5002/bokeh_app/ws')
+    start_panel_server()
+    protocols = [p.strip() for p in request.headers.get('Sec-WebSocket-Protocol', '').split(',') if p.strip()]
+    upstream_url = f"ws://127.0.0.1:{app.config['PANEL_PORT']}/bokeh_app/ws"
+    if request.query_string:
+        upstream_url += '?' + request.query_string.decode()
     try:
-        while not ws.closed:
-            ws_message = ws.receive()
-            bokeh_ws.send(ws_message)
-            bokeh_message = bokeh_ws.recv()
-            ws.send(bokeh_message)
-    finally:
-        bokeh_ws.close()
+        upstream = connect_upstream(upstream_url, subprotocols=protocols or None, origin=request.headers.get('Origin'))
+    except Exception as e:
+        logging.error(f"Could not reach the Panel server at {upstream_url}: {e}")
+        close_client(ws, 1011, 'dashboard server unavailable')
+        return
+    WebSocketProxy(ws, upstream).run()
+
+
+# Registered directly: werkzeug only matches upgrade requests against rules marked websocket=True
+sockets.url_map.add(Rule('/dashboard/ws', endpoint=bokeh_websocket, websocket=True))
+
+
+# Rows per page of the Data Table tab
+app.config['DATA_TABLE_PAGE_SIZE'] = int(os.environ.get('DATA_TABLE_PAGE_SIZE', 50))
+
+# 'approximate' starts dashboards with the KPI distinct URL counts estimated from sketches ('exact' by default)
+app.config['DISTINCT_COUNTS'] = os.environ.get('DISTINCT_COUNTS', 'exact')
+
+# 'bokeh' draws the Summary tab's charts as native Bokeh plots, updated by sending only the data that
+# changed; 'matplotlib' (the default) sends them as images
+app.config['CHART_BACKEND'] = os.environ.get('CHART_BACKEND', 'matplotlib')
+
+# Threads computing filter updates off the Bokeh IO loop, shared by every dashboard session
+app.config['DASHBOARD_REFRESH_WORKERS'] = int(os.environ.get('DASHBOARD_REFRESH_WORKERS', 4))
+refresh_executor = ThreadPoolExecutor(max_workers=app.config['DASHBOARD_REFRESH_WORKERS'], thread_name_prefix='dashboard-refresh')
+
+# Worker processes rendering the dashboard charts concurrently, shared by every session
+# (with 1, charts are rendered on the refresh threads instead). Each one holds its own copy of
+# pandas and Matplotlib and competes with the web workers for the CPUs, so at most 2 by default.
+app.config['CHART_RENDER_WORKERS'] = int(os.environ.get('CHART_RENDER_WORKERS', min(os.cpu_count() or 1, 2)))
+
+
+# Positions of the tabs with charts in the dashboard
+SUMMARY_TAB = 0
+TELEGRAM_TAB = 2
+
+
+# Function to run a chart render job (charts.render_png or charts.plotly_json) for chart and its
+# inputs off the IO loop, unless the chart cache already has the result
+async def render_chart(job, chart, inputs, size):
+    key, rendered = chart_cache.lookup(chart.__name__, inputs, size)
+    if rendered is None:
+        workers = app.config['CHART_RENDER_WORKERS']
+        if workers > 1:
+            future = submit_render(job, chart, inputs, workers)
+        else:
+            future = refresh_executor.submit(job, chart, inputs)
+        try:
+            rendered = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            reset_render_pool()
+            raise
+        chart_cache.store(key, rendered)
+    return rendered
+
+
+# Shared and per-session memory of every dataset the dashboard server has loaded
+@app.route('/dashboard/memory')
+def dashboard_memory():
+    return jsonify(dashboard_datasets.memory_report())
+
+
+# Hit/miss counters and size of the shared rendered-chart cache
+@app.route('/dashboard/chart-cache')
+def dashboard_chart_cache():
+    return jsonify(chart_cache.stats())
+
+
+# Hit/miss counters of the shared aggregate cache
+@app.route('/dashboard/cache')
+def dashboard_cache():
+    return jsonify(aggregate_cache.stats())
 
 
 @app.route('/dashboard')
 def dashboard():
-    panel_script = server_document("http://127.0.0.1:5002/bokeh_app")
+    start_panel_server()
+    dataset_id = request.args.get('dataset') or data_store.latest_dataset()
+    panel_script = server_document(f"http://127.0.0.1:{app.config['PANEL_PORT']}/bokeh_app",
+                                   arguments={'dataset': dataset_id} if dataset_id else None)
     return render_template("dashboard.html", script=panel_script)
 
 
@@ -104,47 +240,116 @@ def upload_file():
         return redirect(request.url)
     
     files = request.files.getlist('file')
-    dataframes = []
+    file_paths = []
     
     for file in files:
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
+            # Prefix a unique token so concurrent uploads of the same file name never collide
+            filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(file.filename)}"
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(file_path)
-            
-            # Load each sheet from the uploaded file
-            sheets = [pd.read_excel(file_path, sheet_name=i).reset_index(drop=True) for i in range(5)]
-            sheets = [df.loc[:, ~df.columns.duplicated()] for df in sheets]
-            
-            # Add sheet names to each sheet's data
-            sheet_names = ['Infringing_urls', 'Source_urls', 'Telegram', 'SocialMediaPlatforms', 'MobileApplications']
-            for i, name in enumerate(sheet_names):
-                sheets[i]['SheetName'] = name
-            dataframes.extend(sheets)
-    
-    combined_data = pd.concat(dataframes, ignore_index=True)
-    
-    # Clean and process the data
-    combined_data['propertyname'] = combined_data['propertyname'].fillna('Unknown')
-    combined_data['fixtures'] = combined_data['fixtures'].fillna('Unknown')
-    combined_data['DomainName'] = combined_data['DomainName'].fillna('Unknown')
-    combined_data['URL'] = combined_data['URL'].fillna('Unknown')
-    combined_data['Status'] = combined_data['Status'].fillna('Pending')
-    combined_data['Identification Timestamp'] = pd.to_datetime(combined_data['Identification Timestamp'], errors='coerce')
-    combined_data = combined_data.dropna(subset=['Identification Timestamp'])
+            file_paths.append(file_path)
+
+    if not file_paths:
+        return redirect(request.url)
+
+    # mode=append merges the files into an existing dataset (the latest one unless 'dataset' is given)
+    dataset_id = None
+    if request.form.get('mode') == 'append':
+        dataset_id = request.form.get('dataset') or data_store.latest_dataset()
+
+    # Parsing and dashboard startup run as a background job; the client polls /jobs/<id>
+    job = upload_jobs.submit(process_upload, len(file_paths), file_paths, dataset_id)
+    if job is None:
+        remove_uploads(file_paths)
+        return jsonify(error="Too many uploads in progress, please retry shortly"), 503
+
+    status_url = url_for('job_status', job_id=job.id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_id=job.id, status_url=status_url), 202, {'Location': status_url}
+    return redirect(url_for('job_progress', job_id=job.id))
+
+
+# Function to delete uploaded workbooks once they are no longer needed
+def remove_uploads(file_paths):
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logging.warning(f"Could not remove upload {file_path}: {e}")
 
-    # Start the Panel server with the processed data
-    thread = Thread(target=run_panel_server, args=(combined_data,))
-    thread.daemon = True
-    thread.start()
 
-    # Redirect to the dashboard
-    return redirect(url_for('dashboard'))
+# Background half of /upload: parse, clean and hand the dataset to the dashboard
+def process_upload(job, file_paths, dataset_id=None):
+    job.set_stage('parsing')
+    # Workbooks are parsed in parallel, each opened once and streamed sheet by sheet (or served from the cache).
+    # Once parsed they live in the store and the upload cache, so the uploaded files are removed.
+    try:
+        combined_data = load_combined_data(file_paths, cache=upload_cache, max_workers=app.config['INGEST_WORKERS'],
+                                           progress=job.file_parsed)
+    finally:
+        remove_uploads(file_paths)
+
+    # Persist the upload; the dashboard server reads it back from the store by dataset id
+    job.set_stage('storing')
+    if dataset_id is None:
+        return data_store.append(combined_data)
+
+    # Append mode: a dataset the dashboard has loaded merges through its source so open sessions
+    # pick the new rows up; otherwise the rows only need to reach the store
+    source = dashboard_datasets.get(dataset_id)
+    if source is not None:
+        source.append(combined_data)
+    else:
+        data_store.merge(combined_data, dataset_id)
+        aggregate_cache.invalidate(dataset_id)
+    return dataset_id
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    status = job.to_dict()
+    if job.stage == 'ready':
+        status['dashboard_url'] = url_for('dashboard', dataset=job.result)
+    return jsonify(status)
+
+
+# Minimal page for plain form posts: polls the job and opens the dashboard once the data is ready
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    return render_template_string("""
+    <html>
+        <body style="font-family: Arial, sans-serif; text-align: center; padding-top: 80px; color: #333;">
+            <h2>Processing upload...</h2>
+            <p id="status">Queued</p>
+            <script>
+                function poll() {
+                    fetch("{{ status_url }}").then(r => r.json()).then(job => {
+                        if (job.dashboard_url) { window.location = job.dashboard_url; return; }
+                        if (job.stage === "failed" || job.error) {
+                            document.getElementById("status").innerText = "Upload failed: " + job.error;
+                            return;
+                        }
+                        document.getElementById("status").innerText =
+                            job.stage + " - " + job.rows_parsed + " rows from " + job.files_parsed + "/" + job.files +
+                            " files (" + job.elapsed + "s)";
+                        setTimeout(poll, 1000);
+                    });
+                }
+                poll();
+            </script>
+        </body>
+    </html>
+    """, status_url=url_for('job_status', job_id=job_id))
 
 
 
 # Function to create the Panel dashboard
-def create_dashboard(combined_data):
+# track_memory, if given, receives a function measuring the memory this session holds on its own
+def create_dashboard(source, track_memory=None):
 
     dashboard_css = """
     body {
@@ -346,14 +551,19 @@ def create_dashboard(combined_data):
 
 
     # Filter Widgets
-    propertyname_filter = pn.widgets.Select(name='Property Name', options=['All'] + list(combined_data['propertyname'].unique()))
-    fixtures_filter = pn.widgets.MultiChoice(name='Select Fixtures', options=list(combined_data['fixtures'].unique()), height=100)
-    start_date_filter = pn.widgets.DatetimePicker(name='Start Date', value=combined_data['Identification Timestamp'].min())
-    end_date_filter = pn.widgets.DatetimePicker(name='End Date', value=combined_data['Identification Timestamp'].max())
+    first_timestamp, last_timestamp = source.timestamp_range()
+    propertyname_filter = pn.widgets.Select(name='Property Name', options=['All'] + source.distinct('propertyname'))
+    fixtures_filter = pn.widgets.MultiChoice(name='Select Fixtures', options=source.distinct('fixtures'), height=100)
+    start_date_filter = pn.widgets.DatetimePicker(name='Start Date', value=first_timestamp)
+    end_date_filter = pn.widgets.DatetimePicker(name='End Date', value=last_timestamp)
     # Define two separate buttons for each section
     apply_summary_button = pn.widgets.Button(name="Apply Summary Filters", button_type="primary", width=150)
     apply_telegram_button = pn.widgets.Button(name="Apply Telegram Filters", button_type="primary", width=150)
     sent_email = pn.widgets.Button(name="Send Mail", button_type="primary", width=150)
+    # Approximate distinct counts, their error bound, and an exact recount of the current filters on demand
+    approximate_toggle = pn.widgets.Checkbox(name="Approximate distinct counts", value=app.config['DISTINCT_COUNTS'] == 'approximate')
+    exact_counts_button = pn.widgets.Button(name="Exact Counts", button_type="light", width=150)
+    distinct_note = pn.pane.Markdown("", margin=(0, 10))
 
     # Create the Social Media Platforms grouped bar chart pane
 
@@ -397,6 +607,8 @@ def create_dashboard(combined_data):
         margin=(10, 0, 20, 0)
     )
 
+    distinct_counts_section = pn.Row(approximate_toggle, exact_counts_button, distinct_note, align="center", margin=(0, 10))
+
     # telegram section with cnetred layout 
     total_properties_telegram_card, total_fixture_telegram_card,total_infringements_telegram_card,number_of_websites_telegram_card,removal_percentage_telegram_card,views_incurred_card,no_of_channels_suspended_card,total_subscribers_card,impacted_subscribers_card, dashboard= widgets()
 
@@ -434,8 +646,8 @@ def create_dashboard(combined_data):
                 logging.info("No old files found. Proceeding with creating a new file.")
         except Exception as e:
             logging.error(f"Error deleting old files: {e}")
-        # Use the current value of `data_table` to get the filtered data
-        filtered_data = data_table.value
+        # Export what the table shows: the filtered rows with its sorting and header filters applied
+        filtered_data = data_table.current_view.drop(columns=DERIVED_COLUMNS, errors='ignore')
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_path = f"excel_output/filtered_data_{timestamp}.xlsx"
         filtered_data.to_excel(file_path, index=False)
@@ -446,85 +658,149 @@ def create_dashboard(combined_data):
     # Link the export function to the button click event
     export_button.on_click(export_to_excel)
 
-    # Update summary and chart display function
-    def update_summary(event=None):
-
-     
+    # Function to show whether the distinct counts on the cards are estimates, and how close
+    def show_distinct_error(results):
+        error = results.get('distinct_error', 0)
+        if error:
+            distinct_note.object = f"Infringement, removal and suspended-channel counts are estimates (±{2 * error:.1%} at 95% confidence)."
+        else:
+            distinct_note.object = "All counts are exact."
+
+    # Filter updates are computed on the refresh executor while the IO loop keeps serving every
+    # session. Each tab counts the updates started on it: a newer one cancels the pending future
+    # of the one before, and a result or chart is only shown if no newer update has started since.
+    latest_update = {'summary': 0, 'telegram': 0}
+    pending_update = {}
+
+    # Filters each tab's data was last computed for, and the filters applied last (from any tab)
+    computed_filters = {}
+    applied_filters = [None]
+
+    # Function to tell whether the latest update of tab is still the one running now
+    def still_current(tab):
+        generation = latest_update[tab]
+        return lambda: latest_update[tab] == generation
+
+    # Function to run compute() on the refresh executor, returning None if a newer update
+    # of the same tab started meanwhile
+    async def run_latest(tab, compute):
+        latest_update[tab] += 1
+        current = still_current(tab)
+        if tab in pending_update:
+            pending_update[tab].cancel()
         loading_overlay.visible = True
-        pn.io.push_notebook()  # Ensure UI updates immediately
+        future = refresh_executor.submit(compute)
+        pending_update[tab] = future
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            return None
+        except Exception as e:
+            if current():
+                loading_overlay.visible = False
+                logging.error(f"Error updating the {tab} tab: {e}")
+            return None
+        if not current():
+            return None
+        del pending_update[tab]
+        loading_overlay.visible = False
+        return result
+
+    # Function to show a chart for inputs in pane as soon as it is ready, unless current() says a
+    # newer update of the tab has started. chart is a Bokeh chart, a Matplotlib chart class or a
+    # Plotly chart builder; the last two are rendered in the render pool. A Bokeh chart's next
+    # state is computed on the refresh executor, and only applied to its models on the IO loop.
+    async def show_chart(pane, chart, inputs, current):
+        try:
+            if isinstance(chart, BokehChart):
+                image = None
+                prepared = await asyncio.wrap_future(refresh_executor.submit(chart.prepare, *inputs))
+            elif isinstance(chart, type):
+                image = await render_chart(render_png, chart, inputs, (chart.figsize, chart.dpi))
+            else:
+                image = json.loads(await render_chart(plotly_json, chart, inputs, 'plotly'))
+        except Exception as e:
+            logging.error(f"Error rendering {getattr(chart, '__name__', type(chart).__name__)}: {e}")
+            return
+        if not current():
+            return
+        if image is None:
+            chart.pending = prepared
+            chart.show(pane)
+        else:
+            pane.object = image
 
-        filtered_data = combined_data
+    # Update summary and chart display function
+    async def update_summary(event=None, exact=False):
         selected_property = propertyname_filter.value
         selected_fixtures = fixtures_filter.value
-        start_date = start_date_filter.value
-        end_date = end_date_filter.value
-
-        if selected_property != 'All':
-            filtered_data = filtered_data[filtered_data['propertyname'] == selected_property]
-        if selected_fixtures:
-            filtered_data = filtered_data[filtered_data['fixtures'].isin(selected_fixtures)]
-        if start_date and end_date:
-            filtered_data = filtered_data[(filtered_data['Identification Timestamp'] >= start_date) &
-                                        (filtered_data['Identification Timestamp'] <= end_date)]
-        
-        total_properties, total_fixture, total_infringements, number_of_websites, removal_percentage = calculate_summary(filtered_data)
+        filters = Filters.from_widgets(selected_property, selected_fixtures, start_date_filter.value, end_date_filter.value)
+        approximate = approximate_toggle.value and not exact
+
+        # Filters and aggregations are pushed down into the data source, which computes the
+        # whole tab (KPIs and every chart's input) in one pass
+        def compute():
+            return source.query('summary_bundle', filters, approximate=approximate), source.rows(filters)
+
+        outcome = await run_latest('summary', compute)
+        if outcome is None:
+            return
+        summary_results, rows = outcome
+        current = still_current('summary')
+
+        show_distinct_error(summary_results)
+        total_properties, total_fixture, total_infringements, number_of_websites, removal_percentage = summary_results['calculate_summary']
         total_properties_card[0].value = total_properties
         total_fixture_card[0].value = total_fixture
         total_infringements_card[0].value = total_infringements
         number_of_websites_card[0].value = number_of_websites
         removal_percentage_card[0].value = removal_percentage
 
-
-        # Update the charts only when the "Apply" button is clicked
-        bar_chart.object = create_bar_chart(filtered_data, selected_property, ", ".join(selected_fixtures) if selected_fixtures else "All Fixtures")
-        bar_chart_top_fixtures.object = create_top_fixtures_bar_chart(get_top_fixtures(filtered_data))
-        line_chart_monthly.object = create_monthly_totals_line_plot(get_monthly_totals(filtered_data))
-        # Generate social media platform chart after applying filters
-        social_media_platform_chart.object = create_social_media_platform_bar_chart(get_social_media_platform_data(filtered_data))
-        
-        matchday_wisereport.object = create_enhanced_matchday_line_plot(aggregate_matchday_data(filtered_data))
-        
         # Update the data table with filtered data
-        data_table.value = filtered_data 
+        # New rows start again from the first page, the only one sent
+        data_table.param.update(value=rows, page=1)
 
-        loading_overlay.visible = False
-        pn.io.push_notebook()
+        # Update the charts only when the "Apply" button is clicked. Each one is marked dirty and
+        # rendered once it's in view, concurrently with the others and shown as soon as it's ready.
+        applied_filters[0] = computed_filters[SUMMARY_TAB] = filters
+        sheet_lazy.set((summary_results['get_sheet_summary'], selected_property, ", ".join(selected_fixtures) if selected_fixtures else "All Fixtures"), current)
+        top_fixtures_lazy.set((summary_results['get_top_fixtures'],), current)
+        monthly_lazy.set((summary_results['get_monthly_totals'],), current)
+        social_media_lazy.set((summary_results['get_social_media_platform_data'],), current)
+        matchday_lazy.set((summary_results['aggregate_matchday_data'],), current)
+        await render_due()
 
 
     apply_summary_button.on_click(update_summary)
 
 
     # Update summary and chart display function
-    def telegramUpdate_summary(event=None):
-
-        loading_overlay.visible = True
-        pn.io.push_notebook()
-
+    async def telegramUpdate_summary(event=None, exact=False):
         # Apply filters to the data
-        filtered_data = combined_data[combined_data['SheetName'] == 'Telegram']
-        selected_property = propertyname_filter.value
-        selected_fixtures = fixtures_filter.value
-        start_date = start_date_filter.value
-        end_date = end_date_filter.value
+        filters = Filters.from_widgets(propertyname_filter.value, fixtures_filter.value, start_date_filter.value, end_date_filter.value)
+        approximate = approximate_toggle.value and not exact
 
+        # The whole tab is computed in one pass
+        def compute():
+            telegram_results = source.query('telegram_bundle', filters, sheet='Telegram', approximate=approximate)
+            unique_fixtures_telegram = source.distinct('fixtures', filters, sheet='Telegram')
+            return telegram_results, unique_fixtures_telegram, source.rows(filters, sheet='Telegram')
+
+        outcome = await run_latest('telegram', compute)
+        if outcome is None:
+            return
+        telegram_results, unique_fixtures_telegram, rows = outcome
+        current = still_current('telegram')
 
-        if selected_property != 'All':
-            filtered_data = filtered_data[filtered_data['propertyname'] == selected_property]
-        if selected_fixtures:
-            filtered_data = filtered_data[filtered_data['fixtures'].isin(selected_fixtures)]
-        if start_date and end_date:
-            filtered_data = filtered_data[(filtered_data['Identification Timestamp'] >= start_date) &
-                                        (filtered_data['Identification Timestamp'] <= end_date)]
-        
         # Update Telegram-specific summary using provided variables
+        show_distinct_error(telegram_results)
         impacted_subscribers, total_subscribers, no_of_channels_suspended, total_fixture_telegram, \
         total_infringements_telegram, total_properties_telegram, total_telegram_channel_names, \
-        removal_percentage_telegram, views_incurred = calculate_telegram_summary(filtered_data)
+        removal_percentage_telegram, views_incurred = telegram_results['calculate_telegram_summary']
 
 
         # Assign the returned values to the Telegram-specific summary cards
         impacted_subscribers_card[0].value = impacted_subscribers
-        print(impacted_subscribers_card[0].value)
         total_subscribers_card[0].value = total_subscribers
         no_of_channels_suspended_card[0].value = no_of_channels_suspended
         total_fixture_telegram_card[0].value = total_fixture_telegram
@@ -534,30 +810,29 @@ def create_dashboard(combined_data):
         removal_percentage_telegram_card[0].value = removal_percentage_telegram
         views_incurred_card[0].value = views_incurred
 
-        unique_fixtures_telegram = filtered_data['fixtures'].unique().tolist()
         fixtures_filter.options = unique_fixtures_telegram 
 
-        # Update the charts only when the "Apply" button is clicked
-        topfixtures_telegram_barchart.object = create_telegram_top_fixtures_bar_chart(get_telegram_top_fixtures(filtered_data))
-        telegram_chart_top_properties.object = create_top_property_bar_chart(get_top_telegram_property(filtered_data))
-        topDomains_telegram_bySubscribers.object = create_treemap_chart_telegram(telegram_domains_by_subscribers(filtered_data))
-        telegram_line_graph_plot.object = telegram_monthly_totals_line_plot(telegram_monthly_totals(filtered_data))
-        top_fixture_donut_plot.object = top_fixtures_graph_donut_chart(top_fixtures_donut_chart(filtered_data))
-        telegram_channeltype_chart.object = create_channel_type_pie_chart(filtered_data)
         # Update the data table with filtered data
-        data_table.value = filtered_data
-
-        loading_overlay.visible = False
-        pn.io.push_notebook()
-
+        data_table.param.update(value=rows, page=1)
+
+        # Update the charts only when the "Apply" button is clicked, once they are in view
+        applied_filters[0] = computed_filters[TELEGRAM_TAB] = filters
+        telegram_top_fixtures_lazy.set((telegram_results['get_telegram_top_fixtures'],), current)
+        top_property_lazy.set((telegram_results['get_top_telegram_property'],), current)
+        domains_lazy.set((telegram_results['telegram_domains_by_subscribers'],), current)
+        telegram_monthly_lazy.set((telegram_results['telegram_monthly_totals'],), current)
+        donut_lazy.set((telegram_results['top_fixtures_donut_chart'],), current)
+        channel_type_lazy.set((telegram_results['get_channel_type_summary'],), current)
+        await render_due()
+
+    # An opened tab is recomputed if other filters have been applied since its data was computed;
+    # otherwise only its dirty charts in view are rendered
     def refresh_tab(event):
         try:
-            if event.new == 0:  # "Summary" tab index
-                if not bar_chart.object:
-                    update_summary()
-            elif event.new == 2:  # "Telegram" tab index
-                if not telegram_chart_top_properties.object:
-                    telegramUpdate_summary()
+            if event.new in TAB_UPDATES and computed_filters.get(event.new, False) != applied_filters[0]:
+                pn.state.execute(TAB_UPDATES[event.new])
+            elif event.new in TAB_UPDATES:
+                pn.state.execute(render_due)
             else:
                 print(f"Switched to tab {event.new}.")
         except Exception as e:
@@ -567,17 +842,32 @@ def create_dashboard(combined_data):
     # Link this function to the relevant button or event handler
     apply_telegram_button.on_click(telegramUpdate_summary)
 
+    # Recount the open tab exactly, for the current filters
+    async def recompute_exact(event):
+        if dashboard_tabs.active == TELEGRAM_TAB:
+            await telegramUpdate_summary(exact=True)
+        else:
+            await update_summary(exact=True)
+
+    exact_counts_button.on_click(recompute_exact)
+
     # Display initial DataFrame and empty charts
-    data_table = pn.widgets.DataFrame(combined_data, min_width=500, min_height=500, sizing_mode="stretch_width")
+    # Paged on the server: the browser only ever receives the current page, and sorting and
+    # header filters run against the dataset here. Read-only, as the rows can be the shared frame.
+    data_table = pn.widgets.Tabulator(
+        source.rows(), pagination='remote', page_size=app.config['DATA_TABLE_PAGE_SIZE'], header_filters=True,
+        disabled=True, show_index=False, hidden_columns=DERIVED_COLUMNS, min_width=500, min_height=500, sizing_mode="stretch_width"
+    )
 
-    # Initialize Matplotlib chart panes as None, they will be updated after applying filters
-    bar_chart = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
-    bar_chart_top_fixtures = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
-    line_chart_monthly = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
-    telegram_chart_top_properties = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
-    social_media_platform_chart = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
+    # Initialize chart panes as None, they will be updated after applying filters
+    summary_pane = pn.pane.Bokeh if app.config['CHART_BACKEND'] == 'bokeh' else pn.pane.PNG
+    bar_chart = summary_pane(None, sizing_mode="stretch_width")
+    bar_chart_top_fixtures = summary_pane(None, sizing_mode="stretch_width")
+    line_chart_monthly = summary_pane(None, sizing_mode="stretch_width")
+    telegram_chart_top_properties = pn.pane.PNG(None, sizing_mode="stretch_width")
+    social_media_platform_chart = summary_pane(None, sizing_mode="stretch_width")
 
-    matchday_wisereport = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
+    matchday_wisereport = summary_pane(None, sizing_mode="stretch_width")
 
     # Initialize Plotly chart pane as None, it will be updated after applying filters
     topfixtures_telegram_barchart = pn.pane.Plotly(None, sizing_mode="stretch_width")
@@ -585,7 +875,47 @@ def create_dashboard(combined_data):
     telegram_channeltype_chart = pn.pane.Plotly(None, sizing_mode="stretch_width")
     # this is for top domains graph
     topDomains_telegram_bySubscribers = pn.pane.Plotly(None, sizing_mode="stretch_width")
-    telegram_line_graph_plot = pn.pane.Matplotlib(None, sizing_mode="stretch_width")
+    telegram_line_graph_plot = pn.pane.PNG(None, sizing_mode="stretch_width")
+
+    # The Summary tab's charts: with the Bokeh backend the session's own plots, updated in place;
+    # otherwise the Matplotlib chart classes, rendered in the render pool
+    if app.config['CHART_BACKEND'] == 'bokeh':
+        sheet_chart = BokehSheetChart()
+        top_fixtures_chart = BokehTopFixturesChart()
+        monthly_chart = BokehMonthlyTotalsChart()
+        social_media_chart = BokehSocialMediaPlatformChart()
+        matchday_chart = BokehMatchdayChart()
+    else:
+        sheet_chart = SheetChart
+        top_fixtures_chart = TopFixturesChart
+        monthly_chart = MonthlyTotalsChart
+        social_media_chart = SocialMediaPlatformChart
+        matchday_chart = MatchdayChart
+
+    # Every chart, rendered only when it's dirty, its tab is open and it's scrolled into view
+    sheet_lazy = LazyChart(bar_chart, sheet_chart, SUMMARY_TAB)
+    top_fixtures_lazy = LazyChart(bar_chart_top_fixtures, top_fixtures_chart, SUMMARY_TAB)
+    monthly_lazy = LazyChart(line_chart_monthly, monthly_chart, SUMMARY_TAB)
+    social_media_lazy = LazyChart(social_media_platform_chart, social_media_chart, SUMMARY_TAB)
+    matchday_lazy = LazyChart(matchday_wisereport, matchday_chart, SUMMARY_TAB)
+    telegram_top_fixtures_lazy = LazyChart(topfixtures_telegram_barchart, create_telegram_top_fixtures_bar_chart, TELEGRAM_TAB)
+    top_property_lazy = LazyChart(telegram_chart_top_properties, TopPropertyChart, TELEGRAM_TAB)
+    domains_lazy = LazyChart(topDomains_telegram_bySubscribers, create_treemap_chart_telegram, TELEGRAM_TAB)
+    telegram_monthly_lazy = LazyChart(telegram_line_graph_plot, TelegramMonthlyTotalsChart, TELEGRAM_TAB)
+    donut_lazy = LazyChart(top_fixture_donut_plot, top_fixtures_graph_donut_chart, TELEGRAM_TAB)
+    channel_type_lazy = LazyChart(telegram_channeltype_chart, create_channel_type_pie_chart, TELEGRAM_TAB)
+    lazy_charts = [sheet_lazy, top_fixtures_lazy, monthly_lazy, social_media_lazy, matchday_lazy,
+                   telegram_top_fixtures_lazy, top_property_lazy, domains_lazy, telegram_monthly_lazy, donut_lazy, channel_type_lazy]
+
+    # Function to render the dirty charts of the open tab that are in view, concurrently
+    async def render_due():
+        due = [lazy for lazy in lazy_charts if lazy.dirty and lazy.tab == dashboard_tabs.active and lazy.view.in_view]
+        for lazy in due:
+            lazy.dirty = False
+        await asyncio.gather(*(show_chart(lazy.pane, lazy.chart, lazy.inputs, lazy.current) for lazy in due))
+
+    for lazy in lazy_charts:
+        lazy.view.param.watch(lambda event: pn.state.execute(render_due) if event.new else None, 'in_view')
 
 
     # Header Section with Title
@@ -625,22 +955,23 @@ def create_dashboard(combined_data):
             filters_section,
             loading_overlay,
             summary_section,
+            distinct_counts_section,
             pn.Row(
-                bar_chart,
-                bar_chart_top_fixtures,
+                sheet_lazy.view,
+                top_fixtures_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Set the same height for consistency
                 margin=(5, 5)  # No margins
             ),
             pn.Row(
-                line_chart_monthly,
-                social_media_platform_chart,
+                monthly_lazy.view,
+                social_media_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Same height as the previous row
                 margin=(5, 5)  # No margins
             ),
             pn.Row(
-                matchday_wisereport,
+                matchday_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Consistent height
                 margin=(5, 5)  # No margins
@@ -660,23 +991,24 @@ def create_dashboard(combined_data):
             telegram_filters_section,
             loading_overlay,
             telegram_section,
-            topfixtures_telegram_barchart,
+            distinct_counts_section,
+            telegram_top_fixtures_lazy.view,
             pn.Row(
-                topDomains_telegram_bySubscribers,
-                telegram_chart_top_properties,
+                domains_lazy.view,
+                top_property_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Uniform height
                 margin=(5, 5)  # No margins
             ),
             pn.Row(
-                telegram_channeltype_chart,
-                top_fixture_donut_plot,
+                channel_type_lazy.view,
+                donut_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Consistent height
                 margin=(5, 5)  # No margins
             ),
             pn.Row(
-                telegram_line_graph_plot,
+                telegram_monthly_lazy.view,
                 sizing_mode="stretch_width",
                 height=450,  # Consistent height
                 margin=(5, 5)  # No margins
@@ -687,23 +1019,105 @@ def create_dashboard(combined_data):
         )),
     )
 
-    sent_email.on_click(lambda event: sendEmail_function(combined_data))
+    # The report is aggregated, rendered and sent on the refresh executor, so the IO loop keeps
+    # serving every session meanwhile; the button is off until it's done
+    async def send_report(event):
+        sent_email.disabled = True
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                refresh_executor, lambda: sendEmail_function(source.rows(), chart_cache=chart_cache))
+        except Exception as e:
+            logging.error(f"Error sending the report: {e}")
+        finally:
+            sent_email.disabled = False
+
+    sent_email.on_click(send_report)
 
+    TAB_UPDATES = {SUMMARY_TAB: update_summary, TELEGRAM_TAB: telegramUpdate_summary}
     dashboard_tabs.param.watch(refresh_tab, 'active')
+
+    # New rows appended to this dataset: refresh the filter options and whatever has been rendered.
+    # Appends arrive on an upload thread, so the work is scheduled onto this session's document.
+    doc = pn.state.curdoc
+    shown_range = [first_timestamp, last_timestamp]
+
+    async def apply_new_data():
+        first_timestamp, last_timestamp = source.timestamp_range()
+        propertyname_filter.options = ['All'] + source.distinct('propertyname')
+        fixtures_filter.options = source.distinct('fixtures')
+        # A range that covered all data before keeps covering all data, so the new rows are included
+        if not start_date_filter.value or start_date_filter.value <= shown_range[0]:
+            start_date_filter.value = first_timestamp
+        if not end_date_filter.value or end_date_filter.value >= shown_range[1]:
+            end_date_filter.value = last_timestamp
+        shown_range[:] = [first_timestamp, last_timestamp]
+        # Every tab is out of date; the open one is recomputed now, the others when they're opened
+        rendered = dict(computed_filters)
+        computed_filters.clear()
+        if dashboard_tabs.active in rendered:
+            await TAB_UPDATES[dashboard_tabs.active]()
+
+    def on_data_changed(changed_source, added_rows):
+        logging.info(f"Session picking up {len(added_rows)} new rows")
+        if doc is not None:
+            doc.add_next_tick_callback(apply_new_data)
+
+    if track_memory is not None:
+        track_memory(lambda: session_overhead(data_table.value, source))
+
+    source.subscribe(on_data_changed)
+    if doc is not None:
+        doc.on_session_destroyed(lambda session_context: source.unsubscribe(on_data_changed))
        
     return dashboard_tabs
 
 
-# Function to run the Panel server
-def run_panel_server(combined_data):
-    def modify_doc(doc):
-        dashboard = create_dashboard(combined_data)
-        dashboard.server_doc(doc)
+# Function to find the dataset a dashboard session shows: its ?dataset= argument, or the latest upload
+def session_dataset(session_context):
+    arguments = session_context.request.arguments if session_context else {}
+    return arguments['dataset'][0].decode() if arguments.get('dataset') else data_store.latest_dataset()
 
+
+# Loads a session's dataset before its document is built. Bokeh awaits on_session_created on the IO
+# loop, so the load runs on a worker thread and the loop keeps serving the other sessions meanwhile.
+class DatasetLoadHandler(Handler):
+
+    def modify_document(self, doc):
+        pass
+
+    async def on_session_created(self, session_context):
+        def load():
+            dataset_id = session_dataset(session_context)
+            if dataset_id is not None and data_store.has_dataset(dataset_id):
+                dashboard_datasets.load(dataset_id)
+        await asyncio.get_running_loop().run_in_executor(None, load)
+
+
+# Function to build one dashboard session for the dataset named in its ?dataset= argument
+def modify_doc(doc):
+    dataset_id = session_dataset(doc.session_context)
+    if dataset_id is None or not data_store.has_dataset(dataset_id):
+        pn.pane.Markdown(f"Unknown dataset: {dataset_id}").server_doc(doc)
+        return
+
+    session_id = doc.session_context.id if doc.session_context else None
+    source = dashboard_datasets.acquire(dataset_id, session_id)
+    doc.on_session_destroyed(lambda session_context: dashboard_datasets.release(dataset_id, session_id))
+    dashboard = create_dashboard(
+        source, track_memory=lambda sizer: dashboard_datasets.track_session(dataset_id, session_id, sizer))
+    dashboard.server_doc(doc)
+
+
+# Function to run the Panel server, once for the whole app
+def run_panel_server():
+    # The server runs on its own thread, which needs its own event loop
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    if app.config['CHART_RENDER_WORKERS'] > 1:
+        start_render_pool(app.config['CHART_RENDER_WORKERS'], ['summary', 'socialMedia', 'telegram'])
     try:
         server = Server(
-            {'/bokeh_app': modify_doc},
-            port=5002, 
+            {'/bokeh_app': Application(DatasetLoadHandler(), FunctionHandler(modify_doc))},
+            port=app.config['PANEL_PORT'], 
             
             allow_websocket_origin=[
                 "127.0.0.1:5000",
@@ -728,6 +1142,25 @@ def run_panel_server(combined_data):
 
 
 
+_panel_server_thread = None
+_panel_server_lock = Lock()
+
+
+# Function to start the Panel server the first time it is needed, however the app is served
+# (python app.py, flask run, gunicorn); later calls return the running server's thread
+def start_panel_server():
+    global _panel_server_thread
+    with _panel_server_lock:
+        if _panel_server_thread is None:
+            _panel_server_thread = Thread(target=run_panel_server, name='panel-server')
+            _panel_server_thread.daemon = True
+            _panel_server_thread.start()
+        return _panel_server_thread
+
+
 if __name__ == '__main__':
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    app.run(host="0.0.0.0", debug=True, port=5000, threaded=True)
+    start_panel_server()
+    # gevent serves the websocket proxy; every connection is a greenlet rather than a thread
+    server = pywsgi.WSGIServer(("0.0.0.0", 5000), app, handler_class=ProxyWebSocketHandler)
+    server.serve_forever()
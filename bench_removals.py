@@ -0,0 +1,107 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingest import REMOVAL_STATUSES, STATUS_VALUES, normalize_schema
+import socialMedia
+import summary
+import telegram
+
+
+# Benchmark for the removal aggregations: times the data functions that count removals, which
+# aggregate the precomputed is_removed flag, against the per-group lambdas they replaced, on a
+# synthetic frame (1M rows over 50k URLs by default), and checks both give the same results.
+
+
+# Function to build a synthetic dataset typed like load_combined_data's output
+def make_frame(rows, urls, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'propertyname': pd.Categorical(rng.choice([f'Property {i}' for i in range(12)], rows)),
+        'fixtures': pd.Categorical(rng.choice([f'Team {i} vs Team {i + 1}' for i in range(300)], rows)),
+        'DomainName': pd.Categorical(rng.choice([f'site{i}.com' for i in range(200)], rows)),
+        'URL': pd.array([f'https://example.com/{i}' for i in rng.integers(0, urls, rows)], dtype='string[pyarrow]'),
+        'Status': pd.Categorical(rng.choice(STATUS_VALUES[:-1], rows)),
+        'Identification Timestamp': pd.Timestamp('2024-08-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit='s'),
+        'SheetName': pd.Categorical(rng.choice(['Infringing_urls', 'Source_urls', 'Telegram', 'SocialMediaPlatforms'], rows)),
+    })
+    return normalize_schema(data)
+
+
+def _removed(x):
+    return x.isin(REMOVAL_STATUSES).sum()
+
+
+def _any_removed(x):
+    return any(x.isin(REMOVAL_STATUSES))
+
+
+# The lambda-based aggregations, as the data functions were written before is_removed
+def _top_by_url_flag(data, key):
+    flags = data.groupby([key, 'URL'], observed=True).agg(removal_flag=('Status', _any_removed)).reset_index()
+    flags = flags.groupby(key, observed=True).agg(total_urls=('URL', 'count'), removal_count=('removal_flag', 'sum'))
+    return flags.reset_index().sort_values(by='total_urls', ascending=False).nlargest(5, 'total_urls')
+
+
+def _monthly(data):
+    month = data['Identification Timestamp'].dt.to_period('M').rename('Month')
+    monthly = data.groupby(month).agg(total_urls=('URL', 'count'), removal_count=('Status', _removed)).reset_index()
+    monthly['Month'] = monthly['Month'].dt.to_timestamp()
+    return monthly.sort_values(by='total_urls', ascending=False)
+
+
+BASELINES = {
+    'get_top_fixtures': lambda data: _top_by_url_flag(data, 'fixtures'),
+    'get_top_telegram_property': lambda data: _top_by_url_flag(data, 'propertyname'),
+    'get_monthly_totals': _monthly,
+    'get_sheet_summary': lambda data: data.groupby('SheetName', observed=True).agg(
+        total_urls=('URL', 'nunique'), removal_percentage=('Status', _removed)
+    ).reset_index().sort_values(by='total_urls', ascending=False),
+    'get_social_media_platform_data': lambda data: data[data['SheetName'] == 'SocialMediaPlatforms'].groupby(
+        'DomainName', observed=True).agg(total_urls=('URL', 'count'), removed_count=('Status', _removed)
+    ).reset_index().sort_values(by='total_urls', ascending=False),
+}
+
+FUNCTIONS = {
+    'get_top_fixtures': summary.get_top_fixtures,
+    'get_top_telegram_property': telegram.get_top_telegram_property,
+    'get_monthly_totals': summary.get_monthly_totals,
+    'get_sheet_summary': summary.get_sheet_summary,
+    'get_social_media_platform_data': socialMedia.get_social_media_platform_data,
+}
+
+
+def _timed(function, data, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized removal aggregations against per-group lambdas.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--urls', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    data = make_frame(args.rows, args.urls)
+    print(f"{args.rows} rows, {data['URL'].nunique()} URLs")
+    for name, function in FUNCTIONS.items():
+        expected, baseline = _timed(BASELINES[name], data, args.repeat)
+        result, vectorized = _timed(function, data, args.repeat)
+        columns = list(result.columns)
+        same = expected[columns].reset_index(drop=True).equals(result.reset_index(drop=True)) or \
+            expected[columns].sort_values(columns).reset_index(drop=True).astype(str).equals(
+                result.sort_values(columns).reset_index(drop=True).astype(str))
+        print(f"  {name:32s} lambda {baseline * 1000:9.1f} ms  vectorized {vectorized * 1000:8.1f} ms  "
+              f"x{baseline / vectorized:6.1f}  {'same' if same else 'DIFFERENT'}")
+
+
+if __name__ == '__main__':
+    main()
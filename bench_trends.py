@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from charts import png
+from summary import MonthlyTotalsChart
+from telegram import MatchdayChart
+
+
+# Benchmark for the trend chart downsampling: times rendering the monthly totals and matchday
+# line charts to PNG for long synthetic series (5000 points by default), drawing every point and
+# label as before against the downsampled charts, and reports how many points, labels and ticks
+# each one draws.
+
+
+# Function to build synthetic monthly totals, one row per month, shaped like get_monthly_totals' output
+def make_monthly(points, seed=0):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(50, 500, points) + (200 * np.sin(np.arange(points) / 12)).astype(int) + 200
+    return pd.DataFrame({
+        'Month': pd.date_range('1700-01-01', periods=points, freq='MS'),
+        'total_urls': total,
+        'removal_count': (total * rng.uniform(0.2, 0.9, points)).astype(int),
+    })
+
+
+# Function to build synthetic matchday totals, shaped like aggregate_matchday_data's output
+def make_matchdays(points, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Matchday': np.arange(1, points + 1), 'total_urls': rng.integers(10, 1000, points)})
+
+
+def _full(chart_class):
+    return type(f'Full{chart_class.__name__}', (chart_class,), dict(max_points=0, max_labels=np.inf, max_ticks=0))
+
+
+def _timed(chart_class, data, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chart = chart_class().update(data)
+        png(chart.figure, chart.dpi)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    counts = (len(chart.lines[0].get_xdata()), sum(len(labels) for labels in chart.labels), len(chart.ax.get_xticks()))
+    return counts, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the downsampled trend charts against drawing every point.")
+    parser.add_argument('--points', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    charts = {
+        'monthly totals': (MonthlyTotalsChart, make_monthly(args.points)),
+        'matchday': (MatchdayChart, make_matchdays(args.points)),
+    }
+    print(f"{args.points} points per series")
+    for name, (chart_class, data) in charts.items():
+        (points, labels, ticks), full = _timed(_full(chart_class), data, args.repeat)
+        (kept, labelled, named), downsampled = _timed(chart_class, data, args.repeat)
+        print(f"  {name:16s} every point {full * 1000:9.1f} ms ({points} points, {labels} labels, {ticks} ticks)  "
+              f"downsampled {downsampled * 1000:8.1f} ms ({kept} points, {labelled} labels, {named} ticks)  "
+              f"x{full / downsampled:6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+from bokeh.models import ColumnDataSource, FactorRange, LabelSet, Range1d
+from bokeh.plotting import figure
+from bokeh.transform import dodge
+
+from downsample import TREND_MAX_LABELS, TREND_MAX_POINTS, salient_points, trend_positions
+
+
+# Native Bokeh versions of the dashboard charts, the 'bokeh' CHART_BACKEND. Each chart keeps one
+# ColumnDataSource, so a filter change sends the browser only the values that changed (patch),
+# the rows added at the end (stream), or the new columns when the categories change, plus the
+# title and ranges, instead of a whole new PNG.
+#
+# update() only computes the new state and may run on any thread; show() applies it to the Bokeh
+# models, which belong to the session's document, so it runs on the IO loop.
+
+
+# Function to bring a ColumnDataSource up to date with data, sending as little as possible
+def update_source(source, data):
+    old = source.data
+    length = len(next(iter(data.values())))
+    old_length = len(next(iter(old.values()), []))
+    if set(old) != set(data):
+        source.data = data
+    elif old_length == length:
+        patches = {}
+        for column, values in data.items():
+            changed = [(i, value) for i, (previous, value) in enumerate(zip(old[column], values)) if previous != value]
+            if changed:
+                patches[column] = changed
+        if patches:
+            source.patch(patches)
+    elif old_length < length and all(list(old[column]) == values[:old_length] for column, values in data.items()):
+        source.stream({column: values[old_length:] for column, values in data.items()})
+    else:
+        source.data = data
+
+
+class BokehChart:
+    height = 450
+    y_axis_type = 'linear'
+    legend_location = 'top_right'
+
+    def __init__(self):
+        self.source = ColumnDataSource(data=self.empty())
+        self.figure = figure(x_range=FactorRange(), y_range=Range1d(0, 1), y_axis_type=self.y_axis_type,
+                             height=self.height, sizing_mode='stretch_width', toolbar_location=None)
+        self.figure.xaxis.major_label_orientation = 0.8
+        self.figure.xgrid.grid_line_color = None
+        self.figure.ygrid.grid_line_dash = 'dashed'
+        self.draw(self.figure)
+        self.figure.legend.location = self.legend_location
+        self.pending = None
+
+    def empty(self):
+        raise NotImplementedError
+
+    def draw(self, plot):
+        raise NotImplementedError
+
+    # Function to compute the chart's columns, categories, title and y range for data
+    def prepare(self, data, *args):
+        raise NotImplementedError
+
+    # Function to compute the next state of the chart; returns the chart
+    def update(self, data, *args):
+        self.pending = self.prepare(data, *args)
+        return self
+
+    # Function to apply the latest update to the models and show the chart in pane
+    def show(self, pane):
+        if self.pending is not None:
+            columns, factors, title, (start, end) = self.pending
+            self.pending = None
+            if list(self.figure.x_range.factors) != factors:
+                self.figure.x_range.factors = factors
+            update_source(self.source, columns)
+            self.figure.title.text = title
+            self.figure.y_range.update(start=start, end=end)
+        if pane.object is not self.figure:
+            pane.object = self.figure
+
+
+# Two series of bars side by side per category, each bar labelled with its value
+class BokehPairedBarChart(BokehChart):
+    category = None
+    series = ()
+    labels = ('Total URLs', 'Removal Count')
+    colors = ('#ff6b6b', '#4a90e2')
+    bar_width = 0.3
+    # Bars start from here, which must be above 0 on a log scale
+    bottom = 0
+
+    def empty(self):
+        columns = {'category': []}
+        for i, column in enumerate(self.series):
+            columns.update({column: [], f'label_{i}': [], f'label_y_{i}': []})
+        return columns
+
+    def draw(self, plot):
+        for i, column in enumerate(self.series):
+            x = dodge('category', (i - 0.5) * self.bar_width, range=plot.x_range)
+            plot.vbar(x=x, top=column, bottom=self.bottom, width=self.bar_width, source=self.source,
+                      color=self.colors[i], legend_label=self.labels[i])
+            plot.add_layout(LabelSet(x=x, y=f'label_y_{i}', text=f'label_{i}', source=self.source,
+                                     text_align='center', text_font_size='8pt'))
+
+    def label_y(self, heights, i):
+        return heights
+
+    def title(self, data, *args):
+        return ''
+
+    def y_range(self, data):
+        top = max([data[column].max() for column in self.series], default=0) if len(data) else 0
+        return 0, (top or 1) * 1.15
+
+    def prepare(self, data, *args):
+        factors = [str(category) for category in data[self.category]]
+        columns = {'category': factors}
+        for i, column in enumerate(self.series):
+            heights = data[column].to_numpy(dtype=float)
+            columns[column] = heights.tolist()
+            columns[f'label_{i}'] = [f'{int(height)}' for height in heights]
+            columns[f'label_y_{i}'] = self.label_y(heights, i).tolist()
+        return columns, factors, self.title(data, *args), self.y_range(data)
+
+
+# Line series over categories in order, downsampled and labelled like TrendChart
+class BokehTrendChart(BokehChart):
+    category = None
+    series = ()
+    labels = ()
+    colors = ()
+    markers = ()
+    label_colors = ()
+    label_offset = 10
+    legend_location = 'top_left'
+    title_text = ''
+    max_points = TREND_MAX_POINTS
+    max_labels = TREND_MAX_LABELS
+
+    def empty(self):
+        columns = {'category': []}
+        for i, column in enumerate(self.series):
+            columns.update({column: [], f'label_{i}': []})
+        return columns
+
+    def draw(self, plot):
+        for i, column in enumerate(self.series):
+            plot.line(x='category', y=column, source=self.source, color=self.colors[i], line_width=2.5, legend_label=self.labels[i])
+            plot.scatter(x='category', y=column, source=self.source, color=self.colors[i], marker=self.markers[i], size=8)
+            plot.add_layout(LabelSet(x='category', y=column, text=f'label_{i}', source=self.source, y_offset=self.label_offset,
+                                     text_align='center', text_font_size='9pt', text_font_style='bold',
+                                     text_color=self.label_colors[i]))
+
+    def points(self, data):
+        return data
+
+    def prepare(self, data, *args):
+        data = self.points(data)
+        values = [data[column].to_numpy(dtype=float) for column in self.series]
+        x = trend_positions(values, self.max_points, len(data))
+        factors = [str(category) for category in data[self.category].to_numpy()[x]]
+        columns = {'category': factors}
+        for i, column in enumerate(self.series):
+            kept = values[i][x]
+            columns[column] = kept.tolist()
+            # Points that are not among the most salient keep an empty label
+            labels = [''] * len(kept)
+            for position in salient_points(kept, self.max_labels):
+                labels[position] = f'{int(kept[position])}'
+            columns[f'label_{i}'] = labels
+        # Leave 20% of headroom above the highest point for the labels
+        top = max([data[column].max() for column in self.series], default=0) if len(data) else 0
+        return columns, factors, self.title_text, (0, (top or 1) * 1.2)
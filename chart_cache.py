@@ -0,0 +1,82 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+DEFAULT_MAX_BYTES = int(os.environ.get('CHART_CACHE_BYTES', 64 * 1024 * 1024))
+
+
+# Function to hash a chart's inputs by content: frames by their columns, dtypes and values,
+# anything else (titles, selected filters) by its repr
+def content_hash(inputs):
+    digest = hashlib.blake2b(digest_size=16)
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# LRU of rendered charts (PNG bytes, Plotly JSON), shared by every session and the PDF report.
+# Keys are (chart builder, hash of its inputs, render size), so the same aggregate is only
+# rendered once however many sessions or reports show it; the oldest charts are dropped once
+# the rendered bytes go over max_bytes.
+class ChartCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Function to find the rendered chart for builder's inputs at size; returns (key, chart or None)
+    def lookup(self, builder, inputs, size):
+        key = (builder, content_hash(inputs), size)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return key, value
+
+    def store(self, key, value):
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self.bytes += len(value)
+            while self.bytes > self.max_bytes and self._entries:
+                _, dropped = self._entries.popitem(last=False)
+                self.bytes -= len(dropped)
+                self.evictions += 1
+
+    # Function to return the rendered chart for builder's inputs at size, rendering and storing it on a miss
+    def get_or_render(self, builder, inputs, size, render):
+        key, value = self.lookup(builder, inputs, size)
+        if value is None:
+            value = render()
+            self.store(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,270 @@
+import importlib
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from downsample import (TREND_MAX_LABELS, TREND_MAX_POINTS, TREND_MAX_TICKS, salient_points, tick_positions,
+                        trend_positions)
+
+
+# Matplotlib charts that are built once and then updated in place. Each chart owns a Figure that
+# is not registered with pyplot, so it is freed with the chart, and an update only moves the bars,
+# line points, tick labels and value labels it already has, adding or removing artists only when
+# the number of categories changes. Subclasses set the columns and styles and do the static
+# styling in style() and the data-dependent decoration (title, limits) in decorate().
+
+
+# Function to make a figure outside pyplot's registry, with an Agg canvas to render it
+def new_figure(figsize, facecolor):
+    figure = Figure(figsize=figsize, facecolor=facecolor)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+# Function to render a figure to PNG bytes
+def png(figure, dpi):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+class Chart:
+    figsize = (12, 6)
+    facecolor = '#f2f2f2'
+    legend_style = {}
+    dpi = 144
+
+    def __init__(self):
+        self.figure = new_figure(self.figsize, self.facecolor)
+        self.ax = self.figure.add_subplot()
+        self.style(self.ax)
+
+    def style(self, ax):
+        pass
+
+    def decorate(self, data, *args):
+        pass
+
+    # Function to redraw the chart for new data; returns the chart
+    def update(self, data, *args):
+        self.draw(data)
+        self.decorate(data, *args)
+        if self.ax.get_legend() is None:
+            self.legend()
+        self.figure.tight_layout()
+        return self
+
+    def legend(self):
+        self.ax.legend(**self.legend_style)
+
+    def draw(self, data):
+        raise NotImplementedError
+
+    # Function to set the category tick labels under positions x
+    def set_categories(self, x, categories, **tick_style):
+        self.ax.set_xticks(x)
+        self.ax.set_xticklabels(list(categories), **tick_style)
+
+
+# Function to keep exactly count artists in a list, making new ones with create(i) and removing extras
+def _resize(artists, count, create):
+    while len(artists) > count:
+        artists.pop().remove()
+    while len(artists) < count:
+        artists.append(create(len(artists)))
+    return artists
+
+
+# Two series of bars side by side per category, each bar labelled with its value
+class PairedBarChart(Chart):
+    category = None
+    series = ()
+    bar_width = 0.3
+    bar_styles = ({}, {})
+    label_styles = ({}, {})
+    tick_style = {}
+
+    def __init__(self):
+        super().__init__()
+        self.bars = ([], [])
+        self.labels = ([], [])
+
+    # Function to give the label height above each bar of series i
+    def label_y(self, heights, i):
+        return heights
+
+    # One entry per series, once there are bars to show
+    def legend(self):
+        if all(self.bars):
+            self.ax.legend([bars[0].patches[0] for bars in self.bars],
+                           [style['label'] for style in self.bar_styles], **self.legend_style)
+
+    def draw(self, data):
+        x = np.arange(len(data))
+        for i, column in enumerate(self.series):
+            heights = data[column].to_numpy(dtype=float)
+            offset = (i - 0.5) * self.bar_width
+            bars = _resize(self.bars[i], len(x), lambda k, i=i: self.ax.bar(
+                0, 0, width=self.bar_width, **self.bar_styles[i]))
+            for (bar,), position, height in zip(bars, x, heights):
+                bar.set_x(position + offset - self.bar_width / 2)
+                bar.set_height(height)
+
+            labels = _resize(self.labels[i], len(x), lambda k, i=i: self.ax.text(
+                0, 0, '', ha='center', va='bottom', **self.label_styles[i]))
+            for label, position, height, y in zip(labels, x, heights, self.label_y(heights, i)):
+                label.set_position((position + offset, y))
+                label.set_text(f'{int(height)}')
+
+        self.set_categories(x, data[self.category], **self.tick_style)
+        self.ax.set_autoscale_on(True)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+
+# Line series over categories in order, each point labelled with its value. Long series are
+# downsampled (see downsample.py): only the points keeping each line's shape are drawn, only the
+# most salient of them are labelled, and only evenly spaced categories are named.
+class TrendChart(Chart):
+    category = None
+    series = ()
+    line_styles = ()
+    label_styles = ()
+    label_offset = (0, 10)
+    tick_style = {}
+    max_points = TREND_MAX_POINTS
+    max_labels = TREND_MAX_LABELS
+    max_ticks = TREND_MAX_TICKS
+
+    def __init__(self):
+        super().__init__()
+        self.lines = [self.ax.plot([], [], **style)[0] for style in self.line_styles]
+        self.labels = tuple([] for _ in self.series)
+
+    def categories(self, data):
+        return data[self.category]
+
+    def draw(self, data):
+        values = [data[column].to_numpy(dtype=float) for column in self.series]
+        x = trend_positions(values, self.max_points, len(data))
+        for i, series in enumerate(values):
+            self.lines[i].set_data(x, series[x])
+            labelled = x[salient_points(series[x], self.max_labels)]
+            labels = _resize(self.labels[i], len(labelled), lambda k, i=i: self.ax.annotate(
+                '', xy=(0, 0), xytext=self.label_offset, textcoords='offset points', ha='center', **self.label_styles[i]))
+            for label, position, value in zip(labels, labelled, series[labelled]):
+                label.xy = (position, value)
+                label.set_text(f'{int(value)}')
+
+        ticks = tick_positions(x, self.max_ticks)
+        self.set_categories(ticks, np.asarray(self.categories(data))[ticks], **self.tick_style)
+        self.ax.set_autoscale_on(True)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        # Leave 20% of headroom above the highest point for the labels
+        if len(data):
+            self.ax.set_ylim(0, max(data[column].max() for column in self.series) * 1.2)
+
+
+# Function to put monthly totals in month order, with months without rows filled in with zeros
+# and labelled as "Month Year"
+def monthly_points(monthly_data):
+    monthly_data = monthly_data.assign(Month=pd.to_datetime(monthly_data['Month']))
+    monthly_data = monthly_data.resample('M', on='Month').sum()
+    monthly_data.index = monthly_data.index.strftime('%b %Y')
+    return monthly_data.rename_axis('Month').reset_index()
+
+
+# Total URLs and removals per month, one point for every month in the range
+class MonthlyTrendChart(TrendChart):
+    facecolor = '#f9f9f9'
+    category = 'Month'
+    series = ('total_urls', 'removal_count')
+    line_styles = (
+        dict(marker='o', color='#ff6b6b', linewidth=2.5, markersize=8, label='Total URLs'),
+        dict(marker='D', color='#4a90e2', linewidth=2.5, markersize=8, label='Removal Count'),
+    )
+    label_styles = (
+        dict(fontsize=9, color='#ff6b6b', fontweight='bold'),
+        dict(fontsize=9, color='#4a90e2', fontweight='bold'),
+    )
+    tick_style = dict(rotation=45, ha='right', fontsize=10)
+    legend_style = dict(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
+    title = ''
+    title_size = 14
+
+    def style(self, ax):
+        ax.set_title(self.title, fontsize=self.title_size, fontweight='bold', pad=20)
+        ax.set_xlabel('Month', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Count', fontsize=12, fontweight='bold')
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.set_facecolor('#f0f7ff')
+
+    def update(self, monthly_data):
+        return super().update(monthly_points(monthly_data))
+
+
+# Charts are rendered in a long-lived worker pool shared by every session, spawned rather than
+# forked like the ingest pool. Each process keeps one chart per class and updates it in place;
+# a chart is drawn by one thread at a time, but charts of different classes render side by side.
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+_charts = {}
+_charts_lock = threading.Lock()
+
+
+def _get_pool(max_workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = max_workers
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _import(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+# Function to start the render pool ahead of the first render, with every worker importing the
+# modules that define the charts (spawned workers start from a bare interpreter)
+def start_pool(max_workers, modules):
+    pool = _get_pool(max_workers)
+    for _ in range(max_workers):
+        pool.submit(_import, modules)
+
+
+# Function to render a chart class for its inputs to PNG bytes, on this process's chart of that class
+def render_png(chart_class, inputs):
+    with _charts_lock:
+        if chart_class not in _charts:
+            _charts[chart_class] = (chart_class(), threading.Lock())
+        chart, lock = _charts[chart_class]
+    with lock:
+        return png(chart.update(*inputs).figure, chart.dpi)
+
+
+# Function to build a Plotly chart and return it as JSON
+def plotly_json(builder, inputs):
+    return builder(*inputs).to_json()
+
+
+# Function to start a render job (render_png or plotly_json) in the render pool; returns its future
+def submit_render(job, chart, inputs, max_workers):
+    return _get_pool(max_workers).submit(job, chart, inputs)
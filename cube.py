@@ -0,0 +1,434 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from datastore import BUNDLES
+from filter_index import TIMESTAMP_COLUMN
+from filters import Filters
+from ingest import REMOVAL_STATUSES, order_matchdays
+import sketch
+
+
+DAY_NS = 86400 * 10 ** 9
+
+# Categorical columns the cube is grouped by, along with the identification day
+DIMENSIONS = ('propertyname', 'fixtures', 'SheetName', 'DomainName', 'Status', 'Matchday', 'ChannelType', 'ChannelStatus')
+
+NAT = np.iinfo(np.int64).min
+
+# Function to pad a per-cell array with fill up to length cells (always returning a new array)
+def _grow(values, length, fill=0):
+    grown = np.full(length, fill, dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+# Function to number keys by first appearance after the ids already given out, except keys equal to
+# one of the known keys, which take that key's id. Known keys that are equal must share an id.
+def _number(known_keys, known_ids, keys, next_id):
+    frame = pd.concat([pd.DataFrame(known_keys), pd.DataFrame(keys)], ignore_index=True)
+    groups = frame.groupby(list(keys), sort=False).ngroup().to_numpy()
+    known = len(known_ids)
+    seen = int(groups[:known].max()) + 1 if known else 0
+    ids = np.empty(int(groups.max()) + 1 if len(groups) else 0, dtype=np.int64)
+    ids[groups[:known]] = known_ids
+    ids[seen:] = next_id + np.arange(len(ids) - seen)
+    return ids[groups[known:]]
+
+
+# Partitions whose sketch touches at least this many registers keep it as a dense register array
+DENSE_SKETCH_ENTRIES = (1 << sketch.PRECISION) // 4
+
+
+# Pre-aggregated counts of one frame, built once when the frame is loaded and extended with
+# only the added rows on append.
+# Rows are grouped into cells, one per (property, fixture, sheet, domain, status, matchday,
+# channel type, channel status, day) that occurs, holding the row count, URL count, views and
+# subscriber sums and the cell's first and last timestamp, plus the set of URLs seen in each cell.
+# For approximate distinct counts, cells are also grouped into coarser partitions holding a
+# HyperLogLog sketch of their URLs.
+# The data functions of summary.py, telegram.py and socialMedia.py are answered by rolling the
+# selected cells up, without touching the rows; see ROLLUPS.
+class Cube:
+
+    def __init__(self, data):
+        self.dtypes = {}
+        self.cells = 0
+        self.codes = {column: np.empty(0, dtype=np.int8) for column in DIMENSIONS}
+        self.days = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.url_rows = np.empty(0, dtype=np.int64)
+        self.urls = pd.Index([], dtype=object)
+        self.url_registers = np.empty(0, dtype=np.uint16)
+        self.url_ranks = np.empty(0, dtype=np.uint8)
+        self.sums, self.counts, self.integer = {}, {}, {}
+        self.first_seen = np.empty(0, dtype=np.int64)
+        self.last_seen = np.empty(0, dtype=np.int64)
+        self.pair_cells = np.empty(0, dtype=np.int64)
+        self.pair_urls = np.empty(0, dtype=np.int64)
+        self.partitions = np.empty(0, dtype=np.int64)
+        self.sketch_partitions = np.empty(0, dtype=np.int32)
+        self.sketch_registers = np.empty(0, dtype=np.uint16)
+        self.sketch_ranks = np.empty(0, dtype=np.uint8)
+        self.dense_partitions = np.empty(0, dtype=np.int64)
+        self.dense_sketches = np.zeros((0, 1 << sketch.PRECISION), dtype=np.uint8)
+        self._add(data)
+
+    # Function to return a cube of this cube's rows plus data's. data's categorical columns must
+    # extend this cube's categories (see ingest.conform_schema). This cube is left unchanged.
+    def extended(self, data):
+        cube = copy.copy(self)
+        cube._add(data)
+        return cube
+
+    # Every array is replaced rather than written to, so extended() can share them with the original
+    def _add(self, data):
+        dtypes, codes = {}, {}
+        for column in DIMENSIONS:
+            values = data[column].astype('category')
+            previous = self.dtypes.get(column)
+            if previous is not None and not values.dtype.categories[:len(previous.categories)].equals(previous.categories):
+                raise ValueError(f"Rows added to the cube must extend its {column} categories")
+            dtypes[column] = values.dtype
+            codes[column] = values.cat.codes.to_numpy()
+        timestamps = data[TIMESTAMP_COLUMN].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes['day'] = np.where(timestamps == NAT, NAT, timestamps // DAY_NS)
+
+        # Existing cells keep their ids and cells not seen before are numbered after them. A row can
+        # only fall in an existing cell of its own day, so only those cells are matched against.
+        candidates = np.flatnonzero(np.isin(self.days, np.unique(codes['day'])))
+        known_keys = {column: self.codes[column][candidates] for column in DIMENSIONS}
+        known_keys['day'] = self.days[candidates]
+        cells = _number(known_keys, candidates, codes, self.cells)
+        total = max(int(cells.max()) + 1 if len(cells) else 0, self.cells)
+        new_cells, first = np.unique(cells, return_index=True)
+        first = first[new_cells >= self.cells]
+
+        self.dtypes = dtypes
+        self.codes = {column: np.concatenate([self.codes[column], codes[column][first]]) for column in DIMENSIONS}
+        self.days = np.concatenate([self.days, codes['day'][first]])
+        self.rows = _grow(self.rows, total) + np.bincount(cells, minlength=total)
+
+        # URLs keep their codes; URLs not seen before are numbered after them
+        url_codes = self.urls.get_indexer(pd.Index(data['URL']))
+        unseen = (url_codes < 0) & data['URL'].notna().to_numpy()
+        unseen_codes, new_urls = pd.factorize(data['URL'][unseen])
+        url_codes[unseen] = len(self.urls) + unseen_codes
+        new_urls = pd.Index(new_urls, dtype=object)
+        new_registers, new_ranks = sketch.registers_and_ranks(new_urls)
+        self.urls = self.urls.append(new_urls)
+        self.url_registers = np.concatenate([self.url_registers, new_registers])
+        self.url_ranks = np.concatenate([self.url_ranks, new_ranks])
+        has_url = url_codes >= 0
+        self.url_rows = _grow(self.url_rows, total) + np.bincount(cells[has_url], minlength=total)
+
+        sums, counts, integer = {}, {}, {}
+        for column in ('views', 'channelsubscribers'):
+            values = pd.to_numeric(data[column], errors='coerce')
+            integer[column] = self.integer.get(column, True) and pd.api.types.is_integer_dtype(values.dtype)
+            values = values.to_numpy(dtype='float64', na_value=np.nan)
+            valid = ~np.isnan(values)
+            sums[column] = _grow(self.sums.get(column, np.empty(0)), total) + \
+                np.bincount(cells[valid], weights=values[valid], minlength=total)
+            counts[column] = _grow(self.counts.get(column, np.empty(0, dtype=np.int64)), total) + \
+                np.bincount(cells[valid], minlength=total)
+        self.sums, self.counts, self.integer = sums, counts, integer
+
+        span = pd.Series(timestamps).groupby(cells).agg(['min', 'max'])
+        first_seen = _grow(self.first_seen, total, np.iinfo(np.int64).max)
+        last_seen = _grow(self.last_seen, total, NAT)
+        first_seen[span.index] = np.minimum(first_seen[span.index], span['min'].to_numpy())
+        last_seen[span.index] = np.maximum(last_seen[span.index], span['max'].to_numpy())
+        self.first_seen, self.last_seen = first_seen, last_seen
+        self.cells = total
+        self.timed = self.first_seen != NAT
+        days = np.where(self.timed, self.days, 0).astype('datetime64[D]')
+        self.months = days.astype('datetime64[M]')
+
+        # Distinct (cell, URL) pairs; only the cells the new rows fall in can already hold a new pair
+        width = max(len(self.urls), 1)
+        pairs = np.unique(cells[has_url].astype(np.int64) * width + url_codes[has_url])
+        touched = np.zeros(total, dtype=bool)
+        touched[cells] = True
+        known = touched[self.pair_cells]
+        pairs = np.setdiff1d(pairs, self.pair_cells[known] * width + self.pair_urls[known], assume_unique=True)
+        self.pair_cells = np.concatenate([self.pair_cells, pairs // width])
+        self.pair_urls = np.concatenate([self.pair_urls, pairs % width])
+
+        # Partitions merge the cells that only differ in columns no filter or sketched count
+        # tells apart, so every selection is still a set of whole partitions. Existing partitions
+        # keep their ids; a new cell can only join one of its own day.
+        old_cells = len(self.partitions)
+        candidates = candidates[candidates < old_cells]
+        keys = self._partition_keys(candidates)
+        new_keys = self._partition_keys(np.arange(old_cells, self.cells))
+        partitions = int(self.partitions.max()) + 1 if old_cells else 0
+        self.partitions = np.concatenate([
+            self.partitions, _number(keys, self.partitions[candidates], new_keys, partitions)])
+        self._add_to_sketches(pairs // width, pairs % width)
+
+    # Function to get the keys cells are partitioned by
+    def _partition_keys(self, cells):
+        keys = {column: self.codes[column][cells] for column in ('propertyname', 'fixtures', 'SheetName')}
+        keys['day'] = self.days[cells]
+        keys['removed'] = np.isin(self.codes['Status'][cells], self._lookup('Status', REMOVAL_STATUSES))
+        keys['suspended'] = np.isin(self.codes['ChannelStatus'][cells], self._lookup('ChannelStatus', ['Suspended']))
+        return keys
+
+    # Function to add (cell, URL) pairs to the partitions' HyperLogLog sketches: the highest rank
+    # seen in each register a partition's URLs touch
+    def _add_to_sketches(self, pair_cells, pair_urls):
+        size = 1 << sketch.PRECISION
+        partitions = int(self.partitions.max()) + 1 if self.cells else 0
+        registers = self.partitions[pair_cells].astype(np.int64) * size + self.url_registers[pair_urls]
+        ranks = self.url_ranks[pair_urls]
+
+        # The touched partitions are laid out again from their old entries and the new ones
+        touched = np.zeros(partitions, dtype=bool)
+        touched[self.partitions[pair_cells]] = True
+        old_sparse = touched[self.sketch_partitions]
+        old_dense = touched[self.dense_partitions]
+        dense_rows, dense_registers = np.nonzero(self.dense_sketches[old_dense])
+        registers = np.concatenate([
+            registers,
+            self.sketch_partitions[old_sparse].astype(np.int64) * size + self.sketch_registers[old_sparse],
+            self.dense_partitions[old_dense][dense_rows].astype(np.int64) * size + dense_registers])
+        ranks = np.concatenate([ranks, self.sketch_ranks[old_sparse],
+                                self.dense_sketches[old_dense][dense_rows, dense_registers]])
+        highest = pd.Series(ranks).groupby(registers).max()
+        sketch_partitions = (highest.index.to_numpy() >> sketch.PRECISION).astype(np.int32)
+        sketch_registers = (highest.index.to_numpy() & (size - 1)).astype(np.uint16)
+        sketch_ranks = highest.to_numpy().astype(np.uint8)
+
+        # Large partitions are merged as whole register arrays, small ones entry by entry
+        entries = np.bincount(sketch_partitions, minlength=partitions)
+        dense = entries[sketch_partitions] >= DENSE_SKETCH_ENTRIES
+        new_dense = np.flatnonzero(entries >= DENSE_SKETCH_ENTRIES)
+        new_sketches = np.zeros((len(new_dense), size), dtype=np.uint8)
+        new_sketches[np.searchsorted(new_dense, sketch_partitions[dense]), sketch_registers[dense]] = sketch_ranks[dense]
+
+        kept = ~old_dense
+        dense_partitions = np.concatenate([self.dense_partitions[kept], new_dense])
+        order = np.argsort(dense_partitions, kind='stable')
+        self.dense_partitions = dense_partitions[order]
+        self.dense_sketches = np.concatenate([self.dense_sketches[kept], new_sketches])[order]
+        self.sketch_partitions = np.concatenate([self.sketch_partitions[~old_sparse], sketch_partitions[~dense]])
+        self.sketch_registers = np.concatenate([self.sketch_registers[~old_sparse], sketch_registers[~dense]])
+        self.sketch_ranks = np.concatenate([self.sketch_ranks[~old_sparse], sketch_ranks[~dense]])
+
+    def nbytes(self):
+        arrays = [self.rows, self.url_rows, self.url_registers, self.url_ranks, self.days,
+                  self.first_seen, self.last_seen, self.timed, self.months,
+                  self.pair_cells, self.pair_urls, self.partitions, self.sketch_partitions, self.sketch_registers, self.sketch_ranks,
+                  self.dense_partitions, self.dense_sketches,
+                  *self.codes.values(), *self.sums.values(), *self.counts.values()]
+        return int(sum(array.nbytes for array in arrays))
+
+    def _lookup(self, column, labels):
+        codes = self.dtypes[column].categories.get_indexer(list(labels))
+        return codes[codes >= 0]
+
+    # Function to mark the cells in a filter state (and optionally a sheet). Returns None when the
+    # date range cuts through a cell, as a day can't be split without going back to the rows.
+    def select(self, filters=Filters(), sheet=None):
+        selected = np.ones(self.cells, dtype=bool)
+        for column, labels in (('propertyname', [filters.property] if filters.property is not None else None),
+                               ('fixtures', filters.fixtures or None),
+                               ('SheetName', [sheet] if sheet is not None else None)):
+            if labels is not None:
+                selected &= np.isin(self.codes[column], self._lookup(column, labels))
+        if filters.start is not None:
+            start, end = pd.Timestamp(filters.start).as_unit('ns').value, pd.Timestamp(filters.end).as_unit('ns').value
+            inside = self.timed & (self.first_seen >= start) & (self.last_seen <= end)
+            outside = ~self.timed | (self.last_seen < start) | (self.first_seen > end)
+            if (selected & ~inside & ~outside).any():
+                return None
+            selected &= inside
+        return selected
+
+    def _only(self, selected, column, labels):
+        return selected & np.isin(self.codes[column], self._lookup(column, labels))
+
+    def _removed(self, selected):
+        return self._only(selected, 'Status', REMOVAL_STATUSES)
+
+    # Function to total a per-cell measure over the selected cells, per category of column
+    def _totals(self, column, selected, measure):
+        codes = self.codes[column][selected]
+        known = codes >= 0
+        return np.bincount(codes[known], weights=measure[selected][known],
+                           minlength=len(self.dtypes[column].categories))
+
+    def _sum(self, measure, selected):
+        total = self.sums[measure][selected].sum()
+        return np.int64(total) if self.integer[measure] else total
+
+    def _nunique(self, column, selected):
+        codes = self.codes[column][selected]
+        return np.unique(codes[codes >= 0]).size
+
+    # Function to count the distinct URLs of the selected cells, overall or per category of column
+    def _distinct_urls(self, selected, column=None):
+        in_selection = selected[self.pair_cells]
+        urls = self.pair_urls[in_selection]
+        if column is None:
+            seen = np.zeros(len(self.urls), dtype=bool)
+            seen[urls] = True
+            return int(seen.sum())
+        groups = self.codes[column][self.pair_cells[in_selection]]
+        known = groups >= 0
+        pairs = np.unique(groups[known].astype(np.int64) * len(self.urls) + urls[known])
+        return np.bincount(pairs // max(len(self.urls), 1), minlength=len(self.dtypes[column].categories))
+
+    # Function to estimate the distinct URLs of the selected cells by merging their partitions' sketches
+    def _estimated_urls(self, selected):
+        partitions = np.zeros(int(self.partitions.max()) + 1 if self.cells else 0, dtype=bool)
+        partitions[self.partitions[selected]] = True
+        in_selection = partitions[self.sketch_partitions]
+        merged = sketch.merge(self.sketch_registers[in_selection], self.sketch_ranks[in_selection])
+        dense = partitions[self.dense_partitions]
+        if dense.any():
+            np.maximum(merged, self.dense_sketches[dense].max(axis=0), out=merged)
+        return sketch.estimate(merged)
+
+    def _url_count(self, selected, approximate):
+        return self._estimated_urls(selected) if approximate else self._distinct_urls(selected)
+
+    # Function to lay out per-category totals like groupby(column, observed=True).agg(...).reset_index()
+    def _grouped(self, column, observed, **totals):
+        codes = np.flatnonzero(observed)
+        frame = pd.DataFrame({column: pd.Categorical.from_codes(codes, dtype=self.dtypes[column])})
+        for name, values in totals.items():
+            frame[name] = values[codes]
+        return frame
+
+    def _counts(self, values):
+        return values.astype(np.int64)
+
+    def _measure_totals(self, column, selected, measure):
+        totals = self._totals(column, selected, self.sums[measure])
+        return totals.astype(np.int64) if self.integer[measure] else totals
+
+    def _monthly(self, selected):
+        selected = selected & self.timed
+        months, groups = np.unique(self.months[selected], return_inverse=True)
+        removed = self._removed(selected)[selected]
+        frame = pd.DataFrame({
+            'Month': months.astype('datetime64[ns]'),
+            'total_urls': np.bincount(groups, weights=self.url_rows[selected], minlength=len(months)).astype(np.int64),
+            'removal_count': np.bincount(groups, weights=np.where(removed, self.rows[selected], 0), minlength=len(months)).astype(np.int64),
+        })
+        return frame.sort_values(by='total_urls', ascending=False)
+
+    def _top_by_urls(self, column, selected, removals=True):
+        urls = self._distinct_urls(selected, column)
+        totals = {'total_urls': urls}
+        if removals:
+            totals['removal_count'] = self._distinct_urls(self._removed(selected), column)
+        summary = self._grouped(column, urls > 0, **totals).sort_values(by='total_urls', ascending=False)
+        return summary.nlargest(5, 'total_urls')[[column, *totals]]
+
+    def calculate_summary(self, selected, approximate=False):
+        total_infringements = self._url_count(selected, approximate)
+        approved_removed = self._url_count(self._removed(selected), approximate)
+        removal_percentage = min((approved_removed / total_infringements) * 100, 100) if total_infringements > 0 else 0
+        return (self._nunique('propertyname', selected), self._nunique('fixtures', selected), total_infringements,
+                self._nunique('DomainName', selected), removal_percentage)
+
+    def get_sheet_summary(self, selected):
+        return self._grouped('SheetName', self._totals('SheetName', selected, self.rows) > 0,
+                             total_urls=self._distinct_urls(selected, 'SheetName'),
+                             removal_percentage=self._counts(self._totals('SheetName', self._removed(selected), self.rows)),
+                             ).sort_values(by='total_urls', ascending=False)
+
+    def get_top_fixtures(self, selected):
+        return self._top_by_urls('fixtures', selected)
+
+    def get_monthly_totals(self, selected):
+        return self._monthly(selected)
+
+    def calculate_telegram_summary(self, selected, approximate=False):
+        total_infringements = self._url_count(selected, approximate)
+        approved_removed = self._url_count(self._removed(selected), approximate)
+        removal_percentage = min((approved_removed / total_infringements) * 100, 100) if total_infringements > 0 else 0
+        suspended = self._url_count(self._only(selected, 'ChannelStatus', ['Suspended']), approximate)
+        return (self._sum('channelsubscribers', self._removed(selected)), self._sum('channelsubscribers', selected),
+                suspended, self._nunique('fixtures', selected), total_infringements,
+                self._nunique('propertyname', selected), self._nunique('DomainName', selected),
+                removal_percentage, self._sum('views', selected))
+
+    def get_top_telegram_property(self, selected):
+        return self._top_by_urls('propertyname', selected)
+
+    def get_telegram_top_fixtures(self, selected):
+        return self._top_by_urls('fixtures', self._only(selected, 'SheetName', ['Telegram']), removals=False)
+
+    def telegram_monthly_totals(self, selected):
+        return self._monthly(self._only(selected, 'SheetName', ['Telegram']))
+
+    def aggregate_matchday_data(self, selected):
+        return order_matchdays(self._grouped('Matchday', self._totals('Matchday', selected, self.rows) > 0,
+                                             total_urls=self._counts(self._totals('Matchday', selected, self.url_rows))))
+
+    def telegram_domains_by_subscribers(self, selected):
+        selected = self._only(selected, 'SheetName', ['Telegram'])
+        summary = self._grouped('DomainName', self._totals('DomainName', selected, self.rows) > 0,
+                                total_subscribers=self._measure_totals('DomainName', selected, 'channelsubscribers'))
+        return summary.nlargest(10, 'total_subscribers')
+
+    def top_fixtures_donut_chart(self, selected):
+        selected = self._only(selected, 'SheetName', ['Telegram'])
+        summary = self._grouped('fixtures', self._totals('fixtures', selected, self.counts['views']) > 0,
+                                views=self._measure_totals('fixtures', selected, 'views'))
+        summary = summary.sort_values(by='views', ascending=False)
+        return summary.nlargest(5, 'views')[['fixtures', 'views']]
+
+    def get_channel_type_summary(self, selected):
+        selected = self._only(self._only(selected, 'SheetName', ['Telegram']), 'ChannelType', ['Public', 'Private'])
+        counts = pd.Series(self._counts(self._totals('ChannelType', selected, self.rows)), name='count',
+                           index=pd.CategoricalIndex(self.dtypes['ChannelType'].categories,
+                                                     dtype=self.dtypes['ChannelType'], name='ChannelType'))
+        channeltype_summary = counts.sort_values(ascending=False)
+        channeltype_summary = channeltype_summary[channeltype_summary > 0].reset_index()
+        channeltype_summary.columns = ['ChannelType', 'count']
+        return channeltype_summary
+
+    def get_social_media_platform_data(self, selected):
+        selected = self._only(selected, 'SheetName', ['SocialMediaPlatforms'])
+        return self._grouped('DomainName', self._totals('DomainName', selected, self.rows) > 0,
+                             total_urls=self._counts(self._totals('DomainName', selected, self.url_rows)),
+                             removed_count=self._counts(self._totals('DomainName', self._removed(selected), self.rows)),
+                             ).sort_values(by='total_urls', ascending=False)
+
+    def _rollup(self, name, selected, approximate):
+        if approximate and name in APPROXIMATE_ROLLUPS:
+            return ROLLUPS[name](self, selected, approximate=True)
+        return ROLLUPS[name](self, selected)
+
+    # Function to answer a data function or bundle (see ROLLUPS and datastore.BUNDLES) from the
+    # cube, or None when it can't be (the date range splits a day), in which case the caller falls
+    # back to the rows. With approximate, the KPI distinct URL counts come from the sketches and
+    # bundles report their relative standard error as 'distinct_error'.
+    def answer(self, name, filters=Filters(), sheet=None, approximate=False):
+        selected = self.select(filters, sheet)
+        if selected is None:
+            return None
+        if name not in BUNDLES:
+            return self._rollup(name, selected, approximate)
+        result = {member: self._rollup(member, selected, approximate) for member in BUNDLES[name]}
+        if approximate:
+            result['distinct_error'] = sketch.relative_error()
+        return result
+
+
+# The data functions the cube answers, under the same names as frame_source.FRAME_QUERIES
+ROLLUPS = {name: getattr(Cube, name) for name in (
+    'calculate_summary', 'get_sheet_summary', 'get_top_fixtures', 'get_monthly_totals',
+    'calculate_telegram_summary', 'get_top_telegram_property', 'get_telegram_top_fixtures',
+    'telegram_monthly_totals', 'aggregate_matchday_data', 'telegram_domains_by_subscribers',
+    'top_fixtures_donut_chart', 'get_channel_type_summary', 'get_social_media_platform_data',
+)}
+
+# Rollups whose distinct URL counts can come from the sketches instead
+APPROXIMATE_ROLLUPS = ('calculate_summary', 'calculate_telegram_summary')
@@ -0,0 +1,353 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from filters import Filters
+from ingest import DASHBOARD_COLUMNS, DERIVED_COLUMNS, REMOVAL_STATUSES, apply_dtype_plan, normalize_schema
+
+
+DEFAULT_DB_PATH = os.environ.get('DASHBOARD_DB', os.path.join('data', 'dashboard.sqlite'))
+
+# Every row keeps the dataset (upload) it came from; timestamps are fixed-width text so they sort.
+# Workbook columns outside STORE_COLUMNS are kept together as one JSON object per row in 'extra'.
+STORE_COLUMNS = DASHBOARD_COLUMNS + ['SheetName']
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id TEXT PRIMARY KEY,
+    created TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS infringements (
+    dataset_id TEXT NOT NULL,
+    propertyname TEXT,
+    fixtures TEXT,
+    DomainName TEXT,
+    URL TEXT,
+    Status TEXT,
+    "Identification Timestamp" TEXT NOT NULL,
+    Matchday TEXT,
+    ChannelType TEXT,
+    ChannelStatus TEXT,
+    views NUMERIC,
+    channelsubscribers NUMERIC,
+    SheetName TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_infringements_property ON infringements (dataset_id, propertyname);
+CREATE INDEX IF NOT EXISTS ix_infringements_fixtures ON infringements (dataset_id, fixtures);
+CREATE INDEX IF NOT EXISTS ix_infringements_sheet ON infringements (dataset_id, SheetName, "Identification Timestamp");
+CREATE INDEX IF NOT EXISTS ix_infringements_timestamp ON infringements (dataset_id, "Identification Timestamp");
+CREATE INDEX IF NOT EXISTS ix_infringements_url ON infringements (dataset_id, SheetName, URL);
+"""
+
+# URL that clean_data gives rows without one; such rows can't be told apart, so merges never skip them
+MISSING_URL = 'Unknown'
+
+# Columns whose unfiltered distinct values feed the filter widgets
+OPTION_COLUMNS = ['propertyname', 'fixtures']
+
+# Data functions computed together for one dashboard tab, queried as one result under the bundle's name
+BUNDLES = {
+    'summary_bundle': ['calculate_summary', 'get_sheet_summary', 'get_top_fixtures', 'get_monthly_totals',
+                       'get_social_media_platform_data', 'aggregate_matchday_data'],
+    'telegram_bundle': ['calculate_telegram_summary', 'get_telegram_top_fixtures', 'get_top_telegram_property',
+                        'telegram_domains_by_subscribers', 'telegram_monthly_totals', 'top_fixtures_donut_chart',
+                        'get_channel_type_summary'],
+}
+
+REMOVED = f"Status IN ({', '.join(repr(s) for s in REMOVAL_STATUSES)})"
+TS = '"Identification Timestamp"'
+
+
+# Embedded SQLite store holding every uploaded dataset on disk
+class DataStore:
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_lock = threading.Lock()
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            # Stores created before pass-through columns were kept lack the 'extra' column
+            if 'extra' not in [column[1] for column in conn.execute('PRAGMA table_info(infringements)')]:
+                conn.execute('ALTER TABLE infringements ADD COLUMN extra TEXT')
+            # A unique URL + SheetName index would make uploads drop rows; stores that have one lose it
+            conn.execute('DROP INDEX IF EXISTS ux_infringements_url')
+
+    # One short-lived connection per operation keeps the store safe to use from any thread
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _to_rows(combined_data, dataset_id):
+        rows = combined_data.reindex(columns=STORE_COLUMNS)
+        rows = rows.astype({column: object for column in rows.columns if isinstance(rows[column].dtype, pd.CategoricalDtype)})
+        rows['Identification Timestamp'] = rows['Identification Timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+        rows.insert(0, 'dataset_id', dataset_id)
+        extras = [column for column in combined_data.columns if column not in STORE_COLUMNS + DERIVED_COLUMNS]
+        rows['extra'] = combined_data[extras].to_json(
+            orient='records', lines=True, date_format='iso', default_handler=str).splitlines() if extras else None
+        return rows
+
+    # Function to append a cleaned frame as a dataset; a new dataset id is created unless one is given
+    def append(self, combined_data, dataset_id=None):
+        dataset_id = dataset_id or uuid.uuid4().hex
+        rows = self._to_rows(combined_data, dataset_id)
+
+        with self._write_lock, closing(self.connect()) as conn, conn:
+            conn.execute("INSERT OR IGNORE INTO datasets (id, created) VALUES (?, ?)",
+                         (dataset_id, datetime.now().isoformat(timespec='seconds')))
+            rows.to_sql('infringements', conn, if_exists='append', index=False, chunksize=10000)
+            conn.execute("UPDATE datasets SET rows = rows + ? WHERE id = ?", (len(rows), dataset_id))
+        logging.info(f"Stored {len(rows)} rows in dataset {dataset_id}")
+        return dataset_id
+
+    # Function to merge a cleaned frame into an existing dataset, skipping every row whose
+    # URL + SheetName is already stored or comes earlier in the frame. Rows without a URL are
+    # always added. Returns the rows that were added.
+    def merge(self, combined_data, dataset_id):
+        rows = self._to_rows(combined_data, dataset_id).reset_index(drop=True)
+        has_url = rows['URL'].notna() & (rows['URL'] != MISSING_URL)
+        rows = rows[~(has_url & rows.duplicated(['SheetName', 'URL']))]
+        staging = f"incoming_{uuid.uuid4().hex}"
+        columns = ', '.join(f'"{column}"' for column in rows.columns)
+
+        with self._write_lock, closing(self.connect()) as conn, conn:
+            rows.to_sql(staging, conn, index=True, index_label='position', chunksize=10000)
+            conn.execute(f"""
+                DELETE FROM {staging} WHERE URL IS NOT NULL AND URL != ? AND EXISTS (
+                    SELECT 1 FROM infringements i
+                    WHERE i.dataset_id = ? AND i.SheetName = {staging}.SheetName AND i.URL = {staging}.URL)""",
+                (MISSING_URL, dataset_id))
+            added = pd.read_sql_query(f"SELECT position FROM {staging} ORDER BY position", conn)['position'].to_numpy()
+            conn.execute(f"INSERT INTO infringements ({columns}) SELECT {columns} FROM {staging} ORDER BY position")
+            conn.execute(f"DROP TABLE {staging}")
+            conn.execute("UPDATE datasets SET rows = rows + ? WHERE id = ?", (len(added), dataset_id))
+
+        logging.info(f"Merged {len(added)} new rows into dataset {dataset_id} ({len(combined_data) - len(added)} duplicates skipped)")
+        return combined_data.iloc[added]
+
+    def latest_dataset(self):
+        latest = self.read_sql("SELECT id FROM datasets ORDER BY created DESC, rowid DESC LIMIT 1")
+        return latest['id'].iloc[0] if len(latest) else None
+
+    def has_dataset(self, dataset_id):
+        return len(self.read_sql("SELECT 1 FROM datasets WHERE id = ?", (dataset_id,))) > 0
+
+    def datasets(self):
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query("SELECT * FROM datasets ORDER BY created DESC", conn)
+
+    def delete(self, dataset_id):
+        with self._write_lock, closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM infringements WHERE dataset_id = ?", (dataset_id,))
+            conn.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
+
+    def read_sql(self, sql, params=()):
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+
+# Read side of one dataset. The dashboard asks it for the result of a named data function under a
+# filter state, and the predicates and group-bys run inside SQLite instead of in the dashboard process.
+# Option lists and the timestamp range are kept in memory and updated from each appended batch;
+# open sessions subscribe to hear about new data.
+class StoreSource:
+
+    def __init__(self, store, dataset_id, cache=None):
+        self.store = store
+        self.dataset_id = dataset_id
+        self.cache = cache
+        self.version = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._options = {column: set(self._distinct(column)) for column in OPTION_COLUMNS}
+        self._range = self._timestamp_range()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # Function to merge newly uploaded rows into this dataset and notify open sessions
+    def append(self, combined_data):
+        added = self.store.merge(combined_data, self.dataset_id)
+        if added.empty:
+            return added
+
+        with self._lock:
+            for column in OPTION_COLUMNS:
+                self._options[column].update(added[column].dropna().unique())
+            first, last = added['Identification Timestamp'].min(), added['Identification Timestamp'].max()
+            self._range = (min(self._range[0], first), max(self._range[1], last))
+            self.version += 1
+            listeners = list(self._listeners)
+        if self.cache is not None:
+            self.cache.invalidate(self.dataset_id)
+
+        for callback in listeners:
+            try:
+                callback(self, added)
+            except Exception as e:
+                logging.error(f"Error notifying session about new data: {e}")
+        return added
+
+    def _where(self, filters, sheet=None):
+        clauses, params = ['dataset_id = ?'], [self.dataset_id]
+        if sheet is not None:
+            clauses.append('SheetName = ?')
+            params.append(sheet)
+        if filters.property is not None:
+            clauses.append('propertyname = ?')
+            params.append(filters.property)
+        if filters.fixtures:
+            clauses.append(f"fixtures IN ({', '.join('?' * len(filters.fixtures))})")
+            params.extend(filters.fixtures)
+        if filters.start is not None:
+            clauses.append(f'{TS} BETWEEN ? AND ?')
+            params.extend([filters.start.strftime(TIMESTAMP_FORMAT), filters.end.strftime(TIMESTAMP_FORMAT)])
+        return ' AND '.join(clauses), params
+
+    # Function to fetch the filtered rows themselves, typed like combined_data
+    def rows(self, filters=Filters(), sheet=None):
+        where, params = self._where(filters, sheet)
+        quoted = ', '.join(f'"{column}"' for column in STORE_COLUMNS + ['extra'])
+        data = self.store.read_sql(f"SELECT {quoted} FROM infringements WHERE {where} ORDER BY rowid", params)
+        data['Identification Timestamp'] = pd.to_datetime(data['Identification Timestamp'], format=TIMESTAMP_FORMAT)
+        # Pass-through columns go back in before SheetName, where ingest puts them
+        extras = pd.DataFrame.from_records([json.loads(extra) if extra else {} for extra in data.pop('extra')],
+                                           index=data.index)
+        data = pd.concat([data.drop(columns='SheetName'), extras.infer_objects(), data['SheetName']], axis=1)
+        return normalize_schema(apply_dtype_plan(data))
+
+    def distinct(self, column, filters=Filters(), sheet=None):
+        # Unfiltered option lists are served from memory
+        if column in OPTION_COLUMNS and filters == Filters() and sheet is None:
+            with self._lock:
+                return sorted(self._options[column])
+        return self._distinct(column, filters, sheet)
+
+    def _distinct(self, column, filters=Filters(), sheet=None):
+        where, params = self._where(filters, sheet)
+        values = self.store.read_sql(f'SELECT DISTINCT "{column}" AS value FROM infringements WHERE {where} ORDER BY 1', params)
+        return values['value'].dropna().tolist()
+
+    def timestamp_range(self):
+        with self._lock:
+            return self._range
+
+    def _timestamp_range(self):
+        where, params = self._where(Filters())
+        bounds = self.store.read_sql(f"SELECT MIN({TS}) AS start, MAX({TS}) AS end FROM infringements WHERE {where}", params)
+        return tuple(pd.to_datetime(bounds.iloc[0], format=TIMESTAMP_FORMAT))
+
+    # Function to answer a named data function (see QUERIES) for a filter state,
+    # through the shared aggregate cache when there is one. Counts are always exact here;
+    # approximate is accepted so every source can be queried alike.
+    def query(self, name, filters=Filters(), sheet=None, approximate=False):
+        where, params = self._where(filters, sheet)
+        if self.cache is None:
+            return QUERIES[name](self.store, where, params)
+        key = (self.dataset_id, self.version, name, filters, sheet)
+        return self.cache.get_or_compute(key, lambda: QUERIES[name](self.store, where, params))
+
+
+def _top_by_url_flag(store, key, where, params, limit=5, with_removals=True):
+    data = store.read_sql(f"""
+        SELECT {key}, COUNT(*) AS total_urls, SUM(removal_flag) AS removal_count
+        FROM (SELECT {key}, URL, MAX({REMOVED}) AS removal_flag FROM infringements
+              WHERE {where} GROUP BY {key}, URL)
+        GROUP BY {key} ORDER BY total_urls DESC, {key} LIMIT {limit}""", params)
+    return data if with_removals else data.drop(columns='removal_count')
+
+
+def _monthly_totals(store, where, params):
+    data = store.read_sql(f"""
+        SELECT substr({TS}, 1, 7) || '-01' AS Month, COUNT(URL) AS total_urls, SUM({REMOVED}) AS removal_count
+        FROM infringements WHERE {where} GROUP BY 1 ORDER BY total_urls DESC""", params)
+    data['Month'] = pd.to_datetime(data['Month'])
+    return data
+
+
+def _calculate_summary(store, where, params):
+    row = store.read_sql(f"""
+        SELECT COUNT(DISTINCT propertyname), COUNT(DISTINCT fixtures), COUNT(DISTINCT URL),
+               COUNT(DISTINCT DomainName), COUNT(DISTINCT CASE WHEN {REMOVED} THEN URL END)
+        FROM infringements WHERE {where}""", params).iloc[0].tolist()
+    total_properties, total_fixture, total_infringements, number_of_websites, removed = row
+    removal_percentage = (removed / total_infringements) * 100 if total_infringements > 0 else 0
+    return total_properties, total_fixture, total_infringements, number_of_websites, removal_percentage
+
+
+def _calculate_telegram_summary(store, where, params):
+    row = store.read_sql(f"""
+        SELECT COALESCE(SUM(CASE WHEN {REMOVED} THEN channelsubscribers END), 0),
+               COALESCE(SUM(channelsubscribers), 0),
+               COUNT(DISTINCT CASE WHEN ChannelStatus = 'Suspended' THEN URL END),
+               COUNT(DISTINCT fixtures), COUNT(DISTINCT URL), COUNT(DISTINCT propertyname),
+               COUNT(DISTINCT DomainName), COUNT(DISTINCT CASE WHEN {REMOVED} THEN URL END),
+               COALESCE(SUM(views), 0)
+        FROM infringements WHERE {where}""", params).iloc[0].tolist()
+    impacted, subscribers, suspended, fixtures, infringements, properties, channels, removed, views = row
+    removal_percentage = (removed / infringements) * 100 if infringements > 0 else 0
+    return impacted, subscribers, suspended, fixtures, infringements, properties, channels, removal_percentage, views
+
+
+def _aggregate_matchday_data(store, where, params):
+    data = store.read_sql(f"""
+        SELECT Matchday, COUNT(URL) AS total_urls FROM infringements
+        WHERE {where} AND Matchday IS NOT NULL GROUP BY Matchday""", params)
+    matchday_num = data['Matchday'].str.extract(r'(\d+)$', expand=False).astype(float)
+    return data.iloc[matchday_num.argsort(kind='stable')].reset_index(drop=True)
+
+
+# SQL versions of the summary/telegram/socialMedia data functions, keyed by the function name.
+# Each returns exactly what its pandas counterpart returns for the same filtered rows.
+QUERIES = {
+    'calculate_summary': _calculate_summary,
+    'calculate_telegram_summary': _calculate_telegram_summary,
+    'get_sheet_summary': lambda store, where, params: store.read_sql(f"""
+        SELECT SheetName, COUNT(DISTINCT URL) AS total_urls, SUM({REMOVED}) AS removal_percentage
+        FROM infringements WHERE {where} GROUP BY SheetName ORDER BY total_urls DESC""", params),
+    'get_top_fixtures': lambda store, where, params: _top_by_url_flag(store, 'fixtures', where, params),
+    'get_top_telegram_property': lambda store, where, params: _top_by_url_flag(store, 'propertyname', where, params),
+    'get_telegram_top_fixtures': lambda store, where, params: _top_by_url_flag(
+        store, 'fixtures', where + " AND SheetName = 'Telegram'", params, with_removals=False),
+    'get_monthly_totals': _monthly_totals,
+    'telegram_monthly_totals': lambda store, where, params: _monthly_totals(store, where + " AND SheetName = 'Telegram'", params),
+    'get_social_media_platform_data': lambda store, where, params: store.read_sql(f"""
+        SELECT DomainName, COUNT(URL) AS total_urls, SUM({REMOVED}) AS removed_count FROM infringements
+        WHERE {where} AND SheetName = 'SocialMediaPlatforms' GROUP BY DomainName ORDER BY total_urls DESC""", params),
+    'aggregate_matchday_data': _aggregate_matchday_data,
+    'telegram_domains_by_subscribers': lambda store, where, params: store.read_sql(f"""
+        SELECT DomainName, SUM(COALESCE(channelsubscribers, 0)) AS total_subscribers FROM infringements
+        WHERE {where} AND SheetName = 'Telegram' GROUP BY DomainName ORDER BY total_subscribers DESC LIMIT 10""", params),
+    'top_fixtures_donut_chart': lambda store, where, params: store.read_sql(f"""
+        SELECT fixtures, SUM(views) AS views FROM infringements
+        WHERE {where} AND SheetName = 'Telegram' AND views IS NOT NULL
+        GROUP BY fixtures ORDER BY views DESC LIMIT 5""", params),
+    'get_channel_type_summary': lambda store, where, params: store.read_sql(f"""
+        SELECT ChannelType, COUNT(*) AS count FROM infringements
+        WHERE {where} AND SheetName = 'Telegram' AND ChannelType IN ('Public', 'Private')
+        GROUP BY ChannelType ORDER BY count DESC""", params),
+}
+
+# Bundles run each member's query under the same filter
+for _bundle, _members in BUNDLES.items():
+    QUERIES[_bundle] = lambda store, where, params, members=_members: {
+        name: QUERIES[name](store, where, params) for name in members}
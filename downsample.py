@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+
+
+# Trend charts draw at most this many points per series (0 draws every point), label at most
+# TREND_MAX_LABELS of them and show at most TREND_MAX_TICKS category labels, so a chart's
+# render time is bounded however long its series is.
+TREND_MAX_POINTS = int(os.environ.get('TREND_MAX_POINTS', 200))
+TREND_MAX_LABELS = int(os.environ.get('TREND_MAX_LABELS', 24))
+TREND_MAX_TICKS = int(os.environ.get('TREND_MAX_TICKS', 40))
+
+
+# Function to pick the positions of threshold points of y that keep the shape of its line, by
+# largest-triangle-three-buckets: the ends are kept, and from each bucket in between the point
+# making the largest triangle with the previously kept point and the next bucket's average.
+def lttb(y, threshold):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if not threshold or threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    kept = 0
+    for bucket in range(threshold - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        next_x = (end + next_end - 1) / 2
+        next_y = y[end:next_end].mean()
+        x = np.arange(start, end)
+        area = np.abs((kept - next_x) * (y[start:end] - y[kept]) - (kept - x) * (next_y - y[kept]))
+        kept = start + int(area.argmax())
+        keep[bucket + 1] = kept
+    return keep
+
+
+# Function to pick the positions of the count most salient points of y to label: both ends, the
+# highest and lowest points, then the peaks and troughs that stand out most from their neighbours
+def salient_points(y, count):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= count:
+        return np.arange(n)
+
+    padded = np.concatenate(([y[0]], y, [y[-1]]))
+    prominence = np.abs(2 * y - padded[:-2] - padded[2:])
+    prominence[[0, n - 1, y.argmax(), y.argmin()]] = np.inf
+    return np.sort(np.argpartition(-prominence, count - 1)[:count])
+
+
+# Function to pick at most count evenly spaced tick positions out of positions, always including the first
+def tick_positions(positions, count):
+    step = max(1, -(-len(positions) // count)) if count else 1
+    return positions[::step]
+
+
+# Function to pick the positions to draw for a chart of several series over the same categories:
+# every position LTTB keeps for any of the series
+def trend_positions(columns, threshold, length):
+    positions = [lttb(values, threshold) for values in columns]
+    return np.unique(np.concatenate(positions)) if positions else np.arange(length)
@@ -0,0 +1,231 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from filters import Filters
+
+
+TIMESTAMP_COLUMN = 'Identification Timestamp'
+
+# Selections covering more than this share of the rows are combined as bitmaps over every row;
+# narrower ones start from the smallest position list and check the other constraints on it
+DENSE_FRACTION = 1 / 16
+
+# Columns with at most this many categories keep a packed bitmap per category
+BITMAP_MAX_CATEGORIES = 64
+
+
+# Position lists of one categorical column: rows grouped by category code, with the offset of
+# each code's group, so the rows holding any category are a slice. Low-cardinality columns
+# also keep one packed bitmap per category.
+class _CategoryPostings:
+
+    def __init__(self, values):
+        self.categories = values.cat.categories
+        self.codes = values.cat.codes.to_numpy()
+        self.rows = len(self.codes)
+        self.order = np.argsort(self.codes, kind='stable')
+        # Slices of the order are handed out as results, so it must not be written through them
+        self.order.flags.writeable = False
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.categories))
+        # Rows with missing values (code -1) sort first and are skipped
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + int((self.codes < 0).sum())
+        self.bitmaps = None
+        if len(self.categories) <= BITMAP_MAX_CATEGORIES:
+            self.bitmaps = np.stack([np.packbits(self.codes == code) for code in range(len(self.categories))]) \
+                if len(self.categories) else np.empty((0, (self.rows + 7) // 8), dtype=np.uint8)
+
+    # Function to return postings of these rows followed by values, whose categories must extend
+    # these postings' categories. Each category's new rows go after its existing ones, so the
+    # existing rows are moved but never sorted again.
+    def extended(self, values):
+        postings = copy.copy(self)
+        new_codes = values.cat.codes.to_numpy()
+        postings.categories = values.cat.categories
+        postings.codes = np.concatenate([self.codes, new_codes])
+        postings.rows = len(postings.codes)
+
+        # Group 0 holds the missing values, group code + 1 each category
+        groups = len(postings.categories) + 1
+        old_counts = np.zeros(groups, dtype=np.int64)
+        old_counts[:len(self.offsets)] = np.concatenate([[self.offsets[0]], np.diff(self.offsets)])
+        new_counts = np.bincount(new_codes.astype(np.int64) + 1, minlength=groups)
+        new_starts = np.concatenate([[0], np.cumsum(new_counts)[:-1]])
+        starts = np.concatenate([[0], np.cumsum(old_counts + new_counts)[:-1]])
+
+        order = np.empty(postings.rows, dtype=self.order.dtype)
+        order[np.arange(self.rows) + new_starts[np.repeat(np.arange(groups), old_counts)]] = self.order
+        new_groups = np.repeat(np.arange(groups), new_counts)
+        order[starts[new_groups] + old_counts[new_groups] + np.arange(len(new_codes)) - new_starts[new_groups]] = \
+            np.argsort(new_codes, kind='stable') + self.rows
+        order.flags.writeable = False
+        postings.order = order
+        counts = old_counts + new_counts
+        postings.offsets = np.concatenate([[0], np.cumsum(counts[1:])]) + int(counts[0])
+
+        postings.bitmaps = None
+        if self.bitmaps is not None and len(postings.categories) <= BITMAP_MAX_CATEGORIES:
+            bitmaps = np.zeros((len(postings.categories), self.bitmaps.shape[1]), dtype=np.uint8)
+            bitmaps[:len(self.bitmaps)] = self.bitmaps
+            bits = new_codes[None, :] == np.arange(len(postings.categories))[:, None]
+            # Fill up the last, partly used byte of each bitmap before packing the rest
+            used = self.rows % 8
+            if used:
+                bits = np.concatenate([np.unpackbits(bitmaps[:, -1:], axis=1)[:, :used], bits], axis=1)
+                bitmaps = bitmaps[:, :-1]
+            postings.bitmaps = np.concatenate([bitmaps, np.packbits(bits, axis=1)], axis=1)
+        return postings
+
+    def lookup(self, labels):
+        codes = self.categories.get_indexer(list(labels))
+        return codes[codes >= 0]
+
+    def count(self, codes):
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def _slices(self, codes):
+        return [self.order[self.offsets[code]:self.offsets[code + 1]] for code in codes]
+
+    # The rows of a single category are already in row order (the sort is stable), so they're returned as is
+    def positions(self, codes):
+        slices = self._slices(codes)
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return slices[0] if len(slices) == 1 else np.sort(np.concatenate(slices))
+
+    def packed(self, codes):
+        if self.bitmaps is not None:
+            return np.bitwise_or.reduce(self.bitmaps[codes], axis=0)
+        selected = np.zeros(self.rows, dtype=bool)
+        for rows in self._slices(codes):
+            selected[rows] = True
+        return np.packbits(selected)
+
+    def mask(self, codes, rows):
+        allowed = np.zeros(len(self.categories) + 1, dtype=bool)
+        allowed[codes] = True
+        # Missing values (code -1) land on the extra, never-allowed slot
+        return allowed[self.codes[rows]]
+
+
+# Rows sorted by timestamp, so a date range is a binary search and then a slice of the order
+class _TimeIndex:
+
+    def __init__(self, values):
+        self.timestamps = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.rows = len(self.timestamps)
+        self.order = np.argsort(self.timestamps, kind='stable')
+        self.sorted = self.timestamps[self.order]
+
+    # Function to return a time index of these rows followed by values; the new rows are merged
+    # into the sorted order (after existing rows with the same timestamp, as a stable sort would)
+    def extended(self, values):
+        index = copy.copy(self)
+        timestamps = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        at = np.searchsorted(self.sorted, timestamps[order], side='right')
+        index.timestamps = np.concatenate([self.timestamps, timestamps])
+        index.rows = len(index.timestamps)
+        index.order = np.insert(self.order, at, order + self.rows)
+        index.sorted = np.insert(self.sorted, at, timestamps[order])
+        return index
+
+    # Function to resolve [start, end] to a (lo, hi) slice of the order, with the bounds as integers
+    def bounds(self, start, end):
+        start, end = pd.Timestamp(start).as_unit('ns').value, pd.Timestamp(end).as_unit('ns').value
+        lo = int(np.searchsorted(self.sorted, start, side='left'))
+        hi = int(np.searchsorted(self.sorted, end, side='right'))
+        return lo, hi, start, end
+
+    def count(self, bounds):
+        return bounds[1] - bounds[0]
+
+    def positions(self, bounds):
+        return np.sort(self.order[bounds[0]:bounds[1]])
+
+    def packed(self, bounds):
+        lo, hi = bounds[0], bounds[1]
+        # Mark whichever is smaller, the rows inside the range or the rows outside it
+        if hi - lo <= self.rows // 2:
+            selected = np.zeros(self.rows, dtype=bool)
+            selected[self.order[lo:hi]] = True
+        else:
+            selected = np.ones(self.rows, dtype=bool)
+            selected[self.order[:lo]] = False
+            selected[self.order[hi:]] = False
+        return np.packbits(selected)
+
+    def mask(self, bounds, rows):
+        timestamps = self.timestamps[rows]
+        return (timestamps >= bounds[2]) & (timestamps <= bounds[3])
+
+
+# Inverted index over the filter columns of one frame, built once when the frame is loaded and
+# extended with the added rows on append.
+# Property, fixture and sheet selections are position lists (and bitmaps) per category, the
+# date range is a binary search over the rows sorted by timestamp, and a filter state resolves
+# to one array of row positions, in row order, without scanning or copying the frame.
+class FilterIndex:
+
+    def __init__(self, data):
+        self.rows = len(data)
+        self.columns = {column: _CategoryPostings(data[column].astype('category'))
+                        for column in ('propertyname', 'fixtures', 'SheetName')}
+        self.columns[TIMESTAMP_COLUMN] = _TimeIndex(data[TIMESTAMP_COLUMN])
+
+    # Function to return an index of these rows followed by data's, built from data's rows only.
+    # data's categorical columns must extend this index's categories (see ingest.conform_schema).
+    def extended(self, data):
+        index = copy.copy(self)
+        index.rows = self.rows + len(data)
+        index.columns = {column: postings.extended(data[column].astype('category'))
+                         for column, postings in self.columns.items() if column != TIMESTAMP_COLUMN}
+        index.columns[TIMESTAMP_COLUMN] = self.columns[TIMESTAMP_COLUMN].extended(data[TIMESTAMP_COLUMN])
+        return index
+
+    # Function to list the constraints of a filter state as (matching rows, index, argument),
+    # leaving out any that match every row
+    def _constraints(self, filters, sheet):
+        constraints = []
+        for column, labels in (('propertyname', [filters.property] if filters.property is not None else None),
+                               ('fixtures', filters.fixtures or None),
+                               ('SheetName', [sheet] if sheet is not None else None)):
+            if labels is not None:
+                codes = self.columns[column].lookup(labels)
+                constraints.append((self.columns[column].count(codes), self.columns[column], codes))
+        if filters.start is not None:
+            time_index = self.columns[TIMESTAMP_COLUMN]
+            bounds = time_index.bounds(filters.start, filters.end)
+            constraints.append((time_index.count(bounds), time_index, bounds))
+        return sorted((c for c in constraints if c[0] < self.rows), key=lambda constraint: constraint[0])
+
+    # Function to tell whether a filter state keeps every row
+    def matches_all(self, filters=Filters(), sheet=None):
+        return not self._constraints(filters, sheet)
+
+    # Function to resolve a filter state (and optionally a sheet) to the matching row positions
+    def positions(self, filters=Filters(), sheet=None):
+        constraints = self._constraints(filters, sheet)
+        if not constraints:
+            return np.arange(self.rows)
+        if constraints[0][0] == 0:
+            return np.empty(0, dtype=np.intp)
+
+        # A single category needs no combining: its position list is the answer
+        if len(constraints) == 1 and isinstance(constraints[0][1], _CategoryPostings) and len(constraints[0][2]) == 1:
+            return constraints[0][1].positions(constraints[0][2])
+
+        # Wide selections: AND the packed bitmaps of every constraint
+        if constraints[0][0] > self.rows * DENSE_FRACTION:
+            packed = constraints[0][1].packed(constraints[0][2])
+            for _, index, argument in constraints[1:]:
+                packed &= index.packed(argument)
+            return np.flatnonzero(np.unpackbits(packed, count=self.rows).view(bool))
+
+        # Narrow selections: materialise the smallest list and check the rest on those rows only
+        _, index, argument = constraints[0]
+        rows = index.positions(argument)
+        for _, index, argument in constraints[1:]:
+            rows = rows[index.mask(argument, rows)]
+        return rows
@@ -0,0 +1,36 @@
+from collections import namedtuple
+
+import pandas as pd
+
+
+# Normalized filter state shared by both Apply buttons. Instances are hashable, so the same
+# selection always produces the same value whatever order the fixtures were picked in.
+class Filters(namedtuple('Filters', ['property', 'fixtures', 'start', 'end'])):
+
+    @classmethod
+    def from_widgets(cls, selected_property=None, selected_fixtures=None, start_date=None, end_date=None):
+        property_name = None if selected_property in (None, 'All') else selected_property
+        fixtures = tuple(sorted(selected_fixtures)) if selected_fixtures else ()
+        # The date range only applies when both ends are set, as before
+        if not (start_date and end_date):
+            start_date = end_date = None
+        else:
+            start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        return cls(property_name, fixtures, start_date, end_date)
+
+
+Filters.__new__.__defaults__ = (None, (), None, None)
+
+
+# Function to apply a filter state (and optionally a sheet) to an in-memory frame
+def apply_filters(data, filters, sheet=None):
+    if sheet is not None:
+        data = data[data['SheetName'] == sheet]
+    if filters.property is not None:
+        data = data[data['propertyname'] == filters.property]
+    if filters.fixtures:
+        data = data[data['fixtures'].isin(filters.fixtures)]
+    if filters.start is not None:
+        data = data[(data['Identification Timestamp'] >= filters.start) &
+                    (data['Identification Timestamp'] <= filters.end)]
+    return data
@@ -0,0 +1,205 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube, ROLLUPS
+from datastore import BUNDLES, OPTION_COLUMNS, StoreSource
+from filter_index import FilterIndex
+from filters import Filters
+from ingest import conform_schema
+import socialMedia
+import summary
+import telegram
+
+
+# The pandas data functions a FrameSource answers, under the same names as datastore.QUERIES
+FRAME_QUERIES = {
+    'calculate_summary': summary.calculate_summary,
+    'get_sheet_summary': summary.get_sheet_summary,
+    'get_top_fixtures': summary.get_top_fixtures,
+    'get_monthly_totals': summary.get_monthly_totals,
+    'calculate_telegram_summary': telegram.calculate_telegram_summary,
+    'get_top_telegram_property': telegram.get_top_telegram_property,
+    'get_telegram_top_fixtures': telegram.get_telegram_top_fixtures,
+    'telegram_monthly_totals': telegram.telegram_monthly_totals,
+    'aggregate_matchday_data': telegram.aggregate_matchday_data,
+    'telegram_domains_by_subscribers': telegram.telegram_domains_by_subscribers,
+    'top_fixtures_donut_chart': telegram.top_fixtures_donut_chart,
+    'get_channel_type_summary': telegram.get_channel_type_summary,
+    'get_social_media_platform_data': socialMedia.get_social_media_platform_data,
+    'summary_bundle': summary.summary_bundle,
+    'telegram_bundle': telegram.telegram_bundle,
+}
+
+
+def _read_only(values):
+    values = np.array(values, copy=True)
+    values.flags.writeable = False
+    return values
+
+
+# Function to rebuild a frame on read-only arrays, so no session can modify the shared copy in place.
+# Filtering or copying it still gives ordinary writable frames.
+def freeze(frame):
+    columns = {}
+    for column in frame.columns:
+        values = frame[column].array
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            values = pd.Categorical.from_codes(_read_only(frame[column].cat.codes.to_numpy()), dtype=frame[column].dtype)
+        elif isinstance(frame[column].dtype, pd.StringDtype) and frame[column].dtype.storage == 'pyarrow':
+            values = frame[column].array
+        elif frame[column].dtype == object:
+            # Text columns move to Arrow, whose buffers are immutable (pandas can't scan read-only object arrays)
+            values = pd.array(frame[column], dtype='string[pyarrow]')
+        elif isinstance(values, pd.arrays.IntegerArray):
+            values = pd.arrays.IntegerArray(_read_only(values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0)),
+                                            _read_only(values.isna()))
+        else:
+            values = _read_only(frame[column].to_numpy())
+        columns[column] = pd.Series(values, name=column, copy=False)
+    return pd.DataFrame(columns, copy=False)
+
+
+# Function to append frozen rows to a frozen frame, whose categories they extend (see
+# ingest.conform_schema); the existing rows are only moved onto the extended categories
+def append_frozen(data, new_rows):
+    data = data.copy(deep=False)
+    for column in data.columns:
+        dtype = new_rows[column].dtype if column in new_rows.columns else None
+        if isinstance(data[column].dtype, pd.CategoricalDtype) and dtype != data[column].dtype:
+            data[column] = pd.Categorical.from_codes(data[column].cat.codes.to_numpy(), dtype=dtype)
+    return freeze(pd.concat([data, new_rows], ignore_index=True))
+
+
+# Function to measure the memory a session holds on its own, i.e. not shared with its source
+def session_overhead(frame, source):
+    if frame is None or frame is getattr(source, 'data', None):
+        return 0
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+# One published state of a FrameSource: its frozen frame with the frame's filter index, cube,
+# option lists and timestamp range. Appends build a new snapshot and publish it with a single
+# assignment, so a reader that takes the snapshot once sees all of it from the same append.
+class _Snapshot:
+
+    def __init__(self, version, data, index, cube, options, timestamp_range):
+        self.version = version
+        self.data = data
+        self.index = index
+        self.cube = cube
+        self.options = options
+        self.range = timestamp_range
+
+
+# In-memory read side of one dataset, loaded once from the store and shared by every session
+# viewing it. The frame is frozen; on append the new rows are added to a new frame, filter index
+# and cube (extending them rather than rebuilding them) that replace the old ones together, so
+# sessions only ever hold a shared frame or the row positions of their filters, never copies.
+class FrameSource:
+
+    def __init__(self, store, dataset_id, cache=None):
+        self.store = store
+        self.dataset_id = dataset_id
+        self.cache = cache
+        self._listeners = []
+        self._lock = threading.Lock()
+        data = freeze(StoreSource(store, dataset_id).rows())
+        timestamps = data['Identification Timestamp']
+        self._snapshot = _Snapshot(0, data, FilterIndex(data), Cube(data),
+                                   {column: sorted(data[column].dropna().unique()) for column in OPTION_COLUMNS},
+                                   (timestamps.min(), timestamps.max()))
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    @property
+    def data(self):
+        return self._snapshot.data
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # Function to merge newly uploaded rows into this dataset and notify open sessions.
+    # Sessions reading the previous snapshot are unaffected.
+    def append(self, combined_data):
+        added = self.store.merge(combined_data, self.dataset_id)
+        if added.empty:
+            return added
+
+        with self._lock:
+            snapshot = self._snapshot
+            new_rows = freeze(conform_schema(added, snapshot.data))
+            timestamps = new_rows['Identification Timestamp']
+            options = {column: sorted(set(snapshot.options[column]) | set(new_rows[column].dropna().unique()))
+                       for column in OPTION_COLUMNS}
+            self._snapshot = _Snapshot(
+                snapshot.version + 1, append_frozen(snapshot.data, new_rows),
+                snapshot.index.extended(new_rows), snapshot.cube.extended(new_rows), options,
+                (min(snapshot.range[0], timestamps.min()), max(snapshot.range[1], timestamps.max())))
+            if self.cache is not None:
+                self.cache.invalidate(self.dataset_id)
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(self, added)
+            except Exception as e:
+                logging.error(f"Error notifying session about new data: {e}")
+        return added
+
+    # Function to find the row positions matching a filter state, from the dataset's filter index
+    def positions(self, filters=Filters(), sheet=None):
+        return self._snapshot.index.positions(filters, sheet)
+
+    # Function to fetch the filtered rows. Filters that keep every row (such as the default
+    # date range) get the shared frame itself; only narrower selections are copied out.
+    def rows(self, filters=Filters(), sheet=None):
+        return self._rows(self._snapshot, filters, sheet)
+
+    @staticmethod
+    def _rows(snapshot, filters, sheet):
+        if snapshot.index.matches_all(filters, sheet):
+            return snapshot.data
+        return snapshot.data.take(snapshot.index.positions(filters, sheet))
+
+    def distinct(self, column, filters=Filters(), sheet=None):
+        if column in OPTION_COLUMNS and filters == Filters() and sheet is None:
+            return list(self._snapshot.options[column])
+        return sorted(self.rows(filters, sheet)[column].dropna().unique())
+
+    def timestamp_range(self):
+        return self._snapshot.range
+
+    # Function to compute a named data function, rolled up from the cube where it can be and
+    # from the filtered rows otherwise (a date range starting or ending part way through a day,
+    # which is always counted exactly)
+    def _compute(self, snapshot, name, filters, sheet, approximate=False):
+        if name in ROLLUPS or name in BUNDLES:
+            result = snapshot.cube.answer(name, filters, sheet, approximate)
+            if result is not None:
+                return result
+        return FRAME_QUERIES[name](self._rows(snapshot, filters, sheet))
+
+    # Function to answer a named data function (see FRAME_QUERIES) for a filter state,
+    # through the shared aggregate cache when there is one. approximate lets the KPI distinct
+    # URL counts be estimated from the cube's sketches.
+    def query(self, name, filters=Filters(), sheet=None, approximate=False):
+        snapshot = self._snapshot
+        if self.cache is None:
+            return self._compute(snapshot, name, filters, sheet, approximate)
+        key = (self.dataset_id, snapshot.version, name, filters, sheet, approximate)
+        return self.cache.get_or_compute(key, lambda: self._compute(snapshot, name, filters, sheet, approximate))
+
+    def memory_usage(self):
+        snapshot = self._snapshot
+        return int(snapshot.data.memory_usage(index=True, deep=True).sum()) + snapshot.cube.nbytes()
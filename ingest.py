@@ -0,0 +1,334 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook as open_workbook
+
+from upload_cache import file_digest
+
+
+# Sheets are read by position; these are the names the dashboard knows them by
+SHEET_NAMES = ['Infringing_urls', 'Source_urls', 'Telegram', 'SocialMediaPlatforms', 'MobileApplications']
+
+# Columns the dashboard works with; every sheet gets all of them (missing ones are left empty)
+# and any other workbook column is passed through as it is, for the Data Table and the export
+DASHBOARD_COLUMNS = [
+    'propertyname', 'fixtures', 'DomainName', 'URL', 'Status', 'Identification Timestamp',
+    'Matchday', 'ChannelType', 'ChannelStatus', 'views', 'channelsubscribers',
+]
+
+# Version of the cached sheet format; bump it whenever read_sheet or clean_data change their output
+CACHE_FORMAT = b'ingest-4'
+
+# Canonical spelling of every known column, looked up by its trimmed, case-folded header
+CANONICAL_COLUMN_NAMES = {name.casefold(): name for name in DASHBOARD_COLUMNS + ['SheetName']}
+
+# Fixed spellings for enumerated columns; any Status outside the enum is stored as 'Other'
+STATUS_VALUES = ['Approved', 'Removed', 'Pending', 'Other']
+REMOVAL_STATUSES = ['Approved', 'Removed']
+
+# Columns derived at ingest for the data functions; they aren't stored, shown or exported
+DERIVED_COLUMNS = ['is_removed']
+ENUM_VALUES = {
+    'Status': STATUS_VALUES,
+    'ChannelType': ['Public', 'Private'],
+    'ChannelStatus': ['Active', 'Suspended'],
+}
+
+
+# Function to map a header such as ' Status' or 'propertyName' onto its canonical column name
+def canonical_column_name(name):
+    name = ' '.join(str(name).split())
+    return CANONICAL_COLUMN_NAMES.get(name.casefold(), name)
+
+
+# Function to stream one worksheet into a DataFrame with every workbook column, known columns
+# under their canonical names, followed by any of columns the sheet doesn't have
+def read_sheet(worksheet, columns=DASHBOARD_COLUMNS):
+    header = next(worksheet.iter_rows(max_row=1, values_only=True), None)
+    if header is None:
+        return pd.DataFrame(columns=columns)
+
+    # Map each column to its first position in the header (duplicate headers keep the first);
+    # unnamed headers are named like pandas.read_excel names them
+    positions = {}
+    for i, name in enumerate(header):
+        name = f'Unnamed: {i}' if name is None else canonical_column_name(name)
+        if name not in positions:
+            positions[name] = i
+
+    values = {name: [] for name in positions}
+    for row in worksheet.iter_rows(min_row=2, max_col=len(header), values_only=True):
+        # Skip blank rows so stale sheet dimensions don't add empty records
+        if not any(cell is not None for cell in row):
+            continue
+        for name, i in positions.items():
+            values[name].append(row[i] if i < len(row) else None)
+
+    sheet = pd.DataFrame(values).infer_objects()
+    return sheet.reindex(columns=list(positions) + [name for name in columns if name not in positions])
+
+
+# Function to open a workbook once and read the first five sheets in order
+def load_workbook_sheets(file_path, columns=DASHBOARD_COLUMNS):
+    workbook = open_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for worksheet, name in zip(workbook.worksheets, SHEET_NAMES):
+            sheet = read_sheet(worksheet, columns)
+            sheet['SheetName'] = name
+            sheets.append(sheet)
+    finally:
+        workbook.close()
+
+    if len(sheets) < len(SHEET_NAMES):
+        raise ValueError(f"{file_path} has {len(sheets)} sheets, expected {len(SHEET_NAMES)}")
+
+    logging.info(f"Loaded {sum(len(s) for s in sheets)} rows from {file_path}")
+    return sheets
+
+
+# Low-cardinality text columns held as categoricals, and count columns held as the narrowest integer
+CATEGORICAL_COLUMNS = ['propertyname', 'fixtures', 'DomainName', 'Status', 'SheetName', 'ChannelType', 'ChannelStatus', 'Matchday']
+NUMERIC_COLUMNS = ['views', 'channelsubscribers']
+_INTEGER_DTYPES = [(np.int8, 'Int8'), (np.int16, 'Int16'), (np.int32, 'Int32'), (np.int64, 'Int64')]
+
+
+# Function to pick the narrowest dtype that holds a numeric column without loss
+def _downcast(values):
+    values = pd.to_numeric(values, errors='coerce')
+    present = values.dropna()
+    if present.empty or not (present == present.round()).all():
+        return values
+    # Integral columns with gaps become nullable integers so NaN doesn't force float64
+    for dtype, nullable_dtype in _INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= present.min() and present.max() <= info.max:
+            break
+    return values.astype(nullable_dtype if values.isna().any() else dtype)
+
+
+# Function to convert combined_data to its compact ingest-time dtypes.
+# Callers must group categorical columns with observed=True.
+def apply_dtype_plan(combined_data):
+    for column in CATEGORICAL_COLUMNS:
+        if column in combined_data.columns:
+            combined_data[column] = combined_data[column].astype('category')
+    for column in NUMERIC_COLUMNS:
+        if column in combined_data.columns:
+            combined_data[column] = _downcast(combined_data[column])
+    return combined_data
+
+
+# Function to compute the canonical label of every category of one column.
+# Labels are trimmed and whitespace-collapsed; spellings that only differ by case are merged
+# onto the most frequent one, enum columns use their fixed spelling and Matchday is title-cased.
+def _canonical_labels(column, values):
+    categories = values.cat.categories.astype(str)
+    trimmed = categories.str.split().str.join(' ')
+    keys = trimmed.str.casefold()
+
+    if column == 'Matchday':
+        return trimmed.str.title()
+
+    codes = values.cat.codes.to_numpy()
+    rows = np.bincount(codes[codes >= 0], minlength=len(categories))
+    spellings = pd.DataFrame({'key': keys, 'label': trimmed, 'rows': rows})
+    spellings = spellings.sort_values('rows', ascending=False, kind='stable').drop_duplicates('key')
+    labels = pd.Index(spellings.set_index('key')['label'].reindex(keys).to_numpy())
+
+    if column in ENUM_VALUES:
+        enum = {value.casefold(): value for value in ENUM_VALUES[column]}
+        fallback = 'Other' if column == 'Status' else None
+        labels = pd.Index([enum.get(key, fallback or label) for key, label in zip(keys, labels)])
+    return labels
+
+
+# Function to order Matchday labels numerically (Matchday 2 before Matchday 10); unnumbered labels go last
+def _matchday_order(labels):
+    numbers = pd.Series(labels).str.extract(r'(\d+)$', expand=False).astype(float)
+    return list(pd.Series(labels)[numbers.fillna(np.inf).argsort(kind='stable')])
+
+
+# Function to canonicalize column names and categorical values once at ingest, so the
+# dashboard, logic_func and the process_*_data functions never clean strings per query.
+# Works on the category labels, so the cost is independent of the row count.
+def normalize_schema(combined_data):
+    combined_data = combined_data.rename(columns=canonical_column_name)
+    combined_data = combined_data.loc[:, ~combined_data.columns.duplicated()]
+
+    for column in CATEGORICAL_COLUMNS:
+        if column not in combined_data.columns:
+            continue
+        values = combined_data[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+
+        labels = _canonical_labels(column, values)
+        if column == 'Status':
+            categories = STATUS_VALUES
+        elif column == 'Matchday':
+            categories = _matchday_order(labels.unique())
+        else:
+            categories = sorted(labels.unique())
+
+        # Re-point every old category code at its canonical category
+        lookup = pd.Index(categories).get_indexer(labels)
+        codes = values.cat.codes.to_numpy()
+        new_codes = np.full(len(codes), -1, dtype=lookup.dtype)
+        new_codes[codes >= 0] = lookup[codes[codes >= 0]]
+        combined_data[column] = pd.Categorical.from_codes(new_codes, categories=categories)
+
+    if 'Status' in combined_data.columns:
+        other = int((combined_data['Status'] == 'Other').sum())
+        if other:
+            logging.warning(f"{other} rows have a Status outside {STATUS_VALUES[:-1]} and were stored as 'Other'")
+        combined_data['is_removed'] = combined_data['Status'].isin(REMOVAL_STATUSES).to_numpy()
+    return combined_data
+
+
+# Function to put rows being added to an existing frame on that frame's categories, so the two
+# concatenate without touching the existing rows. Only the new rows are normalized; their labels
+# are matched to the existing categories ignoring case and spacing, and labels the frame hasn't
+# seen are added after its categories, so existing labels and codes never change.
+def conform_schema(new_rows, existing):
+    new_rows = normalize_schema(apply_dtype_plan(new_rows.copy()))
+    for column in existing.columns:
+        dtype = existing[column].dtype
+        if not isinstance(dtype, pd.CategoricalDtype) or column not in new_rows.columns:
+            continue
+        values = new_rows[column].astype('category')
+        labels = values.cat.categories.astype(str)
+        keys = dtype.categories.astype(str).str.split().str.join(' ').str.casefold()
+        lookup = pd.Index(keys).get_indexer(labels.str.casefold())
+
+        unseen = list(labels[lookup < 0])
+        unseen = _matchday_order(unseen) if column == 'Matchday' else sorted(unseen)
+        categories = dtype.categories.append(pd.Index(unseen, dtype=dtype.categories.dtype))
+        lookup = np.where(lookup >= 0, lookup, len(dtype.categories) + pd.Index(unseen).get_indexer(labels))
+
+        codes = values.cat.codes.to_numpy()
+        new_codes = np.full(len(codes), -1, dtype=np.int64)
+        new_codes[codes >= 0] = lookup[codes[codes >= 0]]
+        new_rows[column] = pd.Categorical.from_codes(new_codes, dtype=pd.CategoricalDtype(categories))
+    return new_rows
+
+
+# Function to put a per-Matchday frame in numerical Matchday order (Matchday 2 before Matchday 10).
+# Categories are only in that order for a freshly loaded frame, not once new Matchdays are appended.
+def order_matchdays(matchday_summary):
+    matchday_num = matchday_summary['Matchday'].astype(str).str.extract(r'(\d+)$', expand=False).astype(float)
+    return matchday_summary.iloc[matchday_num.argsort(kind='stable')].reset_index(drop=True)
+
+
+# Function to make sure data carries the is_removed flag, so removals aggregate as a plain
+# sum or max. Frames from normalize_schema already have it; others get a flagged view.
+def with_removal_flag(data):
+    if 'is_removed' in data.columns:
+        return data
+    return data.assign(is_removed=data['Status'].isin(REMOVAL_STATUSES).to_numpy())
+
+
+# Function to look up rows whose categorical value matches a user-supplied one, ignoring case and spacing
+def match_value(values, value):
+    key = ' '.join(str(value).split()).casefold()
+    categories = values.cat.categories
+    matches = categories[categories.astype(str).str.casefold() == key]
+    return values.isin(matches)
+
+
+# Function to fill defaults and parse timestamps the way the dashboard expects
+def clean_data(combined_data):
+    combined_data['propertyname'] = combined_data['propertyname'].fillna('Unknown')
+    combined_data['fixtures'] = combined_data['fixtures'].fillna('Unknown')
+    combined_data['DomainName'] = combined_data['DomainName'].fillna('Unknown')
+    combined_data['URL'] = combined_data['URL'].fillna('Unknown')
+    combined_data['Status'] = combined_data['Status'].fillna('Pending')
+    combined_data['Identification Timestamp'] = pd.to_datetime(combined_data['Identification Timestamp'], errors='coerce')
+    return combined_data.dropna(subset=['Identification Timestamp'])
+
+
+# Function to load the cleaned sheets of one workbook, going through the upload cache when given
+def load_cleaned_sheets(file_path, cache=None):
+    digest = None
+    if cache is not None:
+        digest = file_digest(file_path, salt=CACHE_FORMAT)
+        sheets = cache.get(digest)
+        if sheets is not None:
+            logging.info(f"Loaded {file_path} from cache entry {digest}")
+            return sheets
+
+    sheets = [clean_data(sheet) for sheet in load_workbook_sheets(file_path)]
+    if cache is not None:
+        cache.put(digest, sheets)
+    return sheets
+
+
+# Worker entry point: parse and clean one workbook, reporting how long it took
+def _load_file(file_path, cache=None):
+    started = time.perf_counter()
+    sheets = load_cleaned_sheets(file_path, cache)
+    return sheets, time.perf_counter() - started
+
+
+# Long-lived worker pool shared by every upload; spawned rather than forked so the
+# threaded web process is never copied mid-request
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = max_workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+# Function to build the combined, cleaned frame for a list of uploaded workbooks.
+# Files are parsed in parallel but merged in upload order, so the result is deterministic.
+# progress, if given, is called with (file_path, rows) as each workbook finishes.
+def load_combined_data(file_paths, cache=None, max_workers=None, progress=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    results = {}
+
+    def finished(file_path, result):
+        results[file_path] = result
+        if progress is not None:
+            progress(file_path, sum(len(sheet) for sheet in result[0]))
+
+    if len(file_paths) <= 1 or max_workers == 1:
+        for file_path in file_paths:
+            finished(file_path, _load_file(file_path, cache))
+    else:
+        pool = _get_pool(max_workers)
+        futures = {pool.submit(_load_file, file_path, cache): file_path for file_path in file_paths}
+        try:
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+        except BrokenProcessPool:
+            _reset_pool()
+            raise
+
+    dataframes = []
+    for file_path in file_paths:
+        sheets, elapsed = results[file_path]
+        logging.info(f"Ingested {file_path}: {sum(len(s) for s in sheets)} rows in {elapsed:.2f}s")
+        dataframes.extend(sheets)
+    return normalize_schema(apply_dtype_plan(pd.concat(dataframes, ignore_index=True)))
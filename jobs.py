@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Progress record for one background upload, polled through /jobs/<id>
+class UploadJob:
+
+    def __init__(self, file_count):
+        self.id = uuid.uuid4().hex
+        self.file_count = file_count
+        self.stage = 'queued'
+        self.rows_parsed = 0
+        self.files_parsed = 0
+        self.error = None
+        self.result = None
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage):
+        with self._lock:
+            self.stage = stage
+        logging.info(f"Upload job {self.id}: {stage}")
+
+    # Function to end the job: ready with its result, or failed with its error. The stage and the
+    # outcome change together, so a poller never sees one without the other.
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.stage = 'failed' if error is not None else 'ready'
+        logging.info(f"Upload job {self.id}: {self.stage}")
+
+    # Progress callback for ingest.load_combined_data, called once per finished workbook
+    def file_parsed(self, file_path, rows):
+        with self._lock:
+            self.files_parsed += 1
+            self.rows_parsed += rows
+
+    @property
+    def done(self):
+        return self.stage in ('ready', 'failed')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'stage': self.stage,
+                'files': self.file_count,
+                'files_parsed': self.files_parsed,
+                'rows_parsed': self.rows_parsed,
+                'elapsed': round((self.finished or time.time()) - self.started, 2),
+                'error': self.error,
+            }
+
+
+# Runs uploads on a small, bounded pool of threads so parsing never ties up the web workers.
+# Submissions beyond max_queued are refused rather than piling up behind the pool.
+class JobManager:
+
+    def __init__(self, max_workers=2, max_queued=8, keep_finished=100):
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
+
+    # Returns the new job, or None when the queue is already full
+    def submit(self, target, file_count, *args):
+        with self._lock:
+            if sum(1 for job in self._jobs.values() if not job.done) >= self.max_queued:
+                return None
+            job = UploadJob(file_count)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, target, *args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, target, *args):
+        try:
+            result = target(job, *args)
+        except Exception as e:
+            logging.exception(f"Upload job {job.id} failed")
+            job.finish(error=str(e) or type(e).__name__)
+        else:
+            job.finish(result)
+
+    # Drop the oldest finished jobs once more than keep_finished are held
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.started)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+DEFAULT_MAX_DATASETS = int(os.environ.get('DASHBOARD_MAX_DATASETS', 4))
+
+
+# Datasets loaded for the dashboard server, keyed by dataset id. Every open session holds a
+# reference; once a dataset has no sessions it stays loaded until it is the least recently
+# used of more than max_datasets, then it is dropped (its rows stay in the store).
+# Sessions can also register a sizer reporting the memory they hold on their own.
+# Datasets are loaded outside the registry lock, one future per dataset, so a slow load only
+# holds up the sessions waiting for that dataset.
+class DatasetRegistry:
+
+    def __init__(self, loader, max_datasets=DEFAULT_MAX_DATASETS):
+        self.loader = loader
+        self.max_datasets = max_datasets
+        self._sources = OrderedDict()
+        self._refcounts = {}
+        self._sessions = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    # Function to load a dataset unless it is loaded already; returns its source. Concurrent
+    # callers for the same dataset wait for the one load.
+    def load(self, dataset_id):
+        with self._lock:
+            source = self._sources.get(dataset_id)
+            if source is not None:
+                return source
+            future = self._loading.get(dataset_id)
+            loading = future is None
+            if loading:
+                future = self._loading[dataset_id] = Future()
+        if not loading:
+            return future.result()
+
+        try:
+            source = self.loader(dataset_id)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[dataset_id]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[dataset_id]
+            self._add(dataset_id, source)
+            self._evict()
+        logging.info(f"Loaded dataset {dataset_id} for the dashboard")
+        future.set_result(source)
+        return source
+
+    def _add(self, dataset_id, source):
+        if dataset_id not in self._sources:
+            self._sources[dataset_id] = source
+            self._refcounts[dataset_id] = 0
+            self._sessions[dataset_id] = {}
+
+    # Function to take a reference on a dataset for one session, loading it if needed
+    def acquire(self, dataset_id, session_id=None):
+        source = self.load(dataset_id)
+        with self._lock:
+            # An idle dataset may have been evicted since it was loaded
+            self._add(dataset_id, source)
+            source = self._sources[dataset_id]
+            self._sources.move_to_end(dataset_id)
+            self._refcounts[dataset_id] += 1
+            if session_id is not None:
+                self._sessions[dataset_id][session_id] = None
+            self._evict()
+            return source
+
+    def release(self, dataset_id, session_id=None):
+        with self._lock:
+            if self._refcounts.get(dataset_id, 0) > 0:
+                self._refcounts[dataset_id] -= 1
+                self._sessions[dataset_id].pop(session_id, None)
+            self._evict()
+
+    # Function to return a dataset's source only if it is loaded (waiting for it if it is loading)
+    def get(self, dataset_id):
+        with self._lock:
+            source = self._sources.get(dataset_id)
+            future = self._loading.get(dataset_id)
+        if source is None and future is not None:
+            try:
+                return future.result()
+            except Exception:
+                return None
+        return source
+
+    # Function to register how a session measures its own memory (bytes not shared with the dataset)
+    def track_session(self, dataset_id, session_id, sizer):
+        with self._lock:
+            if session_id in self._sessions.get(dataset_id, {}):
+                self._sessions[dataset_id][session_id] = sizer
+
+    def memory_report(self):
+        with self._lock:
+            loaded = [(dataset_id, source, dict(self._sessions[dataset_id])) for dataset_id, source in self._sources.items()]
+        report = []
+        for dataset_id, source, sessions in loaded:
+            session_bytes = {session_id: sizer() if sizer else 0 for session_id, sizer in sessions.items()}
+            report.append({
+                'dataset_id': dataset_id,
+                'shared_bytes': source.memory_usage() if hasattr(source, 'memory_usage') else 0,
+                'sessions': session_bytes,
+                'session_bytes': sum(session_bytes.values()),
+            })
+        return report
+
+    def stats(self):
+        with self._lock:
+            return {dataset_id: self._refcounts[dataset_id] for dataset_id in self._sources}
+
+    # Drop idle datasets, oldest first, until the registry is back within max_datasets
+    def _evict(self):
+        idle = [dataset_id for dataset_id in self._sources if self._refcounts[dataset_id] == 0]
+        while len(self._sources) > self.max_datasets and idle:
+            dataset_id = idle.pop(0)
+            del self._sources[dataset_id]
+            del self._refcounts[dataset_id]
+            del self._sessions[dataset_id]
+            logging.info(f"Evicted dataset {dataset_id} from the dashboard registry")
@@ -18,19 +18,23 @@ from PIL import ImageFont, ImageDraw, Image
 import azure.functions as func
 
 # Custom Modules (Assumed to be local)
-from socialMedia import get_social_media_platform_data, create_social_media_platform_bar_chart
-from summary import create_top_property_bar_chart, get_top_fixtures, create_top_fixtures_bar_chart, create_bar_chart, get_monthly_totals, create_monthly_totals_line_plot
+from charts import render_png
+from socialMedia import get_social_media_platform_data, SocialMediaPlatformChart
+from summary import (get_top_fixtures, get_sheet_summary, get_monthly_totals, summary_bundle,
+                     SheetChart, TopFixturesChart, MonthlyTotalsChart, TopPropertyChart)
 from telegram import (get_telegram_platform_data, get_top_telegram_property, calculate_telegram_summary,
                       get_telegram_top_fixtures, create_telegram_top_fixtures_bar_chart,
                       telegram_domains_by_subscribers, create_treemap_chart_telegram, 
-                      create_enhanced_matchday_line_plot, aggregate_matchday_data,
-                      telegram_monthly_totals_line_plot, telegram_monthly_totals, 
+                      aggregate_matchday_data, telegram_monthly_totals, 
                       top_fixtures_donut_chart, top_fixtures_graph_donut_chart, 
-                      create_channel_type_pie_chart)
+                      get_channel_type_summary, create_channel_type_pie_chart, telegram_bundle,
+                      MatchdayChart, TelegramMonthlyTotalsChart)
 
 
 
-def sendEmail_function(combinedVar):
+# chart_cache, a ChartCache, lets the report reuse chart images the dashboard or an earlier
+# report already rendered
+def sendEmail_function(combinedVar, chart_cache=None):
     
     try:
         # Load Fonts
@@ -82,38 +86,48 @@ def sendEmail_function(combinedVar):
         )
         pdf.savefig(ImageToPDF(first_page))  # Save to PDF
 
-        figure_functions = [
-            lambda: create_bar_chart(combinedVar),
-            lambda: create_top_fixtures_bar_chart(get_top_fixtures(combinedVar)),
-            lambda: create_monthly_totals_line_plot(get_monthly_totals(combinedVar)),
-            lambda: create_social_media_platform_bar_chart(get_social_media_platform_data(combinedVar)),
-            lambda: create_enhanced_matchday_line_plot(aggregate_matchday_data(combinedVar)),
-            lambda: create_telegram_top_fixtures_bar_chart(get_telegram_top_fixtures(combinedVar)),
-            lambda: create_top_property_bar_chart(get_top_telegram_property(combinedVar)),
-            lambda: create_treemap_chart_telegram(telegram_domains_by_subscribers(combinedVar)),
-            lambda: telegram_monthly_totals_line_plot(telegram_monthly_totals(combinedVar)),
-            lambda: top_fixtures_graph_donut_chart(top_fixtures_donut_chart(combinedVar)),
-            lambda: create_channel_type_pie_chart(combinedVar)
+        # Every chart input, computed in one pass per tab. The report ranks the top properties
+        # over every sheet, where the Telegram tab's bundle only ranks the Telegram rows.
+        summary = summary_bundle(combinedVar)
+        telegram = telegram_bundle(combinedVar)
+        # Each page's chart is a Matplotlib chart class or a Plotly chart builder, with its inputs,
+        # as in the dashboard, so both share the rendered images in chart_cache
+        charts = [
+            (SheetChart, (summary['get_sheet_summary'], "All Properties", "All Fixtures")),
+            (TopFixturesChart, (summary['get_top_fixtures'],)),
+            (MonthlyTotalsChart, (summary['get_monthly_totals'],)),
+            (SocialMediaPlatformChart, (summary['get_social_media_platform_data'],)),
+            (MatchdayChart, (summary['aggregate_matchday_data'],)),
+            (create_telegram_top_fixtures_bar_chart, (telegram['get_telegram_top_fixtures'],)),
+            (TopPropertyChart, (get_top_telegram_property(combinedVar),)),
+            (create_treemap_chart_telegram, (telegram['telegram_domains_by_subscribers'],)),
+            (TelegramMonthlyTotalsChart, (telegram['telegram_monthly_totals'],)),
+            (top_fixtures_graph_donut_chart, (telegram['top_fixtures_donut_chart'],)),
+            (create_channel_type_pie_chart, (telegram['get_channel_type_summary'],))
 
         ]
 
         # Dashboard
         
 
-        for create_figure in figure_functions:         
-            fig = create_figure()  # Generate chart
-            #plt.figtext(0.5, 0.01, f"Chart {idx + 1} - Description goes here.", ha="center", fontsize=12, color="gray")
-            try:
-                pdf.savefig(fig, bbox_inches='tight')  # Save directly to the PDF
-            except:
-                isinstance(fig, go.Figure)
-                img_bytes = fig.to_image(format="png", engine="kaleido", scale=5)
-                image = Image.open(io.BytesIO(img_bytes))
-                plt_fig, ax = plt.subplots(figsize=(12, 6))
-                ax.axis('off')  # Hide axes for Plotly figures
-                ax.imshow(image)  # Display the figure
-                pdf.savefig(plt_fig)  # Save Plotly image as PDF page
-                plt.close(plt_fig)
+        for chart, inputs in charts:
+            if isinstance(chart, type):
+                # Matplotlib charts are rendered as the dashboard shows them, on a page of their size
+                render = lambda: render_png(chart, inputs)
+                size = (chart.figsize, chart.dpi)
+                figsize = chart.figsize
+            else:
+                # Plotly charts are exported to images
+                render = lambda: chart(*inputs).to_image(format="png", engine="kaleido", scale=5)
+                size = 'png@5x'
+                figsize = (12, 6)
+            img_bytes = render() if chart_cache is None else chart_cache.get_or_render(chart.__name__, inputs, size, render)
+            image = Image.open(io.BytesIO(img_bytes))
+            plt_fig, ax = plt.subplots(figsize=figsize)
+            ax.axis('off')  # Hide axes for the chart image
+            ax.imshow(image)  # Display the figure
+            pdf.savefig(plt_fig)  # Save the chart image as PDF page
+            plt.close(plt_fig)
 
         # Create Last Page
         last_page = create_attractive_page(
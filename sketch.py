@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# HyperLogLog distinct counting: each value is hashed, the top PRECISION bits of the hash pick
+# a register and the rest give a rank (position of the first 1-bit); a sketch keeps the highest
+# rank per register, sketches merge by taking the register-wise max, and the distinct count is
+# estimated from the merged registers with a relative standard error of 1.04 / sqrt(registers).
+PRECISION = int(os.environ.get('HLL_PRECISION', 12))
+
+
+def _bit_length(values):
+    # frexp is exact on 32-bit integers, so split the 64-bit words into halves
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+# Function to hash values to their (register, rank) pair
+def registers_and_ranks(values, precision=PRECISION):
+    hashes = pd.util.hash_pandas_object(pd.Series(values, copy=False), index=False).to_numpy()
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.uint16)
+    remainder = hashes << np.uint64(precision)
+    ranks = np.minimum(64 - _bit_length(remainder) + 1, 64 - precision + 1).astype(np.uint8)
+    return registers, ranks
+
+
+# Function to merge (register, rank) entries into one dense sketch
+def merge(registers, ranks, precision=PRECISION):
+    sketch = np.zeros(1 << precision, dtype=np.uint8)
+    np.maximum.at(sketch, registers, ranks)
+    return sketch
+
+
+# Function to estimate the number of distinct values in a sketch
+def estimate(sketch):
+    m = len(sketch)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.ldexp(1.0, -sketch.astype(np.int64)).sum()
+    empty = int((sketch == 0).sum())
+    # Small cardinalities are counted from the empty registers (linear counting) instead
+    if raw <= 2.5 * m and empty:
+        return int(round(m * np.log(m / empty)))
+    return int(round(raw))
+
+
+def relative_error(precision=PRECISION):
+    return 1.04 / np.sqrt(1 << precision)
@@ -11,6 +11,10 @@ from matplotlib.backends.backend_pdf import PdfPages
 import io
 from datetime import datetime
 
+from bokeh_charts import BokehPairedBarChart
+from charts import PairedBarChart
+from ingest import with_removal_flag
+
 
 
 
@@ -19,26 +23,20 @@ from datetime import datetime
 # Function to get domain-specific data for SocialMediaPlatforms
 def get_social_media_platform_data(data):
     # Filter data for SocialMediaPlatforms sheet
-    social_media_data = data[data['SheetName'] == 'SocialMediaPlatforms']
+    social_media_data = with_removal_flag(data[data['SheetName'] == 'SocialMediaPlatforms'])
 
     # Calculate total URLs, count of 'Removed' and 'Approved' statuses for each DomainName
-    domain_summary = social_media_data.groupby('DomainName').agg(
+    domain_summary = social_media_data.groupby('DomainName', observed=True).agg(
         total_urls=('URL', 'count'),
-        removed_count=('Status', lambda x: x.isin(['Approved', 'Removed']).sum()),
+        removed_count=('is_removed', 'sum'),
     ).reset_index().sort_values(by='total_urls', ascending=False)
     
     return domain_summary
 
-# Function to create a grouped bar chart for SocialMediaPlatforms
-def create_social_media_platform_bar_chart(domain_data):
-    # Set up figure and axis
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f8f9fa')
-    x = np.arange(len(domain_data['DomainName']))
-    bar_width = 0.3  # Adjust bar width to increase spacing
-
-    # Plotting each metric
-    bar1 = ax.bar(x - bar_width / 2, domain_data['total_urls'], width=bar_width, label='Total URLs', color='#ff6b6b')
-    bar2 = ax.bar(x + bar_width / 2, domain_data['removed_count'], width=bar_width, label='Delisting Count', color='#4a90e2')
+# Function to title the SocialMediaPlatforms chart with its highlights
+def social_media_title(domain_data):
+    if domain_data.empty:
+        return "Platform-wise Analysis for Social Media"
 
     # Calculate highlights
     total_feeds_removed = (domain_data['removed_count'].sum() / domain_data['total_urls'].sum()) * 100
@@ -51,51 +49,59 @@ def create_social_media_platform_bar_chart(domain_data):
         f"• Top Platform: {top_platform['DomainName']} ({top_platform['removed_count']}/{top_platform['total_urls']}) removed"
     )
 
-    title_text = f"Platform-wise Analysis for Social Media\n{highlight_text}"
-    ax.set_title(title_text, fontsize=14, fontweight='bold', pad=30, loc='center')
-    ax.set_xlabel('')  # If you don’t want a label, provide an empty string
-
-    # Y-axis setup
-    ax.set_ylabel('Count (Log Scale)', fontsize=12, fontweight='bold', labelpad=10)
-    ax.set_yscale('log')  # Applying logarithmic scale to y-axis
-    max_value = max(domain_data['total_urls'].max(), domain_data['removed_count'].max())
-    ax.set_ylim(1, max_value * 2)  # Add 100% padding above the highest value for much more height
-
-    # X-axis setup
-    ax.set_xticks(x)
-    ax.set_xticklabels(domain_data['DomainName'], rotation=30, ha='right', fontsize=10)
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-
-    # Add bar labels for better visibility
-    for bar in bar1:
-        height = bar.get_height()
-        offset = 1.2  # Constant small offset for better positioning
-        ax.text(
-            bar.get_x() + bar.get_width() / 2, 
-            height + offset,  # Offset value adjusted for log scale
-            f'{int(height)}', 
-            ha='center', 
-            va='bottom', 
-            fontsize=10, 
-            color='#ff6b6b'
-        )
-
-    for bar in bar2:
-        height = bar.get_height()
-        offset = 1.2  # Same constant offset for the second group
-        ax.text(
-            bar.get_x() + bar.get_width() / 2, 
-            height + offset,  # Offset value adjusted for log scale
-            f'{int(height)}', 
-            ha='center', 
-            va='bottom', 
-            fontsize=10, 
-            color='#4a90e2'
-        )
-
-    ax.legend(loc='upper right', fontsize=10, facecolor='white', edgecolor='black')
-    plt.subplots_adjust(top=0.85, bottom=0.2)
-    # Adjust layout to avoid clipping
-    plt.tight_layout()
-
-    return fig
+    return f"Platform-wise Analysis for Social Media\n{highlight_text}"
+
+# Function to get the SocialMediaPlatforms chart's log-scale y limits, which must stay above 0
+def social_media_y_range(domain_data):
+    max_value = max(domain_data['total_urls'].max(), domain_data['removed_count'].max()) if len(domain_data) else 0
+    return 1, max(max_value, 1) * 2  # Add 100% padding above the highest value for much more height
+
+
+# Grouped bar chart for SocialMediaPlatforms, on a log scale, titled with its highlights
+class SocialMediaPlatformChart(PairedBarChart):
+    facecolor = '#f8f9fa'
+    category = 'DomainName'
+    series = ('total_urls', 'removed_count')
+    bar_width = 0.3  # Adjust bar width to increase spacing
+    bar_styles = (dict(label='Total URLs', color='#ff6b6b'), dict(label='Delisting Count', color='#4a90e2'))
+    label_styles = (dict(fontsize=10, color='#ff6b6b'), dict(fontsize=10, color='#4a90e2'))
+    tick_style = dict(rotation=30, ha='right', fontsize=10)
+    legend_style = dict(loc='upper right', fontsize=10, facecolor='white', edgecolor='black')
+
+    def style(self, ax):
+        ax.set_ylabel('Count (Log Scale)', fontsize=12, fontweight='bold', labelpad=10)
+        ax.set_yscale('log')  # Applying logarithmic scale to y-axis
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Constant small offset for better positioning on the log scale
+    def label_y(self, heights, i):
+        return heights + 1.2
+
+    def decorate(self, domain_data):
+        self.ax.set_title(social_media_title(domain_data), fontsize=14, fontweight='bold', pad=30, loc='center')
+
+        self.ax.set_ylim(*social_media_y_range(domain_data))
+
+
+# Bokeh version of SocialMediaPlatformChart
+class BokehSocialMediaPlatformChart(BokehPairedBarChart):
+    category = 'DomainName'
+    series = ('total_urls', 'removed_count')
+    labels = ('Total URLs', 'Delisting Count')
+    y_axis_type = 'log'
+    bottom = 0.1
+    height = 500
+
+    def label_y(self, heights, i):
+        return heights + 1.2
+
+    def title(self, domain_data):
+        return social_media_title(domain_data)
+
+    def y_range(self, domain_data):
+        return social_media_y_range(domain_data)
+
+
+# Function to create a grouped bar chart for SocialMediaPlatforms
+def create_social_media_platform_bar_chart(domain_data):
+    return SocialMediaPlatformChart().update(domain_data).figure
@@ -13,6 +13,11 @@ import panel as pn
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bokeh_charts import BokehPairedBarChart, BokehTrendChart
+from charts import MonthlyTrendChart, PairedBarChart, monthly_points
+from ingest import REMOVAL_STATUSES, with_removal_flag
+from telegram import order_matchdays
+
 
 
 # Summary metric calculation function
@@ -26,95 +31,99 @@ def calculate_summary(data):
     return total_properties, total_fixture, total_infringements, number_of_websites, removal_percentage
 
 
-# Function to create a grouped bar chart for the top 5 property
-def create_top_property_bar_chart(top_fixtures):
-    fig, ax = plt.subplots(figsize=(8, 5), facecolor='#f2f2f2')
-    x = np.arange(len(top_fixtures['propertyname']))
-    bar_width = 0.3
-
-    bar1 = ax.bar(x - bar_width / 2, top_fixtures['total_urls'], width=bar_width, label='Total URLs', color='#ff6b6b')
-    bar2 = ax.bar(x + bar_width / 2, top_fixtures['removal_count'], width=bar_width, label='Removal Count', color='#4a90e2')
-
-    ax.set_title("Top 5 properties Identification and Removal", fontsize=12, fontweight='bold', pad=20)
-    ax.set_ylim(0, max(top_fixtures['total_urls'].max(), top_fixtures['removal_count'].max()) * 1.15)
-    ax.set_ylabel('Value', fontsize=10, fontweight='bold')
-    ax.set_xticks(x)
-    ax.set_xticklabels(top_fixtures['propertyname'], rotation=45, ha='right')
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.legend(facecolor='#f2f2f2', fontsize=8, loc='upper right')
-    
-    for bar in bar1:
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 10, int(bar.get_height()), ha='center', va='bottom', fontsize=8)
-    for bar in bar2:
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 10, int(bar.get_height()), ha='center', va='bottom', fontsize=8)
+# Grouped bar chart for the top 5 properties
+class TopPropertyChart(PairedBarChart):
+    figsize = (8, 5)
+    category = 'propertyname'
+    series = ('total_urls', 'removal_count')
+    bar_styles = (dict(label='Total URLs', color='#ff6b6b'), dict(label='Removal Count', color='#4a90e2'))
+    label_styles = (dict(fontsize=8), dict(fontsize=8))
+    tick_style = dict(rotation=45, ha='right')
+    legend_style = dict(facecolor='#f2f2f2', fontsize=8, loc='upper right')
+
+    def style(self, ax):
+        ax.set_title("Top 5 properties Identification and Removal", fontsize=12, fontweight='bold', pad=20)
+        ax.set_ylabel('Value', fontsize=10, fontweight='bold')
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    def label_y(self, heights, i):
+        return heights + 10
 
-    plt.tight_layout()
-    return fig
+    def decorate(self, top_fixtures):
+        if len(top_fixtures):
+            self.ax.set_ylim(0, max(top_fixtures['total_urls'].max(), top_fixtures['removal_count'].max()) * 1.15)
 
 
+# Function to create a grouped bar chart for the top 5 property
+def create_top_property_bar_chart(top_fixtures):
+    return TopPropertyChart().update(top_fixtures).figure
+
 
 # Function to get top 5 fixtures based on total URLs
 def get_top_fixtures(data):
-    fixture_summary = data.groupby(['fixtures', 'URL']).agg(
-        removal_flag=('Status', lambda x: any(x.isin(['Approved', 'Removed'])))
+    fixture_summary = with_removal_flag(data).groupby(['fixtures', 'URL'], observed=True).agg(
+        removal_flag=('is_removed', 'max')
     ).reset_index()
 
-    fixture_summary = fixture_summary.groupby('fixtures').agg(
+    fixture_summary = fixture_summary.groupby('fixtures', observed=True).agg(
         total_urls=('URL', 'count'),
         removal_count=('removal_flag', 'sum')
     ).reset_index().sort_values(by='total_urls', ascending=False)
 
     return fixture_summary.nlargest(5, 'total_urls')[['fixtures', 'total_urls', 'removal_count']]
 
-# Function to create a grouped bar chart for the top 5 fixtures
-def create_top_fixtures_bar_chart(top_fixtures):
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f8f9fa')  # Light background
-    x = np.arange(len(top_fixtures['fixtures']))
-    bar_width = 0.3
-
-    # Improved bar colors
-    bar1 = ax.bar(x - bar_width / 2, top_fixtures['total_urls'], width=bar_width, label='Total URLs', color='#ff6b6b', edgecolor='black', linewidth=0.7)
-    bar2 = ax.bar(x + bar_width / 2, top_fixtures['removal_count'], width=bar_width, label='Removal Count', color='#4a90e2', edgecolor='black', linewidth=0.7)
+# Grouped bar chart for the top 5 fixtures
+class TopFixturesChart(PairedBarChart):
+    facecolor = '#f8f9fa'  # Light background
+    category = 'fixtures'
+    series = ('total_urls', 'removal_count')
+    bar_styles = (
+        dict(label='Total URLs', color='#ff6b6b', edgecolor='black', linewidth=0.7),
+        dict(label='Removal Count', color='#4a90e2', edgecolor='black', linewidth=0.7),
+    )
+    label_styles = (dict(fontsize=10, color='#ff6b6b'), dict(fontsize=10, color='#4a90e2'))
+    tick_style = dict(rotation=45, ha='right', fontsize=10)
+    legend_style = dict(loc='upper right', fontsize=10, facecolor='white', edgecolor='black')
 
-    # Enhanced title and labels                                      #4a90e2
-    ax.set_title("Top 5 Fixtures — Identification and Removal", fontsize=14, fontweight='bold', pad=20, loc='center')
-    ax.set_xlabel('')  # If you don’t want a label, provide an empty string
-    ax.set_ylabel('Count', fontsize=12, fontweight='bold', labelpad=10)
+    def style(self, ax):
+        ax.set_title("Top 5 Fixtures — Identification and Removal", fontsize=14, fontweight='bold', pad=20, loc='center')
+        ax.set_ylabel('Count', fontsize=12, fontweight='bold', labelpad=10)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.set_facecolor('#f5f5f5')  # Light gray background inside the plot area
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
 
-    # Customizing the x-axis ticks
-    ax.set_xticks(x)
-    ax.set_xticklabels(top_fixtures['fixtures'], rotation=45, ha='right', fontsize=10)
+    def label_y(self, heights, i):
+        return heights + 0.02 * heights.max(initial=0)
 
-    # Adjusting grid and background
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.set_facecolor('#f5f5f5')  # Light gray background inside the plot area
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
 
-    # Adding annotations
-    for bar in bar1:
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.02 * max(top_fixtures['total_urls']), 
-                f'{int(bar.get_height())}', ha='center', va='bottom', fontsize=10, color='#ff6b6b')
-    for bar in bar2:
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.02 * max(top_fixtures['removal_count']), 
-                f'{int(bar.get_height())}', ha='center', va='bottom', fontsize=10, color='#4a90e2')
+# Bokeh version of TopFixturesChart
+class BokehTopFixturesChart(BokehPairedBarChart):
+    category = 'fixtures'
+    series = ('total_urls', 'removal_count')
 
-    # Legend customization
-    ax.legend(loc='upper right', fontsize=10, facecolor='white', edgecolor='black')
+    def label_y(self, heights, i):
+        return heights + 0.02 * heights.max(initial=0)
 
-    plt.tight_layout()
-    return fig
+    def title(self, top_fixtures):
+        return "Top 5 Fixtures — Identification and Removal"
 
 
-# Function to create platform-wise bar chart
+# Function to create a grouped bar chart for the top 5 fixtures
+def create_top_fixtures_bar_chart(top_fixtures):
+    return TopFixturesChart().update(top_fixtures).figure
 
-def create_bar_chart(data, propertyname="All Properties", fixture="All Fixtures", max_fixtures_display=3):
-   # Group and aggregate data
-    sheet_summary = data.groupby('SheetName').agg(
+# Function to get platform-wise totals for the sheet bar chart
+def get_sheet_summary(data):
+    # Group and aggregate data
+    return with_removal_flag(data).groupby('SheetName', observed=True).agg(
         total_urls=('URL', 'nunique'),
-        removal_percentage=('Status', lambda x: x.isin(['Approved', 'Removed']).sum())
+        removal_percentage=('is_removed', 'sum')
     ).reset_index().sort_values(by='total_urls', ascending=False)
 
+
+# Function to title the platform-wise bar chart with the selected property and fixtures
+def sheet_chart_title(propertyname="All Properties", fixture="All Fixtures", max_fixtures_display=3):
     # Handle long fixture lists for the title with line wrapping
     if isinstance(fixture, list):
         if len(fixture) > max_fixtures_display:
@@ -125,112 +134,131 @@ def create_bar_chart(data, propertyname="All Properties", fixture="All Fixtures"
         fixture_display = fixture
 
     # Add line breaks for long titles
-    dynamic_title = f"Sheet wise identification & Delisted for {propertyname}\nFixtures: {fixture_display}"
-    
-    # Plot setup
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f2f2f2')
-    x = np.arange(len(sheet_summary['SheetName']))
-    bar_width = 0.3
-
-    # Bars for total URLs and removal count
-    bar1 = ax.bar(x - bar_width / 2, sheet_summary['total_urls'], width=bar_width, color='#ff6b6b', label='Total URLs')
-    bar2 = ax.bar(x + bar_width / 2, sheet_summary['removal_percentage'], width=bar_width, color='#4a90e2', label='Removal Count')
-    
-    # Set a wrapped title with line break
-    ax.set_title(dynamic_title, fontsize=12, fontweight='bold', pad=30, loc='center', wrap=True)
-    ax.set_yscale('log')  # Setting the y-axis to logarithmic scale
-    
-    # Adjust Y-axis limits to prevent overlap at top and bottom
-    min_ylim = 1 if sheet_summary['removal_percentage'].min() > 0 else 0.5
-    max_ylim = ax.get_ylim()[1] * 1.3  # Increased space above the highest bar
-    ax.set_ylim(min_ylim, max_ylim)
+    return f"Sheet wise identification & Delisted for {propertyname}\nFixtures: {fixture_display}"
+
+
+# Platform-wise bar chart, on a log scale, titled with the selected property and fixtures
+class SheetChart(PairedBarChart):
+    category = 'SheetName'
+    series = ('total_urls', 'removal_percentage')
+    bar_styles = (dict(label='Total URLs', color='#ff6b6b'), dict(label='Removal Count', color='#4a90e2'))
+    label_styles = (dict(fontsize=8), dict(fontsize=8))
+    tick_style = dict(rotation=30, ha='right')
+    legend_style = dict(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
+
+    def style(self, ax):
+        ax.set_yscale('log')  # Setting the y-axis to logarithmic scale
+        ax.set_facecolor('#e6e6e6')
+        ax.set_ylabel('Value (log scale)', fontsize=10, fontweight='bold')  # Indicating log scale on the label
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
 
     # Annotations for bars with dynamic positioning
-    for bar in bar1:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2, height + (0.15 * height if height > 0 else 0.5), 
-                f'{int(height)}', ha='center', va='bottom', fontsize=8)
-
-    for bar in bar2:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2, height + (0.15 * height if height > 0 else 0.5), 
-                f'{int(height)}', ha='center', va='bottom', fontsize=8)
-        
-    # Axis and legend settings
-    ax.set_facecolor('#e6e6e6')
-    ax.set_ylabel('Value (log scale)', fontsize=10, fontweight='bold')  # Indicating log scale on the label
-    ax.set_xticks(x)
-    ax.set_xticklabels(sheet_summary['SheetName'], rotation=30, ha='right')
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-
-    # Remove xlabel (x-axis label is not needed)
-    ax.set_xlabel(None)
-
-    # Adjust legend position to prevent overlap with the chart
-    ax.legend(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
-    
-    plt.tight_layout()
-    return fig
+    def label_y(self, heights, i):
+        return np.where(heights > 0, 1.15 * heights, 0.5)
+
+    def decorate(self, sheet_summary, propertyname="All Properties", fixture="All Fixtures", max_fixtures_display=3):
+        self.ax.set_title(sheet_chart_title(propertyname, fixture, max_fixtures_display), fontsize=12, fontweight='bold', pad=30, loc='center', wrap=True)
+
+        # Adjust Y-axis limits to prevent overlap at top and bottom
+        min_ylim = 1 if sheet_summary['removal_percentage'].min() > 0 else 0.5
+        max_ylim = self.ax.get_ylim()[1] * 1.3  # Increased space above the highest bar
+        self.ax.set_ylim(min_ylim, max_ylim)
+
+
+# Bokeh version of SheetChart
+class BokehSheetChart(BokehPairedBarChart):
+    category = 'SheetName'
+    series = ('total_urls', 'removal_percentage')
+    y_axis_type = 'log'
+    bottom = 0.1
+
+    def label_y(self, heights, i):
+        return np.where(heights > 0, 1.15 * heights, 0.5)
+
+    def title(self, sheet_summary, propertyname="All Properties", fixture="All Fixtures", max_fixtures_display=3):
+        return sheet_chart_title(propertyname, fixture, max_fixtures_display)
+
+    def y_range(self, sheet_summary):
+        min_ylim = 1 if sheet_summary['removal_percentage'].min() > 0 else 0.5
+        return min_ylim, max(sheet_summary['total_urls'].max() if len(sheet_summary) else 0, 1) * 2
+
+
+# Function to create platform-wise bar chart
+def create_bar_chart(sheet_summary, propertyname="All Properties", fixture="All Fixtures", max_fixtures_display=3):
+    return SheetChart().update(sheet_summary, propertyname, fixture, max_fixtures_display).figure
     
 # Function to get monthly totals
 def get_monthly_totals(data):
-    data['Month'] = data['Identification Timestamp'].dt.to_period('M')
-    monthly_summary = data.groupby('Month').agg(
+    # Group by a derived key rather than adding a column, so the caller's frame is left untouched
+    month = data['Identification Timestamp'].dt.to_period('M').rename('Month')
+    monthly_summary = with_removal_flag(data).groupby(month).agg(
         total_urls=('URL', 'count'),
-        removal_count=('Status', lambda x: x.isin(['Approved', 'Removed']).sum())
+        removal_count=('is_removed', 'sum')
     ).reset_index().sort_values(by='total_urls', ascending=False)
     monthly_summary['Month'] = monthly_summary['Month'].dt.to_timestamp()
     return monthly_summary
 
+class MonthlyTotalsChart(MonthlyTrendChart):
+    title = "Monthly Identification and Removal Trends"
+
+
+# Bokeh version of MonthlyTotalsChart
+class BokehMonthlyTotalsChart(BokehTrendChart):
+    category = 'Month'
+    series = ('total_urls', 'removal_count')
+    labels = ('Total URLs', 'Removal Count')
+    colors = ('#ff6b6b', '#4a90e2')
+    markers = ('circle', 'diamond')
+    label_colors = colors
+    title_text = "Monthly Identification and Removal Trends"
+
+    def points(self, monthly_data):
+        return monthly_points(monthly_data)
+
+
 def create_monthly_totals_line_plot(monthly_data):
-    # Convert 'Month' column to datetime if it's not already
-    monthly_data['Month'] = pd.to_datetime(monthly_data['Month'])
-
-    # Group data by month and sum total URLs and removal counts
-    monthly_data = monthly_data.resample('M', on='Month').sum()
-    monthly_data.index = monthly_data.index.strftime('%b %Y')  # Format to show "Month Year"
-
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f9f9f9')
-
-    # Plotting total URLs and removal counts with enhancements
-    ax.plot(monthly_data.index, monthly_data['total_urls'], marker='o', color='#ff6b6b', linewidth=2.5,
-            markersize=8, label='Total URLs')
-    ax.plot(monthly_data.index, monthly_data['removal_count'], marker='D', color='#4a90e2', linewidth=2.5,
-            markersize=8, label='Removal Count')
-
-    # Adjust y-limits to add padding above the highest value
-    max_y_value = max(monthly_data['total_urls'].max(), monthly_data['removal_count'].max())
-    ax.set_ylim(0, max_y_value * 1.2)  # Add 20% padding above the highest value
-
-    # Add data point labels with adjusted positions and styling for readability
-    for i, (month, row) in enumerate(monthly_data.iterrows()):
-        ax.annotate(f"{int(row['total_urls'])}",
-                    xy=(i, row['total_urls']),  # Data point position
-                    xytext=(0, 10),  # Offset (x=0, y=10)
-                    textcoords='offset points',
-                    ha='center', fontsize=9, color='#ff6b6b', fontweight='bold')
-        ax.annotate(f"{int(row['removal_count'])}",
-                    xy=(i, row['removal_count']),  # Data point position
-                    xytext=(0, 10),  # Offset (x=0, y=10)
-                    textcoords='offset points',
-                    ha='center', fontsize=9, color='#4a90e2', fontweight='bold')
-
-    # Enhanced title and axis labels
-    ax.set_title("Monthly Identification and Removal Trends", fontsize=14, fontweight='bold', pad=20)
-    ax.set_xlabel('Month', fontsize=12, fontweight='bold')
-    ax.set_ylabel('Count', fontsize=12, fontweight='bold')
-
-    # Set custom x-tick labels to show every month and rotate for clarity
-    ax.set_xticks(range(len(monthly_data.index)))
-    ax.set_xticklabels(monthly_data.index, rotation=45, ha='right', fontsize=10)
-
-    # Add gridlines and background gradient for a cleaner look
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.set_facecolor('#f0f7ff')  # Light background color for the plot area
-
-    # Add legend with updated font size
-    ax.legend(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
-
-    # Ensure the layout is adjusted to accommodate the labels
-    plt.tight_layout()
-    return fig
+    return MonthlyTotalsChart().update(monthly_data).figure
+
+
+# Function to compute every KPI and chart input of the Summary tab in one grouped pass.
+# The rows are grouped once, down to the URL, by every column the tab breaks them down by,
+# and each result is rolled up from those groups instead of scanning the rows again.
+# Returns {data function name: result}, each equal to what that function returns for data.
+def summary_bundle(data):
+    month = data['Identification Timestamp'].dt.to_period('M').rename('Month')
+    groups = data.groupby(['SheetName', 'propertyname', 'fixtures', 'DomainName', 'Matchday', 'Status', month, 'URL'],
+                          observed=True, dropna=False, sort=False).size().rename('rows').reset_index()
+    groups['is_removed'] = groups['Status'].isin(REMOVAL_STATUSES).to_numpy()
+    # Row counts split the way the count-based charts need them: rows with a URL, and removals
+    groups['url_rows'] = groups['rows'].where(groups['URL'].notna(), 0)
+    groups['removed_rows'] = groups['rows'].where(groups['is_removed'], 0)
+
+    sheet_summary = groups.groupby('SheetName', observed=True).agg(
+        total_urls=('URL', 'nunique'),
+        removal_percentage=('removed_rows', 'sum')
+    ).reset_index().sort_values(by='total_urls', ascending=False)
+
+    monthly_summary = groups.groupby('Month').agg(
+        total_urls=('url_rows', 'sum'),
+        removal_count=('removed_rows', 'sum')
+    ).reset_index().sort_values(by='total_urls', ascending=False)
+    monthly_summary['Month'] = monthly_summary['Month'].dt.to_timestamp()
+
+    domain_summary = groups[groups['SheetName'] == 'SocialMediaPlatforms'].groupby('DomainName', observed=True).agg(
+        total_urls=('url_rows', 'sum'),
+        removed_count=('removed_rows', 'sum'),
+    ).reset_index().sort_values(by='total_urls', ascending=False)
+
+    matchday_summary = order_matchdays(groups.groupby('Matchday', observed=True).agg(
+        total_urls=('url_rows', 'sum')
+    ).reset_index())
+
+    return {
+        # Distinct counts and per-URL removal flags come out the same over the groups as over the rows
+        'calculate_summary': calculate_summary(groups),
+        'get_top_fixtures': get_top_fixtures(groups),
+        'get_sheet_summary': sheet_summary,
+        'get_monthly_totals': monthly_summary,
+        'get_social_media_platform_data': domain_summary,
+        'aggregate_matchday_data': matchday_summary,
+    }
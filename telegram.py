@@ -12,6 +12,10 @@ from datetime import datetime
 import plotly.express as px
 import pandas as pd
 
+from bokeh_charts import BokehTrendChart
+from charts import MonthlyTrendChart, TrendChart
+from ingest import REMOVAL_STATUSES, order_matchdays, with_removal_flag
+
 
 def  calculate_telegram_summary(data):
     total_properties_telegram = data['propertyname'].nunique()
@@ -34,11 +38,11 @@ def  calculate_telegram_summary(data):
 
 # Function to get top 5 property's based on total URLs
 def get_top_telegram_property(data):
-    telgramproperty_summary= data.groupby(['propertyname', 'URL']).agg(
-        removal_flag=('Status', lambda x: any(x.isin(['Approved', 'Removed'])))
+    telgramproperty_summary= with_removal_flag(data).groupby(['propertyname', 'URL'], observed=True).agg(
+        removal_flag=('is_removed', 'max')
     ).reset_index()
 
-    telgramproperty_summary = telgramproperty_summary.groupby('propertyname').agg(
+    telgramproperty_summary = telgramproperty_summary.groupby('propertyname', observed=True).agg(
         total_urls=('URL', 'count'),
         removal_count=('removal_flag', 'sum')
     ).reset_index().sort_values(by='total_urls', ascending=False)
@@ -50,11 +54,11 @@ def get_top_telegram_property(data):
 #fucntio to get telegram summary
 def get_telegram_platform_data(data):
 
-    platform = data[data['SheetName'] == 'Telegram']
+    platform = with_removal_flag(data[data['SheetName'] == 'Telegram'])
     # Calculate total URLs, count of 'Removed' and 'Approved' statuses for each DomainName
-    Telegram_summary = platform.groupby('DomainName').agg(
+    Telegram_summary = platform.groupby('DomainName', observed=True).agg(
         total_urls=('URL', 'count'),
-        removed_count=('Status', lambda x: x.isin(['Approved', 'Removed']).sum()),
+        removed_count=('is_removed', 'sum'),
     ).reset_index().sort_values(by='total_urls', ascending=False)
     
     return Telegram_summary
@@ -131,15 +135,15 @@ def widgets():
 # Function to get top 5 fixtures based on total URLs in the "Telegram" sheet
 def get_telegram_top_fixtures(data):
     # Filter data for the "Telegram" sheet only
-    telegram_data = data[data['SheetName'] == 'Telegram']
+    telegram_data = with_removal_flag(data[data['SheetName'] == 'Telegram'])
     
     # Group by 'fixtures' and 'URL', calculate removal flag
-    fixture_summary = telegram_data.groupby(['fixtures', 'URL']).agg(
-        removal_flag=('Status', lambda x: any(x.isin(['Approved', 'Removed'])))
+    fixture_summary = telegram_data.groupby(['fixtures', 'URL'], observed=True).agg(
+        removal_flag=('is_removed', 'max')
     ).reset_index()
 
     # Aggregate by 'fixtures' to count total URLs and removal count
-    fixture_summary = fixture_summary.groupby('fixtures').agg(
+    fixture_summary = fixture_summary.groupby('fixtures', observed=True).agg(
         total_urls=('URL', 'count')
     ).reset_index().sort_values(by='total_urls', ascending=False)
 
@@ -209,7 +213,7 @@ def telegram_domains_by_subscribers(data, selected_fixture=None):
     telegram_data['channelsubscribers'].fillna(0, inplace=True)
     
     # Group by 'DomainName' and sum the 'channelsubscribers'
-    domain_summary = telegram_data.groupby('DomainName').agg(
+    domain_summary = telegram_data.groupby('DomainName', observed=True).agg(
         total_subscribers=('channelsubscribers', 'sum')
     ).reset_index()
     
@@ -255,24 +259,11 @@ def aggregate_matchday_data(data):
 
     """
 
-    # Normalize Matchday column
-    data['Matchday'] = data['Matchday'].str.strip().str.title()  # Remove extra spaces, normalize capitalization
-
-    # Aggregate data
-    matchday_summary = data.groupby('Matchday').agg(
+    matchday_summary = data.groupby('Matchday', observed=True).agg(
         total_urls=('URL', 'count')
     ).reset_index()
 
-    # Extract numerical part from Matchday and sort by it
-    
-    matchday_summary['Matchday_num'] = matchday_summary['Matchday'].str.extract(r'(\d+)$').astype(int)
-    matchday_summary = matchday_summary.sort_values(by='Matchday_num', ascending=True)  # Sort in ascending order
-
-    # Drop the temporary Matchday_num column
-    matchday_summary = matchday_summary.drop(columns='Matchday_num')
-
-    # Reset index after sorting to ensure correct indexing
-    matchday_summary = matchday_summary.reset_index(drop=True)
+    matchday_summary = order_matchdays(matchday_summary)
 
     print(matchday_summary)
 
@@ -281,50 +272,38 @@ def aggregate_matchday_data(data):
 
 
 
-def create_enhanced_matchday_line_plot(matchday_data):
-     
-    # Ensure 'Matchday' is sorted in ascending numeric order
-    matchday_data['Matchday_num'] = matchday_data['Matchday'].str.extract(r'(\d+)$').astype(int)
-    matchday_data = matchday_data.sort_values(by='Matchday_num', ascending=True).drop(columns='Matchday_num')
+# Total URLs per Matchday, in Matchday order
+class MatchdayChart(TrendChart):
+    facecolor = '#f9f9f9'
+    category = 'Matchday'
+    series = ('total_urls',)
+    line_styles = (dict(marker='o', markersize=8, color='#ff6b6b', linewidth=2.5, label='Total URLs'),)
+    label_styles = (dict(fontsize=9, color='#4a90e2', fontweight='bold'),)
+    label_offset = (0, 15)
+    tick_style = dict(rotation=45, ha='right', fontsize=10)
+    legend_style = dict(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
 
-    # Create the figure and axis
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f9f9f9')
+    def style(self, ax):
+        ax.set_title("Matchday Identification and Removal Trends", fontsize=14, fontweight='bold', pad=20)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.set_facecolor('#f0f7ff')
 
-    # Plot lines with markers
-    ax.plot(matchday_data['Matchday'], matchday_data['total_urls'], marker='o', markersize=8,
-            color='#ff6b6b', linewidth=2.5, label='Total URLs')
 
-    # Annotate data points outside the graph
-    for i, row in matchday_data.iterrows():
-        # Position the labels outside the graph layout
-        ax.annotate(f"{int(row['total_urls'])}",
-                    xy=(i, row['total_urls']),  # Data point position
-                    xytext=(0, 15),  # Offset (x=0, y=15)
-                    textcoords='offset points',
-                    ha='center', fontsize=9, color='#4a90e2', fontweight='bold')
+# Bokeh version of MatchdayChart
+class BokehMatchdayChart(BokehTrendChart):
+    category = 'Matchday'
+    series = ('total_urls',)
+    labels = ('Total URLs',)
+    colors = ('#ff6b6b',)
+    markers = ('circle',)
+    label_colors = ('#4a90e2',)
+    label_offset = 15
+    title_text = "Matchday Identification and Removal Trends"
 
-    # Title and labels
-    ax.set_title("Matchday Identification and Removal Trends", fontsize=14, fontweight='bold', pad=20)
 
-
-    # Customize x-ticks and rotate labels
-    ax.set_xticks(range(len(matchday_data['Matchday'])))
-    ax.set_xticklabels(matchday_data['Matchday'], rotation=45, ha='right', fontsize=10)
-
-    # Adjust y-limits to add padding above the highest value
-    max_y_value = matchday_data['total_urls'].max()
-    ax.set_ylim(0, max_y_value * 1.2)  # Add 20% padding above the highest value
-
-    # Grid and background styling
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.set_facecolor('#f0f7ff')
-
-    # Legend
-    ax.legend(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
-
-    # Ensure the layout is adjusted to accommodate the labels
-    plt.tight_layout()
-    return fig
+def create_enhanced_matchday_line_plot(matchday_data):
+    # 'Matchday' arrives in ascending numeric order from aggregate_matchday_data
+    return MatchdayChart().update(matchday_data).figure
 
 
 
@@ -333,7 +312,7 @@ def create_enhanced_matchday_line_plot(matchday_data):
 
 def telegram_monthly_totals(data):
     # Filter data for the specified sheet
-    telegram_data = data[data['SheetName'] == 'Telegram']  # Adjust 'Sheet Name' to your actual column name
+    telegram_data = with_removal_flag(data[data['SheetName'] == 'Telegram'])  # Adjust 'Sheet Name' to your actual column name
     
     # Ensure 'Identification Timestamp' is in datetime format
     telegram_data['Identification Timestamp'] = pd.to_datetime(telegram_data['Identification Timestamp'])
@@ -344,7 +323,7 @@ def telegram_monthly_totals(data):
     # Group and aggregate the data
     monthly_summary = telegram_data.groupby('Month').agg(
         total_urls=('URL', 'count'),
-        removal_count=('Status', lambda x: x.isin(['Approved', 'Removed']).sum())
+        removal_count=('is_removed', 'sum')
     ).reset_index().sort_values(by='total_urls', ascending=False)
     
     # Convert 'Month' back to a timestamp
@@ -353,58 +332,13 @@ def telegram_monthly_totals(data):
     return monthly_summary
 
 
+class TelegramMonthlyTotalsChart(MonthlyTrendChart):
+    title = "Overall piracy Identification and Removal"
+    title_size = 10
+
+
 def telegram_monthly_totals_line_plot(monthly_data):
-    # Convert 'Month' column to datetime if it's not already
-    monthly_data['Month'] = pd.to_datetime(monthly_data['Month'])
-
-    # Group data by month and sum total URLs and removal counts
-    monthly_data = monthly_data.resample('M', on='Month').sum()
-    monthly_data.index = monthly_data.index.strftime('%b %Y')  # Format to show "Month Year"
-
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f9f9f9')
-
-    # Plotting total URLs and removal counts with enhancements
-    ax.plot(monthly_data.index, monthly_data['total_urls'], marker='o', color='#ff6b6b', linewidth=2.5,
-            markersize=8, label='Total URLs')
-    ax.plot(monthly_data.index, monthly_data['removal_count'], marker='D', color='#4a90e2', linewidth=2.5,
-            markersize=8, label='Removal Count')
-
-    # Adjust y-limits to add padding above the highest value
-    max_y_value = max(monthly_data['total_urls'].max(), monthly_data['removal_count'].max())
-    ax.set_ylim(0, max_y_value * 1.2)  # Add 20% padding above the highest value
-
-    # Add data point labels with adjusted positions and styling for readability
-    for i, (month, row) in enumerate(monthly_data.iterrows()):
-        ax.annotate(f"{int(row['total_urls'])}",
-                    xy=(i, row['total_urls']),  # Data point position
-                    xytext=(0, 10),  # Offset (x=0, y=10)
-                    textcoords='offset points',
-                    ha='center', fontsize=9, color='#ff6b6b', fontweight='bold')
-        ax.annotate(f"{int(row['removal_count'])}",
-                    xy=(i, row['removal_count']),  # Data point position
-                    xytext=(0, 10),  # Offset (x=0, y=10)
-                    textcoords='offset points',
-                    ha='center', fontsize=9, color='#4a90e2', fontweight='bold')
-
-    # Enhanced title and axis labels
-    ax.set_title("Overall piracy Identification and Removal", fontsize=10, fontweight='bold', pad=20)
-    ax.set_xlabel('Month', fontsize=12, fontweight='bold')
-    ax.set_ylabel('Count', fontsize=12, fontweight='bold')
-
-    # Set custom x-tick labels to show every month and rotate for clarity
-    ax.set_xticks(range(len(monthly_data.index)))
-    ax.set_xticklabels(monthly_data.index, rotation=45, ha='right', fontsize=10)
-
-    # Add gridlines and background gradient for a cleaner look
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.set_facecolor('#f0f7ff')  # Light background color for the plot area
-
-    # Add legend with updated font size
-    ax.legend(facecolor='#f2f2f2', fontsize=8, loc='upper left', bbox_to_anchor=(1, 1))
-
-    # Ensure the layout is adjusted to accommodate the labels
-    plt.tight_layout()
-    return fig
+    return TelegramMonthlyTotalsChart().update(monthly_data).figure
 
 
 
@@ -419,7 +353,7 @@ def top_fixtures_donut_chart(data):
     telegram_data = telegram_data.dropna(subset=['views'])
     
     # Group by 'fixtures' and sum the 'views'
-    fixture_summary = telegram_data.groupby('fixtures', as_index=False)['views'].sum()
+    fixture_summary = telegram_data.groupby('fixtures', as_index=False, observed=True)['views'].sum()
     
     # Sort fixtures by summed "views" in descending order
     fixture_summary = fixture_summary.sort_values(by='views', ascending=False)
@@ -462,7 +396,8 @@ def top_fixtures_graph_donut_chart(top_fixtures):
     return fig
 
 
-def create_channel_type_pie_chart(data):
+# Function to count Telegram channels by type
+def get_channel_type_summary(data):
     # Filter data for the "Telegram" sheet only
     telegram_data = data[data['SheetName'] == 'Telegram']
     
@@ -471,9 +406,13 @@ def create_channel_type_pie_chart(data):
     filtered_data = telegram_data[telegram_data['ChannelType'].isin(valid_channel_types)]
     
     # Group by 'channeltype' and count occurrences
-    channeltype_summary = filtered_data['ChannelType'].value_counts().reset_index()
+    channeltype_summary = filtered_data['ChannelType'].value_counts()
+    channeltype_summary = channeltype_summary[channeltype_summary > 0].reset_index()  # Categoricals also count unused labels
     channeltype_summary.columns = ['ChannelType', 'count']
+    return channeltype_summary
+
 
+def create_channel_type_pie_chart(channeltype_summary):
     # Create the pie chart
     fig = px.pie(
         channeltype_summary,
@@ -508,3 +447,44 @@ def create_channel_type_pie_chart(data):
 
     return fig
 
+
+# Function to compute every KPI and chart input of the Telegram tab in one grouped pass over
+# the Telegram rows: they're grouped once, down to the URL, by every column the tab breaks
+# them down by, with views and subscribers summed per group, and each result is rolled up
+# from the groups. Returns {data function name: result}, like summary.summary_bundle.
+def telegram_bundle(data):
+    telegram_data = data[data['SheetName'] == 'Telegram']
+    month = telegram_data['Identification Timestamp'].dt.to_period('M').rename('Month')
+    counts = telegram_data[['views', 'channelsubscribers']].apply(pd.to_numeric, errors='coerce')
+    keys = [telegram_data[column] for column in ('SheetName', 'propertyname', 'fixtures', 'DomainName', 'ChannelType',
+                                                  'ChannelStatus', 'Status')] + [month, telegram_data['URL']]
+    grouped = counts.groupby(keys, observed=True, dropna=False, sort=False)
+    # min_count keeps groups without any views at NaN, as the donut chart drops those rows
+    groups = grouped.sum(min_count=1).join(grouped.size().rename('rows')).reset_index()
+    groups['is_removed'] = groups['Status'].isin(REMOVAL_STATUSES).to_numpy()
+    groups['url_rows'] = groups['rows'].where(groups['URL'].notna(), 0)
+    groups['removed_rows'] = groups['rows'].where(groups['is_removed'], 0)
+
+    monthly_summary = groups.groupby('Month').agg(
+        total_urls=('url_rows', 'sum'),
+        removal_count=('removed_rows', 'sum')
+    ).reset_index().sort_values(by='total_urls', ascending=False)
+    monthly_summary['Month'] = monthly_summary['Month'].dt.to_timestamp()
+
+    channel_types = groups[groups['ChannelType'].isin(['Public', 'Private'])]
+    channeltype_summary = channel_types.groupby('ChannelType', observed=False)['rows'].sum().rename('count')
+    channeltype_summary = channeltype_summary.sort_values(ascending=False)
+    channeltype_summary = channeltype_summary[channeltype_summary > 0].reset_index()
+    channeltype_summary.columns = ['ChannelType', 'count']
+
+    return {
+        # Distinct counts, per-URL removal flags and the views/subscriber sums come out the
+        # same over the groups as over the rows
+        'calculate_telegram_summary': calculate_telegram_summary(groups),
+        'get_telegram_top_fixtures': get_telegram_top_fixtures(groups),
+        'get_top_telegram_property': get_top_telegram_property(groups),
+        'telegram_domains_by_subscribers': telegram_domains_by_subscribers(groups),
+        'top_fixtures_donut_chart': top_fixtures_donut_chart(groups),
+        'telegram_monthly_totals': monthly_summary,
+        'get_channel_type_summary': channeltype_summary,
+    }
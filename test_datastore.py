@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from datastore import MISSING_URL, DataStore
+
+
+# Function to build a cleaned frame of rows, one per (URL, SheetName) pair given
+def make_frame(pairs):
+    return pd.DataFrame({
+        'propertyname': 'Serie A',
+        'fixtures': 'Team 1 vs Team 2',
+        'DomainName': 'example.com',
+        'URL': [url for url, _ in pairs],
+        'Status': 'Removed',
+        'Identification Timestamp': pd.date_range('2024-08-01', periods=len(pairs), freq='h'),
+        'SheetName': [sheet for _, sheet in pairs],
+    })
+
+
+class DataStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = DataStore(os.path.join(self.directory.name, 'dashboard.sqlite'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stored_rows(self, dataset_id):
+        return self.store.read_sql("SELECT URL, SheetName FROM infringements WHERE dataset_id = ?", (dataset_id,))
+
+    def test_upload_keeps_every_row(self):
+        frame = make_frame([('https://a', 'Telegram'), ('https://a', 'Telegram'), (MISSING_URL, 'Telegram'),
+                            (MISSING_URL, 'Telegram'), (MISSING_URL, 'Source_urls')])
+        dataset_id = self.store.append(frame)
+
+        self.assertEqual(len(self.stored_rows(dataset_id)), len(frame))
+        self.assertEqual(self.store.datasets()['rows'].tolist(), [len(frame)])
+
+    def test_merge_skips_known_urls(self):
+        dataset_id = self.store.append(make_frame([('https://a', 'Telegram'), (MISSING_URL, 'Telegram')]))
+        added = self.store.merge(make_frame([('https://a', 'Telegram'), ('https://a', 'Source_urls'),
+                                             ('https://b', 'Telegram'), ('https://b', 'Telegram'),
+                                             (MISSING_URL, 'Telegram')]), dataset_id)
+
+        self.assertEqual(list(zip(added['URL'], added['SheetName'])),
+                         [('https://a', 'Source_urls'), ('https://b', 'Telegram'), (MISSING_URL, 'Telegram')])
+        self.assertEqual(len(self.stored_rows(dataset_id)), 5)
+        self.assertEqual(self.store.datasets()['rows'].tolist(), [5])
+
+    def test_existing_unique_index_is_dropped(self):
+        path = self.store.path
+        with self.store.connect() as conn:
+            conn.execute('CREATE UNIQUE INDEX ux_infringements_url ON infringements (dataset_id, SheetName, URL)')
+        store = DataStore(path)
+        dataset_id = store.append(make_frame([(MISSING_URL, 'Telegram'), (MISSING_URL, 'Telegram')]))
+
+        self.assertEqual(len(self.stored_rows(dataset_id)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,7 +23,7 @@ matplotlib.use('Agg')  # Non-interactive backend for Matplotlib
 from socialMedia import get_social_media_platform_data, create_social_media_platform_bar_chart
 from summary import (
     calculate_summary, create_top_property_bar_chart, get_top_fixtures, 
-    create_top_fixtures_bar_chart, create_bar_chart, get_monthly_totals, 
+    create_top_fixtures_bar_chart, get_sheet_summary, create_bar_chart, get_monthly_totals, 
     create_monthly_totals_line_plot
 )
 from telegram import (
@@ -33,7 +33,7 @@ from telegram import (
     create_enhanced_matchday_line_plot, aggregate_matchday_data, 
     telegram_monthly_totals_line_plot, telegram_monthly_totals, 
     top_fixtures_donut_chart, top_fixtures_graph_donut_chart, 
-    create_channel_type_pie_chart
+    get_channel_type_summary, create_channel_type_pie_chart
 )
 
 app = Flask(__name__)
@@ -424,7 +424,7 @@ def create_dashboard(combined_data):
 
 
         # Update the charts only when the "Apply" button is clicked
-        bar_chart.object = create_bar_chart(filtered_data, selected_property, ", ".join(selected_fixtures) if selected_fixtures else "All Fixtures")
+        bar_chart.object = create_bar_chart(get_sheet_summary(filtered_data), selected_property, ", ".join(selected_fixtures) if selected_fixtures else "All Fixtures")
         bar_chart_top_fixtures.object = create_top_fixtures_bar_chart(get_top_fixtures(filtered_data))
         line_chart_monthly.object = create_monthly_totals_line_plot(get_monthly_totals(filtered_data))
         # Generate social media platform chart after applying filters
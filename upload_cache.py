@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+
+DEFAULT_CACHE_DIR = os.environ.get('UPLOAD_CACHE_DIR', 'upload_cache')
+DEFAULT_MAX_BYTES = int(os.environ.get('UPLOAD_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+
+# Function to hash an uploaded workbook so identical files share one cache entry.
+# The salt names the format of the cached frames, so changing it retires old entries.
+def file_digest(file_path, salt=b'', chunk_size=1024 * 1024):
+    digest = hashlib.sha256(salt)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to write one frame to Parquet, or pickle it when it has mixed-type columns Arrow
+# can't store, so a cached frame always reads back with the values clean_data produced
+def _write_frame(frame, path):
+    try:
+        frame.to_parquet(path + '.parquet', index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if os.path.exists(path + '.parquet'):
+            os.remove(path + '.parquet')
+        frame.to_pickle(path + '.pkl')
+
+
+def _read_frame(path):
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+    return pd.read_parquet(path)
+
+
+# Function to tell whether name is a workbook digest (file_digest's 64 hex characters)
+def is_digest(name):
+    return len(name) == 64 and all(c in '0123456789abcdef' for c in name)
+
+
+# Content-addressed store of cleaned per-sheet frames, one directory per workbook hash.
+# Directory mtimes double as the LRU clock: every hit touches the entry.
+class UploadCache:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, digest):
+        return os.path.join(self.cache_dir, digest)
+
+    def get(self, digest):
+        entry_dir = self._entry_dir(digest)
+        if not os.path.isdir(entry_dir):
+            return None
+        try:
+            names = sorted(os.listdir(entry_dir))
+            sheets = [_read_frame(os.path.join(entry_dir, name)) for name in names]
+        except Exception as e:
+            logging.warning(f"Dropping unreadable cache entry {digest}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        os.utime(entry_dir)
+        return sheets
+
+    def put(self, digest, sheets):
+        entry_dir = self._entry_dir(digest)
+        if os.path.isdir(entry_dir):
+            os.utime(entry_dir)
+            return
+
+        # Write into a scratch directory and rename, so readers never see a half-written entry
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            for i, sheet in enumerate(sheets):
+                _write_frame(sheet, os.path.join(tmp_dir, f"{i:02d}"))
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another upload of the same file won the race
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for digest in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(digest)
+            if not is_digest(digest) or not os.path.isdir(entry_dir):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            entries.append({'digest': digest, 'bytes': size, 'last_used': os.path.getmtime(entry_dir)})
+        return sorted(entries, key=lambda entry: entry['last_used'], reverse=True)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(entry['bytes'] for entry in entries)
+        # Oldest entries go first until the cache is back within budget
+        while entries and total > self.max_bytes:
+            entry = entries.pop()
+            self.purge(entry['digest'])
+            total -= entry['bytes']
+            logging.info(f"Evicted cache entry {entry['digest']} ({entry['bytes']} bytes)")
+
+    def purge(self, digest=None):
+        if digest is not None and not is_digest(digest):
+            raise ValueError(f"{digest!r} is not a cache entry digest")
+        digests = [digest] if digest else [entry['digest'] for entry in self.entries()]
+        digests = [d for d in digests if os.path.isdir(self._entry_dir(d))]
+        for d in digests:
+            shutil.rmtree(self._entry_dir(d), ignore_errors=True)
+        return digests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or purge the uploaded workbook cache.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list cache entries, most recently used first")
+    purge_parser = commands.add_parser('purge', help="remove one entry, or every entry with --all")
+    purge_parser.add_argument('digest', nargs='?')
+    purge_parser.add_argument('--all', action='store_true')
+    args = parser.parse_args(argv)
+
+    cache = UploadCache(args.cache_dir)
+    if args.command == 'list':
+        entries = cache.entries()
+        for entry in entries:
+            last_used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_used']))
+            print(f"{entry['digest']}  {entry['bytes'] / 1024 ** 2:10.2f} MB  {last_used}")
+        print(f"{len(entries)} entries, {sum(e['bytes'] for e in entries) / 1024 ** 2:.2f} MB "
+              f"of {cache.max_bytes / 1024 ** 2:.0f} MB")
+    elif args.command == 'purge':
+        if not args.digest and not args.all:
+            parser.error("purge needs a digest or --all")
+        try:
+            digests = cache.purge(None if args.all else args.digest)
+        except ValueError as e:
+            parser.error(str(e))
+        for digest in digests:
+            print(f"Purged {digest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import param
+from panel.reactive import ReactiveHTML
+
+
+# Wrapper reporting whether its content is scrolled into the browser window, from an
+# IntersectionObserver on the wrapping element. in_view starts True, so content is treated as
+# visible until the browser says otherwise (and always where there is no browser).
+class InView(ReactiveHTML):
+
+    object = param.Parameter()
+
+    in_view = param.Boolean(default=True)
+
+    _template = '<div id="container" style="width: 100%; height: 100%;">${object}</div>'
+
+    _scripts = {
+        'render': """
+            state.observer = new IntersectionObserver((entries) => {
+                data.in_view = entries[entries.length - 1].isIntersecting
+            })
+            state.observer.observe(container)
+        """,
+        'remove': "state.observer.disconnect()",
+    }
+
+    def __init__(self, object=None, **params):
+        super().__init__(object=object, **params)
+
+
+# A dashboard chart that is rendered lazily. set() records the inputs of the latest filter update
+# and marks the chart dirty; the dashboard renders it (through show_chart) only once its tab is
+# open and its pane is in view, so charts nobody looks at are never rendered.
+class LazyChart:
+
+    def __init__(self, pane, chart, tab):
+        self.pane = pane
+        self.chart = chart
+        self.tab = tab
+        self.view = InView(pane, sizing_mode="stretch_width")
+        self.inputs = None
+        self.current = None
+        self.dirty = False
+
+    # current() tells whether the update that produced inputs is still the latest of its tab
+    def set(self, inputs, current):
+        self.inputs = inputs
+        self.current = current
+        self.dirty = True
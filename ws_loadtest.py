@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from threading import Thread
+
+import gevent
+from gevent import pywsgi
+from bokeh.models import ColumnDataSource
+from bokeh.plotting import figure
+from bokeh.protocol import Protocol
+from bokeh.server.server import Server
+from bokeh.util.token import generate_jwt_token, generate_session_id
+from websocket import ABNF
+
+from app import app
+from ws_proxy import ProxyWebSocketHandler, connect_upstream
+
+
+# Load test for the /dashboard/ws proxy: starts a local Bokeh server whose documents stream
+# a point every --push-interval ms, puts the app's proxy in front of it, and opens --clients
+# concurrent Bokeh sessions through the proxy. Reports pushed-message throughput, PULL-DOC
+# round trips and close codes. --direct connects straight to Bokeh for a baseline.
+
+
+# Function to build one streaming document, so the server pushes patches without being asked
+def make_streaming_doc(push_interval):
+    def modify_doc(doc):
+        source = ColumnDataSource({'x': [0], 'y': [0]})
+        plot = figure(height=200)
+        plot.line('x', 'y', source=source)
+        doc.add_root(plot)
+
+        def push():
+            x = source.data['x'][-1] + 1
+            source.stream({'x': [x], 'y': [x % 17]}, rollover=200)
+        doc.add_periodic_callback(push, push_interval)
+    return modify_doc
+
+
+# Function to run the Bokeh server on its own thread and event loop; returns the bound port
+def start_bokeh_server(push_interval):
+    started = []
+
+    def run():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        server = Server({'/bokeh_app': make_streaming_doc(push_interval)}, port=0,
+                        allow_websocket_origin=['*'], address='127.0.0.1')
+        server.start()
+        started.append(server.port)
+        server.io_loop.start()
+
+    Thread(target=run, daemon=True).start()
+    while not started:
+        time.sleep(0.05)
+    return started[0]
+
+
+# Function to send one Bokeh protocol message as its header, metadata and content frames
+def send_message(ws, message):
+    for part in (message.header_json, message.metadata_json, message.content_json):
+        ws.send(part, opcode=ABNF.OPCODE_TEXT)
+
+
+# One simulated dashboard user: counts every frame it is pushed and times PULL-DOC round trips
+def run_client(url, deadline, stats):
+    protocol = Protocol()
+    token = generate_jwt_token(generate_session_id())
+    try:
+        ws = connect_upstream(url, subprotocols=['bokeh', token])
+    except Exception as e:
+        stats['connect_errors'] += 1
+        logging.debug(f"Connect failed: {e}")
+        return
+    stats['connected'] += 1
+
+    pending = {}
+
+    def pull():
+        while time.time() < deadline:
+            request = protocol.create('PULL-DOC-REQ')
+            pending[request.header['msgid']] = time.perf_counter()
+            send_message(ws, request)
+            gevent.sleep(1)
+
+    puller = gevent.spawn(pull)
+    try:
+        while time.time() < deadline:
+            with gevent.Timeout(max(0.1, deadline - time.time()), False):
+                opcode, frame = ws.recv_data_frame(control_frame=True)
+                if opcode == ABNF.OPCODE_CLOSE:
+                    stats['server_closes'] += 1
+                    break
+                stats['frames'] += 1
+                stats['bytes'] += len(frame.data)
+                if opcode == ABNF.OPCODE_TEXT and frame.data.startswith(b'{"msgid"'):
+                    header = json.loads(frame.data)
+                    stats['messages'][header['msgtype']] = stats['messages'].get(header['msgtype'], 0) + 1
+                    sent = pending.pop(header.get('reqid'), None)
+                    if sent is not None:
+                        stats['round_trips'].append(time.perf_counter() - sent)
+    except Exception as e:
+        stats['errors'] += 1
+        logging.debug(f"Client failed: {e}")
+    finally:
+        # Let the puller finish its current message rather than cutting it off between frames
+        puller.join()
+        try:
+            ws.close(status=1000)
+        except Exception:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the dashboard websocket proxy against a local Bokeh server.")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--push-interval', type=int, default=200, help="ms between server-pushed patches per session")
+    parser.add_argument('--direct', action='store_true', help="connect straight to Bokeh, bypassing the proxy")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    bokeh_port = start_bokeh_server(args.push_interval)
+    app.config['PANEL_PORT'] = bokeh_port
+    if args.direct:
+        url = f"ws://127.0.0.1:{bokeh_port}/bokeh_app/ws"
+    else:
+        proxy = pywsgi.WSGIServer(('127.0.0.1', 0), app, handler_class=ProxyWebSocketHandler, log=None)
+        proxy.start()
+        url = f"ws://127.0.0.1:{proxy.server_port}/dashboard/ws"
+
+    stats = {'connected': 0, 'connect_errors': 0, 'errors': 0, 'server_closes': 0,
+             'frames': 0, 'bytes': 0, 'messages': {}, 'round_trips': []}
+    started = time.time()
+    clients = [gevent.spawn(run_client, url, started + args.duration, stats) for _ in range(args.clients)]
+    gevent.joinall(clients)
+    elapsed = time.time() - started
+
+    round_trips = sorted(stats['round_trips'])
+    print(f"{'direct' if args.direct else 'proxied'}: {args.clients} clients for {elapsed:.1f}s via {url}")
+    print(f"  connected {stats['connected']}, connect errors {stats['connect_errors']}, "
+          f"client errors {stats['errors']}, server closes {stats['server_closes']}")
+    print(f"  {stats['frames']} frames ({stats['bytes'] / 1024 ** 2:.2f} MB) received, "
+          f"{stats['frames'] / elapsed:.0f} frames/s, messages {stats['messages']}")
+    if round_trips:
+        p95 = round_trips[int(0.95 * (len(round_trips) - 1))]
+        print(f"  PULL-DOC round trip: {len(round_trips)} samples, median {statistics.median(round_trips) * 1000:.1f} ms, "
+              f"p95 {p95 * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import logging
+import struct
+from urllib.parse import urlsplit
+
+import gevent
+from gevent import socket as gevent_socket
+from gevent.lock import Semaphore
+from geventwebsocket.handler import WebSocketHandler
+from geventwebsocket.websocket import WebSocket
+import websocket
+from websocket import ABNF, WebSocketConnectionClosedException, WebSocketException
+
+
+# Function to split a close frame payload into its status code and reason
+def parse_close_payload(payload):
+    if not payload or len(payload) < 2:
+        return 1000, b''
+    return struct.unpack('!H', payload[:2])[0], payload[2:]
+
+
+# Function to close a gevent-websocket connection with a status code. WebSocket.close() sends its
+# message as the whole close payload and drops the code, so the code is packed in front of it here.
+def close_client(client, code=1000, reason=b''):
+    if isinstance(reason, str):
+        reason = reason.encode('utf-8')
+    client.close(code, struct.pack('!H', code) + reason)
+
+
+# gevent-websocket answers a close frame with the reason alone and forgets the code. This keeps
+# the code (on the handler, as the socket has fixed slots) and echoes the close payload whole.
+class ProxyWebSocket(WebSocket):
+    __slots__ = ()
+
+    @property
+    def close_code(self):
+        return self.handler.close_code
+
+    @property
+    def close_reason(self):
+        return self.handler.close_reason
+
+    def handle_close(self, header, payload):
+        self.handler.close_code, self.handler.close_reason = parse_close_payload(payload)
+        self.close(self.close_code, payload)
+
+
+# Request handler for the gevent server that hands applications a ProxyWebSocket
+class ProxyWebSocketHandler(WebSocketHandler):
+    close_code, close_reason = 1000, b''
+
+    def run_websocket(self):
+        # Swapped in place: a replacement socket would send a close frame when the original is collected
+        self.websocket.__class__ = ProxyWebSocket
+        super().run_websocket()
+
+
+# Function to open the upstream connection on a gevent socket, so reading from it yields to
+# the hub instead of blocking the worker; no monkey patching is needed
+def connect_upstream(url, subprotocols=None, origin=None, timeout=10):
+    parts = urlsplit(url)
+    sock = gevent_socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+    sock.settimeout(None)
+    return websocket.create_connection(url, socket=sock, subprotocols=subprotocols, origin=origin,
+                                       enable_multithread=False)
+
+
+# Full-duplex relay between a ProxyWebSocket client connection and an upstream server.
+# Each direction is pumped by its own greenlet, so server-pushed messages reach the client
+# without waiting for it to speak. Text and binary frames keep their type, and whichever side
+# closes first has its close code and reason passed on to the other.
+class WebSocketProxy:
+
+    def __init__(self, client, upstream):
+        self.client = client
+        self.upstream = upstream
+        self.frames = {'client': 0, 'upstream': 0}
+        self._upstream_send = Semaphore()
+        self._client_send = Semaphore()
+
+    # Client -> upstream; returns when the client goes away
+    def pump_client(self):
+        while not self.client.closed:
+            message = self.client.receive()
+            if message is None:
+                break
+            opcode = ABNF.OPCODE_BINARY if isinstance(message, (bytes, bytearray)) else ABNF.OPCODE_TEXT
+            try:
+                with self._upstream_send:
+                    self.upstream.send(message, opcode=opcode)
+            except (WebSocketConnectionClosedException, OSError):
+                # Upstream has dropped; the upstream pump sees it too and closes the client
+                return
+            self.frames['client'] += 1
+        # Only send the close frame: the upstream pump reads the reply, and close() would read it too
+        try:
+            with self._upstream_send:
+                self.upstream.send_close(status=self.client.close_code, reason=self.client.close_reason)
+        except Exception:
+            pass
+
+    # Upstream -> client; returns when the upstream server closes or drops the connection
+    def pump_upstream(self):
+        code, reason = 1001, b''
+        try:
+            while True:
+                opcode, frame = self.upstream.recv_data_frame(control_frame=True)
+                if opcode == ABNF.OPCODE_CLOSE:
+                    code, reason = parse_close_payload(frame.data)
+                    break
+                if opcode not in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+                    continue
+                message = frame.data.decode('utf-8') if opcode == ABNF.OPCODE_TEXT else frame.data
+                with self._client_send:
+                    self.client.send(message, binary=opcode == ABNF.OPCODE_BINARY)
+                self.frames['upstream'] += 1
+        except (WebSocketConnectionClosedException, OSError):
+            pass
+        except WebSocketException as e:
+            logging.warning(f"Upstream websocket protocol error: {e}")
+            code, reason = 1002, b''
+        if not self.client.closed:
+            close_client(self.client, code, reason)
+
+    def run(self):
+        pumps = [gevent.spawn(self.pump_client), gevent.spawn(self.pump_upstream)]
+        try:
+            # Once either side has gone, give the other a moment to finish the closing handshake
+            gevent.joinall(pumps, count=1)
+            gevent.joinall(pumps, timeout=5)
+        finally:
+            gevent.killall(pumps)
+            self.upstream.shutdown()
+        logging.debug(f"WebSocket proxy closed ({self.client.close_code}): {self.frames}")